@@ -0,0 +1,84 @@
+import json
+from argparse import Namespace
+import numpy as np
+import torch
+from allosaurus.am.allosaurus_torch import AllosaurusTorchModel
+from allosaurus.am.factory import read_am
+from allosaurus.app import Recognizer
+from allosaurus.audio import Audio
+from allosaurus.lm.factory import read_lm
+from allosaurus.pm.factory import read_pm
+from allosaurus.pm.kdict import KaldiWriter
+
+phones = ['a', 'b', 'd', 'e', 'f', 'i', 'k', 'l', 'm', 'n', 'o', 'p', 's', 't', 'u', 'ʃ', 'ŋ', 'ɛ', 'ɔ', 'θ', 'ð', 'ʒ', 'x', 'ɣ']
+
+
+def make_model(model_path, cmvn='none', hidden_size=32, layer_size=2):
+    # Write a small randomly initialized model with the layout of the pretrained models
+    (model_path / 'inventory').mkdir(parents=True, exist_ok=True)
+
+    (model_path / 'phone.txt').write_text('\n'.join(phones) + '\n', encoding='utf-8')
+
+    json.dump([{'LanguageName': 'English', 'ISO6393': 'eng', 'GlottoCode': 'stan1293', 'phonelists': 'eng.txt'}],
+              open(model_path / 'inventory' / 'index.json', 'w', encoding='utf-8'))
+    (model_path / 'inventory' / 'eng.txt').write_text('\n'.join(['a', 'b', 'd', 'i', 'k', 's', 't', 'ʃ', 'θ', 'ð']) + '\n', encoding='utf-8')
+
+    json.dump({'model': 'mfcc_hires', 'backend': 'numpy', 'sample_rate': 16000, 'window_size': 0.025, 'window_shift': 0.01,
+               'feature_window': 3, 'cep_size': 40, 'bank_size': 40, 'low_freq': 20, 'high_freq': -400, 'use_energy': False,
+               'dither': 0.0, 'cmvn': cmvn, 'dtype': 'float32'}, open(model_path / 'pm_config.json', 'w'))
+    json.dump({'model': 'phone_ipa', 'backend': 'numpy'}, open(model_path / 'lm_config.json', 'w'))
+
+    am_config = {'model': 'allosaurus', 'feat_size': 120, 'hidden_size': hidden_size, 'layer_size': layer_size, 'proj_size': 0,
+                 'lang_size_dict': {}, 'phone_size': len(phones) + 1}
+    json.dump(am_config, open(model_path / 'am_config.json', 'w'))
+
+    torch.manual_seed(0)
+    model = AllosaurusTorchModel(Namespace(**am_config))
+
+    # sharpen the output layer, so that the random model emits phones instead of only blanks
+    with torch.no_grad():
+        model.phone_layer.weight.mul_(20)
+
+    torch.save(model.state_dict(), model_path / 'model.pt')
+
+    return model_path
+
+
+def read_test_recognizer(model_path):
+    inference_config = Namespace(model='test', device_id=-1, lang='ipa', approximate=False, prior=None)
+
+    return Recognizer(read_pm(model_path, inference_config), read_am(model_path, inference_config),
+                      read_lm(model_path, inference_config), inference_config)
+
+
+def make_audio(duration=1.0, sample_rate=16000, seed=0):
+    # A chirp with some noise, in the range of audios read by read_audio
+    rs = np.random.RandomState(seed)
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+    samples = 0.3 * np.sin(2 * np.pi * 220 * t * (1 + t)) + 0.05 * rs.randn(len(t))
+
+    return Audio(samples.astype(np.float32), sample_rate)
+
+
+def make_feat_data(data_path, frame_sizes, feat_size=6, seed=0):
+    # Write feat.ark, feat.scp, shape and token as prepared by prep_feat, one utterance of each frame size
+    rs = np.random.RandomState(seed)
+    utts = {}
+
+    feat_writer = KaldiWriter(data_path / 'feat')
+
+    with open(data_path / 'shape', 'w') as shape_writer, open(data_path / 'token', 'w') as token_writer:
+        for i, frame_size in enumerate(frame_sizes):
+            utt_id = f'utt{i:03d}'
+            feat = rs.randn(frame_size, feat_size).astype(np.float32)
+            token = rs.randint(1, len(phones) + 1, size=rs.randint(1, 5)).tolist()
+
+            feat_writer.write(utt_id, feat)
+            shape_writer.write(f'{utt_id} {frame_size} {feat_size}\n')
+            token_writer.write(utt_id + ' ' + ' '.join(map(str, token)) + '\n')
+
+            utts[utt_id] = (feat, token)
+
+    feat_writer.close()
+
+    return utts
@@ -0,0 +1,46 @@
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+from helpers import make_model, read_test_recognizer, make_audio
+
+
+class TestRecognizeBatch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.recognizer = read_test_recognizer(make_model(Path(cls.temp_dir.name), cmvn='speaker'))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def test_same_as_single(self):
+        # different lengths and sample rates, not sorted by length
+        auds = [make_audio(duration, sample_rate, seed) for seed, (duration, sample_rate) in
+                enumerate([(1.0, 16000), (2.5, 16000), (0.4, 8000), (1.7, 22050), (2.5, 16000)])]
+
+        for topk in [1, 3]:
+            for timestamp in [False, True]:
+                expected = [self.recognizer.recognize(aud, topk=topk, timestamp=timestamp) for aud in auds]
+                output = self.recognizer.recognize_batch(auds, topk=topk, timestamp=timestamp)
+
+                self.assertEqual(output, expected)
+
+    def test_results(self):
+        auds = [make_audio(1.2, seed=0), make_audio(0.6, seed=1)]
+
+        for aud, result in zip(auds, self.recognizer.recognize_batch_result(auds)):
+            expected = self.recognizer.recognize_result(aud)
+
+            np.testing.assert_array_equal(result.frame_idx, expected.frame_idx)
+            np.testing.assert_array_equal(result.phone_ids, expected.phone_ids)
+            np.testing.assert_allclose(result.probs, expected.probs, rtol=1e-5)
+
+    def test_empty(self):
+        self.assertEqual(self.recognizer.recognize_batch([]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
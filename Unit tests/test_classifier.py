@@ -0,0 +1,166 @@
+import configparser
+import os
+import tempfile
+import threading
+import unittest
+from argparse import Namespace
+from pathlib import Path
+from unittest import mock
+from allosaurus.am.factory import read_torch_am, quantize_model, am_size
+from helpers import make_model, read_test_recognizer, make_audio
+import classifier
+
+
+class TestClassifier(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+
+        for model in ['default', 'm1', 'm2', 'm3']:
+            make_model(Path(cls.temp_dir.name) / 'models' / model)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def setUp(self):
+        # the classifier reads models/ relative to the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+
+        self.reads = []
+        self.read_hook = None
+        patcher = mock.patch.object(classifier.allo, 'read_recognizer', self.read_recognizer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def read_recognizer(self, inference_config, alt_model_path):
+        # the pretrained models are not available, read the test models without model resolution
+        self.reads.append(inference_config.model)
+
+        if self.read_hook is not None:
+            self.read_hook(inference_config.model)
+
+        return read_test_recognizer(alt_model_path)
+
+    def make_classifier(self, max_loaded=0):
+        config = configparser.ConfigParser()
+        config.read_dict({'MODELS': {'word_model': 'default', 'max_loaded': str(max_loaded)}, 'BATCH': {'max_batch_size': '1'}})
+
+        instance = classifier.Classifier(config)
+        instance.load_models()
+        self.addCleanup(instance.close)
+
+        return instance
+
+    def test_lru_eviction(self):
+        instance = self.make_classifier(max_loaded=2)
+
+        for model in ['m1', 'm2', 'm1', 'm3']:
+            self.assertEqual(instance.get_recognizer(model)[2], model)
+
+        # m2 is the least recently used model
+        self.assertEqual(instance.loaded_models(), ['default', 'm1', 'm3'])
+
+        stats = instance.get_stats()
+        self.assertEqual((stats['loads'], stats['hits'], stats['misses'], stats['evictions']), (3, 1, 3, 1))
+
+        # an evicted model is loaded again
+        instance.get_recognizer('m2')
+        self.assertEqual(instance.loaded_models(), ['default', 'm3', 'm2'])
+        self.assertEqual(self.reads, ['default', 'm1', 'm2', 'm3', 'm2'])
+
+    def test_size_eviction(self):
+        instance = self.make_classifier()
+        instance.max_loaded_bytes = int(classifier.model_size(instance.default_word_model) * 1.5)
+
+        instance.get_recognizer('m1')
+        instance.get_recognizer('m2')
+
+        self.assertEqual(instance.loaded_models(), ['default', 'm2'])
+        self.assertEqual(instance.get_stats()['resident_mb'], round(classifier.model_size(instance.default_word_model) / 1024 / 1024, 2))
+
+    def test_unknown_model(self):
+        instance = self.make_classifier()
+
+        self.assertEqual(instance.get_recognizer('nope')[2], 'default')
+        self.assertEqual(instance.get_stats()['misses'], 0)
+
+    def test_one_hit_per_request(self):
+        instance = self.make_classifier()
+        audio = make_audio()
+
+        for request in range(3):
+            resolved = instance.get_recognizer('m1')
+            instance.get_sample_rate(resolved=resolved)
+            result, model = instance.predict_word(audio, resolved=resolved)
+
+            self.assertEqual(model, 'm1')
+
+        stats = instance.get_stats()
+        self.assertEqual((stats['misses'], stats['hits']), (1, 2))
+
+    def test_load_once(self):
+        instance = self.make_classifier()
+        start = threading.Barrier(4)
+
+        def load(model):
+            start.wait()
+            instance.get_recognizer(model)
+
+        threads = [threading.Thread(target=load, args=(model,)) for model in ['m1', 'm1', 'm1', 'm1']]
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+
+        self.assertEqual(self.reads.count('m1'), 1)
+        self.assertEqual(instance.get_stats()['hits'], 3)
+
+    def test_parallel_loads(self):
+        instance = self.make_classifier()
+        m2_loaded = threading.Event()
+        m1_waited = []
+
+        # m1 is only read once m2 was read, a lock shared by all models would dead lock here
+        def read_hook(model):
+            if model == 'm1':
+                m1_waited.append(m2_loaded.wait(10))
+            elif model == 'm2':
+                m2_loaded.set()
+
+        self.read_hook = read_hook
+
+        thread = threading.Thread(target=instance.get_recognizer, args=('m1',))
+        thread.start()
+
+        while 'm1' not in self.reads:
+            thread.join(0.01)
+
+        instance.get_recognizer('m2')
+        thread.join()
+
+        self.assertEqual(m1_waited, [True])
+
+
+class TestModelSize(unittest.TestCase):
+
+    def test_am_size(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            model_path = make_model(Path(temp_dir))
+
+            model = read_torch_am(model_path, Namespace(device_id=-1))
+            expected = sum(param.numel() * 4 for param in model.parameters())
+
+            self.assertEqual(am_size(model), expected)
+
+            # packed int8 weights are about a quarter of the float weights
+            quantized_size = am_size(quantize_model(model))
+            self.assertLess(quantized_size, expected / 2)
+            self.assertGreater(quantized_size, expected / 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
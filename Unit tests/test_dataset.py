@@ -0,0 +1,102 @@
+import multiprocessing
+import operator
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+from allosaurus.am.dataset import AllosaurusDataset
+from allosaurus.pm.kdict import KaldiWriter
+from helpers import make_feat_data
+
+
+class TestAllosaurusDataset(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.data_path = Path(cls.temp_dir.name)
+        cls.utts = make_feat_data(cls.data_path, [5, 12, 1, 30, 7, 12])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def make_dataset(self, use_mmap=True):
+        dataset = AllosaurusDataset(self.data_path, use_mmap)
+        self.addCleanup(dataset.close)
+
+        return dataset
+
+    def assert_items(self, dataset, items):
+        self.assertEqual(len(items), len(self.utts))
+
+        for utt_id, (feat, token) in zip(dataset.utt_ids, items):
+            np.testing.assert_array_equal(feat, self.utts[utt_id][0])
+            self.assertEqual(token, self.utts[utt_id][1])
+
+    def test_mmap(self):
+        dataset = self.make_dataset()
+        items = [dataset[i] for i in range(len(dataset))]
+
+        self.assert_items(dataset, items)
+        self.assertEqual(len(dataset.utt2view), len(self.utts))
+        self.assertFalse(items[0][0].flags.writeable)
+
+        # the longest utterances come first
+        self.assertEqual([len(feat) for feat, token in items], [30, 12, 12, 7, 5, 1])
+
+        self.assert_items(dataset, [self.make_dataset(use_mmap=False)[i] for i in range(len(dataset))])
+
+    def test_double_matrix(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data_path = Path(temp_dir)
+            utts = make_feat_data(data_path, [4, 9])
+
+            # DM matrices are not mapped, they are read and converted instead
+            feat = np.arange(12, dtype=np.float64).reshape(3, 4)
+            feat_writer = KaldiWriter(data_path / 'feat', append=True)
+            feat_writer.write('utt_dm', feat)
+            feat_writer.close()
+
+            with open(data_path / 'shape', 'a') as f:
+                f.write('utt_dm 3 4\n')
+
+            with open(data_path / 'token', 'a') as f:
+                f.write('utt_dm 1 2\n')
+
+            dataset = AllosaurusDataset(data_path)
+
+            self.assertEqual(sorted(dataset.utt2view), sorted(utts))
+            dm_feat, token = dataset[dataset.utt_ids.index('utt_dm')]
+            dataset.close()
+
+        self.assertEqual(dm_feat.dtype, np.float32)
+        np.testing.assert_array_equal(dm_feat, feat)
+        self.assertEqual(token, [1, 2])
+
+    def test_pickle(self):
+        dataset = self.make_dataset()
+        dataset[0]
+
+        # the map and the lock are not pickled
+        copied = pickle.loads(pickle.dumps(dataset))
+        self.assertIsNone(copied.ark_map)
+
+        self.assert_items(copied, [copied[i] for i in range(len(copied))])
+        self.assertIsNotNone(copied.ark_map)
+        copied.close()
+
+    def test_spawned_worker(self):
+        dataset = self.make_dataset()
+        dataset[0]
+
+        # spawned workers, as used by DataLoader or ProcessPoolExecutor on macOS and Windows, map feat.ark again
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            items = pool.starmap(operator.getitem, [(dataset, i) for i in range(len(dataset))])
+
+        self.assert_items(dataset, items)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import tempfile
+import unittest
+from argparse import Namespace
+from pathlib import Path
+import numpy as np
+from allosaurus.lm.factory import read_lm
+from helpers import make_model
+
+
+def loop_compute(decoder, logits, lang_id=None, topk=1, emit=1.0, timestamp=False):
+    # frame by frame decoding, PhoneDecoder.compute before it was vectorized
+    mask = decoder.inventory.get_mask(lang_id, approximation=decoder.config.approximate)
+
+    logits = mask.mask_logits(logits)
+
+    emit_frame_idx = []
+
+    cur_max_arg = -1
+
+    for i in range(len(logits)):
+
+        logit = logits[i]
+        logit[0] /= emit
+
+        arg_max = np.argmax(logit)
+
+        if arg_max != cur_max_arg and arg_max != 0:
+            emit_frame_idx.append(i)
+            cur_max_arg = arg_max
+
+    decoded_seq = []
+    for idx in emit_frame_idx:
+        logit = logits[idx]
+        exp_prob = np.exp(logit - np.max(logit))
+        probs = exp_prob / exp_prob.sum()
+
+        top_phones = logit.argsort()[-topk:][::-1]
+        top_probs = sorted(probs)[-topk:][::-1]
+
+        stamp = f"{decoder.config.window_shift*idx:.3f} {decoder.config.window_size:.3f} "
+
+        if topk == 1:
+            phones_str = ' '.join(mask.get_units(top_phones))
+        else:
+            phones_str = ' '.join([f"{phone} ({prob:.3f})" for phone, prob in zip(mask.get_units(top_phones), top_probs)])
+
+        if timestamp:
+            phones_str = stamp + phones_str
+
+        decoded_seq.append(phones_str)
+
+    if timestamp:
+        return '\n'.join(decoded_seq)
+    elif topk == 1:
+        return ' '.join(decoded_seq)
+    else:
+        return ' | '.join(decoded_seq)
+
+
+class TestPhoneDecoder(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        model_path = make_model(Path(cls.temp_dir.name))
+        cls.decoder = read_lm(model_path, Namespace(model='test', device_id=-1, lang='ipa', approximate=False, prior=None))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def test_same_as_loop(self):
+        rs = np.random.RandomState(0)
+        phone_size = len(self.decoder.unit.id_to_unit)
+
+        for trial in range(20):
+            # blank dominated frames, as produced by ctc models
+            logits = rs.randn(rs.randint(1, 200), phone_size)
+            logits[:, 0] += rs.uniform(0, 3)
+
+            for lang_id in ['ipa', 'eng']:
+                for topk in [1, 3]:
+                    for emit in [1.0, 1.5]:
+                        for timestamp in [False, True]:
+                            expected = loop_compute(self.decoder, logits.copy(), lang_id, topk, emit, timestamp)
+                            output = self.decoder.compute(logits.copy(), lang_id, topk, emit, timestamp)
+
+                            self.assertEqual(output, expected, (trial, lang_id, topk, emit, timestamp))
+
+    def test_no_emitting_frame(self):
+        logits = np.zeros((10, len(self.decoder.unit.id_to_unit)))
+        logits[:, 0] = 1.0
+
+        self.assertEqual(self.decoder.compute(logits), '')
+        self.assertEqual(len(self.decoder.decode(logits)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+from scipy.fftpack import dct
+from allosaurus.pm import feature
+
+
+def loop_filterbanks(nfilt, nfft, samplerate, lowfreq, highfreq):
+    # bin by bin computation, feature.get_filterbanks before it was vectorized
+    lowmel = feature.hz2mel(lowfreq)
+    highmel = feature.hz2mel(highfreq)
+
+    fbank = np.zeros([nfilt, nfft // 2 + 1])
+    mel_freq_delta = (highmel - lowmel) / (nfilt + 1)
+
+    for j in range(nfilt):
+        leftmel = lowmel + j * mel_freq_delta
+        centermel = lowmel + (j + 1) * mel_freq_delta
+        rightmel = lowmel + (j + 2) * mel_freq_delta
+
+        for i in range(nfft // 2):
+            mel = feature.hz2mel(i * samplerate / nfft)
+            if mel > leftmel and mel < rightmel:
+                if mel < centermel:
+                    fbank[j, i] = (mel - leftmel) / (centermel - leftmel)
+                else:
+                    fbank[j, i] = (rightmel - mel) / (rightmel - centermel)
+
+    return fbank
+
+
+class TestFeature(unittest.TestCase):
+
+    def test_filterbanks(self):
+        for nfilt, nfft, samplerate, lowfreq, highfreq in [(23, 512, 16000, 20, 8000), (40, 512, 16000, 20, 7600),
+                                                          (26, 256, 8000, 0, 4000), (23, 1024, 44100, 100, 20000)]:
+            fb = feature.get_filterbanks(nfilt, nfft, samplerate, lowfreq, highfreq)
+            np.testing.assert_array_equal(fb, loop_filterbanks(nfilt, nfft, samplerate, lowfreq, highfreq))
+
+    def test_dct_matrix(self):
+        rs = np.random.RandomState(0)
+        log_fbank = rs.randn(20, 23)
+
+        for numcep, ceplifter in [(13, 22), (20, 22), (13, 0)]:
+            expected = feature.lifter(dct(log_fbank, type=2, axis=1, norm='ortho')[:, :numcep], ceplifter)
+            np.testing.assert_allclose(np.dot(log_fbank, feature.get_dct_matrix(23, numcep, ceplifter)), expected, atol=1e-10)
+
+    def test_lift(self):
+        lift = feature.get_lift(13, 22)
+
+        self.assertIs(feature.get_lift(13, 22), lift)
+        self.assertFalse(lift.flags.writeable)
+        np.testing.assert_array_equal(lift, 1 + 11 * np.sin(np.pi * np.arange(13) / 22))
+
+    def test_precomputed_mfcc(self):
+        rs = np.random.RandomState(0)
+        signal = (rs.randn(16000) * 3000).astype(np.int16)
+
+        fb = feature.get_filterbanks(23, 512, 16000, 20, 8000)
+        dct_matrix = feature.get_dct_matrix(23, 13, 22)
+
+        expected = feature.mfcc(signal, highfreq=8000)
+        np.testing.assert_allclose(feature.mfcc(signal, highfreq=8000, fb=fb, dct_matrix=dct_matrix), expected, atol=1e-10)
+
+
+if __name__ == '__main__':
+    unittest.main()
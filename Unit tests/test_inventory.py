@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from argparse import Namespace
+from pathlib import Path
+from allosaurus.lm.inventory import Inventory
+from helpers import make_model
+
+
+def mask_phones(mask):
+    return sorted(mask.domain_unit.get_unit(idx) for idx in mask.valid_mask if idx != 0)
+
+
+class TestInventoryMask(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.model_path = make_model(Path(self.temp_dir.name) / 'model')
+
+        self.unit_file = Path(self.temp_dir.name) / 'new_eng.txt'
+        self.unit_file.write_text('a\nb\nθ\n', encoding='utf-8')
+
+        self.eng = sorted(['a', 'b', 'd', 'i', 'k', 's', 't', 'ʃ', 'θ', 'ð'])
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_cache(self):
+        inventory = Inventory(self.model_path)
+        mask = inventory.get_mask('eng')
+
+        self.assertEqual(mask_phones(mask), self.eng)
+        self.assertIs(inventory.get_mask('eng'), mask)
+        self.assertIs(inventory.get_mask(), inventory.get_mask('ipa'))
+
+    def test_update_in_process(self):
+        inventory = Inventory(self.model_path)
+        inventory.get_mask('eng')
+
+        inventory.update_unit('eng', self.unit_file)
+        self.assertEqual(mask_phones(inventory.get_mask('eng')), ['a', 'b', 'θ'])
+
+        # the glottocode shares the iso id's phone file
+        self.assertEqual(mask_phones(inventory.get_mask('stan1293')), ['a', 'b', 'θ'])
+
+        inventory.restore_unit('eng')
+        self.assertEqual(mask_phones(inventory.get_mask('eng')), self.eng)
+
+    def test_update_by_other_process(self):
+        # update_phone and restore_phone run with their own inventory
+        inventory = Inventory(self.model_path)
+        self.assertEqual(mask_phones(inventory.get_mask('eng')), self.eng)
+
+        Inventory(self.model_path).update_unit('eng', self.unit_file)
+        self.assertEqual(mask_phones(inventory.get_mask('eng')), ['a', 'b', 'θ'])
+
+        # a second update of the same file is noticed as well
+        self.unit_file.write_text('a\nb\nd\ni\n', encoding='utf-8')
+        Inventory(self.model_path).update_unit('eng', self.unit_file)
+        self.assertEqual(mask_phones(inventory.get_mask('eng')), ['a', 'b', 'd', 'i'])
+
+        Inventory(self.model_path).restore_unit('eng')
+        self.assertEqual(mask_phones(inventory.get_mask('eng')), self.eng)
+
+    def test_prior(self):
+        prior_file = Path(self.temp_dir.name) / 'prior.txt'
+        prior_file.write_text('a -1.0\n', encoding='utf-8')
+
+        inventory = Inventory(self.model_path, Namespace(prior=str(prior_file)))
+        mask = inventory.get_mask('eng')
+        a = mask.domain_unit.get_id('a')
+
+        self.assertEqual(mask.prior[a], -1.0)
+
+        # same size, only the modification time tells the new prior apart
+        prior_file.write_text('a -2.0\n', encoding='utf-8')
+        stat = os.stat(prior_file)
+        os.utime(prior_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+
+        self.assertEqual(inventory.get_mask('eng').prior[a], -2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import gzip
+import io
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+from allosaurus.pm.kdict import KaldiWriter, read_matrix, read_matrix_shape, read_matrix_by_offset, read_scp_offset, \
+    read_string, write_string, write_matrix
+
+
+class NoPeekReader(io.RawIOBase):
+    # unbuffered stream without peek, read_string falls back to read and seek
+
+    def __init__(self, data):
+        self.f = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        return self.f.read(size)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.f.seek(offset, whence)
+
+    def tell(self):
+        return self.f.tell()
+
+
+def kaldi_bytes(utt_id, feat):
+    # reference layout of a binary kaldi ark entry
+    format = b'DM ' if feat.dtype == np.float64 else b'FM '
+    data = utt_id.encode('utf-8') + b' \0B' + format
+    data += b'\x04' + struct.pack('<i', feat.shape[0]) + b'\x04' + struct.pack('<i', feat.shape[1])
+    data += b''.join(struct.pack('<d' if feat.dtype == np.float64 else '<f', x) for x in feat.ravel())
+    return data
+
+
+class TestKaldi(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+
+        rs = np.random.RandomState(0)
+        self.utt_ids = ['utt_0', 'utt_1', 'utt_ß', 'utt_3']
+        self.feats = [rs.randn(17, 120).astype(np.float32), rs.randn(1, 120).astype(np.float32),
+                      rs.randn(3, 5), rs.randn(0, 120).astype(np.float32)]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def assert_feats(self, scp_path, utt_ids, feats):
+        scp_utt_ids, ark_files, offsets = read_scp_offset(scp_path)
+        self.assertEqual(scp_utt_ids, utt_ids)
+
+        for ark_file, offset, feat in zip(ark_files, offsets, feats):
+            output = read_matrix_by_offset(ark_file, offset, feat.dtype)
+            self.assertEqual(output.dtype, feat.dtype)
+            np.testing.assert_array_equal(output, feat)
+
+            with open(ark_file, 'rb') as f:
+                f.seek(offset)
+                self.assertEqual(read_matrix_shape(f), feat.shape)
+
+    def test_layout(self):
+        for utt_id, feat in zip(self.utt_ids, self.feats):
+            f = io.BytesIO()
+            size = write_string(f, utt_id) + write_matrix(f, feat)
+
+            self.assertEqual(f.getvalue(), kaldi_bytes(utt_id, feat))
+            self.assertEqual(size, len(f.getvalue()))
+
+    def test_read(self):
+        for reader in [io.BytesIO, lambda data: io.BufferedReader(io.BytesIO(data), 16), NoPeekReader]:
+            f = reader(b''.join(kaldi_bytes(utt_id, feat) for utt_id, feat in zip(self.utt_ids, self.feats)))
+
+            for utt_id, feat in zip(self.utt_ids, self.feats):
+                self.assertEqual(read_string(f), utt_id)
+                output = read_matrix(f, np.float64)
+
+                self.assertEqual(output.dtype, np.float64)
+                self.assertTrue(output.flags.writeable)
+                np.testing.assert_array_equal(output, feat)
+
+    def test_compressed(self):
+        rs = np.random.RandomState(0)
+        rows, cols = 7, 3
+        globmin, globrange = -2.0, 5.0
+        col_headers = np.sort(rs.randint(0, 65536, size=(cols, 4)), axis=1).astype(np.uint16)
+        data = rs.randint(0, 256, size=(cols, rows)).astype(np.uint8)
+
+        f = io.BytesIO(b'\0BCM ' + struct.pack('<ffii', globmin, globrange, rows, cols) + col_headers.tobytes() + data.tobytes())
+        output = read_matrix(f)
+
+        # CompressedMatrix::CopyToMat, one element at a time
+        for j in range(cols):
+            p0, p25, p75, p100 = [np.float32(globmin + globrange * 1.52590218966964e-05 * h) for h in col_headers[j]]
+            for i in range(rows):
+                v = data[j, i]
+                if v <= 64:
+                    expected = p0 + (p25 - p0) * v / 64.
+                elif v <= 192:
+                    expected = p25 + (p75 - p25) * (v - 64) / 128.
+                else:
+                    expected = p75 + (p100 - p75) * (v - 192) / 63.
+
+                self.assertAlmostEqual(output[i, j], expected, places=4)
+
+        f.seek(0)
+        self.assertEqual(read_matrix_shape(f), (rows, cols))
+
+    def test_short_read(self):
+        data = kaldi_bytes('utt', self.feats[0])
+
+        with self.assertRaises(ValueError):
+            f = io.BytesIO(data[:-1])
+            read_string(f)
+            read_matrix(f)
+
+        with self.assertRaises(ValueError):
+            read_string(io.BytesIO(b'utt'))
+
+    def test_writer(self):
+        writer = KaldiWriter(self.path / 'feat')
+        writer.write(self.utt_ids[0], self.feats[0])
+        writer.write(self.utt_ids[1:], self.feats[1:])
+        writer.close()
+
+        self.assert_feats(self.path / 'feat.scp', self.utt_ids, self.feats)
+
+        with open(self.path / 'feat.ark', 'rb') as f:
+            expected = b''.join(kaldi_bytes(utt_id, feat) for utt_id, feat in zip(self.utt_ids, self.feats))
+            self.assertEqual(f.read(), expected)
+
+    def test_append(self):
+        writer = KaldiWriter(self.path / 'feat.ark')
+        writer.write(self.utt_ids[:2], self.feats[:2])
+        writer.close()
+
+        writer = KaldiWriter(self.path / 'feat.scp', append=True)
+        writer.write(self.utt_ids[2:], self.feats[2:])
+        writer.close()
+
+        self.assert_feats(self.path / 'feat.scp', self.utt_ids, self.feats)
+
+        # without append, the previous ark and scp are replaced
+        writer = KaldiWriter(self.path / 'feat')
+        writer.write(self.utt_ids[3], self.feats[3])
+        writer.close()
+
+        self.assert_feats(self.path / 'feat.scp', self.utt_ids[3:], self.feats[3:])
+
+    def test_gzip(self):
+        data = b''.join(kaldi_bytes(utt_id, feat) for utt_id, feat in zip(self.utt_ids, self.feats))
+
+        with gzip.open(self.path / 'feat.ark.gz', 'wb') as f:
+            f.write(data)
+
+        offset = len(kaldi_bytes(self.utt_ids[0], self.feats[0])) + len(self.utt_ids[1]) + 1
+        output = read_matrix_by_offset(str(self.path / 'feat.ark'), offset)
+
+        np.testing.assert_array_equal(output, self.feats[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import tempfile
+import unittest
+from argparse import Namespace
+from pathlib import Path
+import numpy as np
+from allosaurus.am.loader import AllosaurusLoader, PrefetchLoader, read_loader
+from helpers import make_feat_data
+
+
+class TestPrefetchLoader(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.data_path = Path(cls.temp_dir.name)
+
+        rs = np.random.RandomState(0)
+        make_feat_data(cls.data_path, rs.randint(1, 50, size=40))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def make_loader(self, **config):
+        loader = read_loader(self.data_path, Namespace(batch_frame_size=100, **config))
+        self.addCleanup(loader.close)
+
+        return loader
+
+    def assert_batch(self, batch, expected):
+        (feat, feat_lengths), (token, token_lengths) = batch
+        (expected_feat, expected_feat_lengths), (expected_token, expected_token_lengths) = expected
+
+        np.testing.assert_array_equal(feat, expected_feat)
+        np.testing.assert_array_equal(feat_lengths, expected_feat_lengths)
+        np.testing.assert_array_equal(token, expected_token)
+        np.testing.assert_array_equal(token_lengths, expected_token_lengths)
+
+    def test_same_as_loader(self):
+        for process in [False, True]:
+            loader = self.make_loader()
+            self.assertIsInstance(loader, AllosaurusLoader)
+
+            prefetch_loader = self.make_loader(prefetch_size=3, prefetch_workers=2, prefetch_process=process)
+            self.assertIsInstance(prefetch_loader, PrefetchLoader)
+            self.assertEqual(len(prefetch_loader), len(loader))
+
+            for epoch in range(2):
+                for batch_idx in range(len(loader)):
+                    self.assert_batch(prefetch_loader.read_batch(batch_idx), loader.read_batch(batch_idx))
+
+                # both loaders shuffle their batches in the same way
+                np.random.seed(epoch)
+                loader.shuffle()
+                np.random.seed(epoch)
+                prefetch_loader.shuffle()
+
+                self.assertEqual(prefetch_loader.loader.batch_lst, loader.batch_lst)
+
+    def test_skipped_batches(self):
+        loader = self.make_loader()
+        prefetch_loader = self.make_loader(prefetch_size=2)
+
+        for batch_idx in [0, 3, 4, 1, len(loader) - 1]:
+            self.assert_batch(prefetch_loader.read_batch(batch_idx), loader.read_batch(batch_idx))
+
+    def test_exception(self):
+        for process in [False, True]:
+            prefetch_loader = self.make_loader(prefetch_size=100, prefetch_process=process)
+
+            # a batch referring to a missing utterance fails in background, the error is raised when the batch is read
+            prefetch_loader.loader.batch_lst.insert(2, [len(prefetch_loader.loader.dataset)])
+
+            prefetch_loader.read_batch(0)
+            prefetch_loader.read_batch(1)
+
+            with self.assertRaises(IndexError):
+                prefetch_loader.read_batch(2)
+
+            # the following batches are still served
+            prefetch_loader.read_batch(3)
+
+
+
+class TestBucketing(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.data_path = Path(cls.temp_dir.name)
+
+        # a few utterances are longer than batch_frame_size
+        rs = np.random.RandomState(1)
+        make_feat_data(cls.data_path, list(rs.randint(1, 60, size=50)) + [120, 150])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def make_loader(self, bucket_noise=0.0):
+        loader = AllosaurusLoader(self.data_path, Namespace(batch_frame_size=100, bucket_noise=bucket_noise))
+        self.addCleanup(loader.close)
+
+        return loader
+
+    def assert_batches(self, loader):
+        # every utterance is batched exactly once
+        self.assertEqual(sorted(idx for batch in loader.batch_lst for idx in batch), list(range(len(loader.dataset))))
+
+        for batch in loader.batch_lst:
+            frame_sizes = loader.frame_sizes[batch]
+
+            # the longest utterance comes first, the padded size fits unless the batch is a single long utterance
+            self.assertEqual(list(frame_sizes), sorted(frame_sizes, reverse=True))
+            self.assertTrue(frame_sizes[0] * len(batch) <= 100 or len(batch) == 1)
+
+    def test_without_noise(self):
+        loader = self.make_loader()
+        self.assert_batches(loader)
+
+        # the same batches for every loader and every epoch
+        self.assertEqual(self.make_loader().batch_lst, loader.batch_lst)
+
+        batch_lst = sorted(loader.batch_lst)
+        loader.shuffle()
+        self.assertEqual(sorted(loader.batch_lst), batch_lst)
+
+        frame_size = loader.frame_sizes.sum()
+        padded_frame_size = sum(loader.frame_sizes[batch[0]] * len(batch) for batch in loader.batch_lst)
+        self.assertAlmostEqual(loader.padding_efficiency(), frame_size / padded_frame_size)
+
+    def test_noise(self):
+        loader = self.make_loader(bucket_noise=0.2)
+
+        for epoch in range(3):
+            loader.shuffle()
+            self.assert_batches(loader)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import tempfile
+import unittest
+from pathlib import Path
+from allosaurus.lm.articulatory import Articulatory
+from allosaurus.lm.mask import UnitMask, domain_feature_matrix
+from allosaurus.lm.unit import read_unit
+from helpers import phones
+
+
+def loop_unit_map(domain_unit, target_unit, articulatory):
+    # phone by phone search, UnitMask.approxmiate_phone before it used the feature matrix
+    unit_map = {0: 0}
+    invalid_mask = set(range(1, len(domain_unit)))
+
+    for target_idx, target_phone in target_unit.id_to_unit.items():
+        if target_phone in domain_unit:
+            domain_idx = domain_unit.get_id(target_phone)
+            invalid_mask -= {domain_idx}
+            unit_map[domain_idx] = target_idx
+
+    for target_idx, target_phone in target_unit.id_to_unit.items():
+        if target_phone not in domain_unit:
+            max_domain_idx = -1
+            max_domain_score = -10000
+
+            for domain_idx in sorted(invalid_mask):
+                score = articulatory.similarity(domain_unit.get_unit(domain_idx), target_phone)
+
+                if score >= max_domain_score:
+                    max_domain_score = score
+                    max_domain_idx = domain_idx
+
+            invalid_mask -= {max_domain_idx}
+            unit_map[max_domain_idx] = target_idx
+
+    return unit_map
+
+
+class TestApproximation(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+
+        cls.domain_unit = cls.read_unit('phone.txt', phones)
+
+        # seen phones, unseen phones close to several domain phones and phones unknown to panphon (all ties)
+        cls.target_units = [
+            cls.read_unit('seen.txt', ['a', 'b', 'θ']),
+            cls.read_unit('unseen.txt', ['a', 'ɑ', 'ɪ', 'ʊ', 'v', 'z', 'h', 'ʔ', 't', 'tʃ', 'ɲ']),
+            cls.read_unit('unknown.txt', ['b', 'X1', 'X2', 'ʌ', 'X3']),
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    @classmethod
+    def read_unit(cls, name, units):
+        unit_path = Path(cls.temp_dir.name) / name
+        unit_path.write_text('\n'.join(units) + '\n', encoding='utf-8')
+
+        return read_unit(unit_path)
+
+    def test_same_as_loop(self):
+        articulatory = Articulatory()
+        domain_feature = domain_feature_matrix(self.domain_unit, articulatory)
+
+        for target_unit in self.target_units:
+            expected = loop_unit_map(self.domain_unit, target_unit, articulatory)
+
+            for feature in [None, domain_feature]:
+                mask = UnitMask(self.domain_unit, target_unit, approximation=True, domain_feature=feature)
+
+                self.assertEqual(mask.unit_map, expected)
+                self.assertEqual(set(mask.valid_mask), set(expected))
+                self.assertEqual(set(mask.invalid_mask), set(range(len(self.domain_unit))) - set(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import tempfile
+import unittest
+from argparse import Namespace
+from pathlib import Path
+import numpy as np
+from allosaurus.audio import Audio
+from allosaurus.pm.factory import read_pm
+from helpers import make_model, make_audio
+
+
+def compute_stream(pm, audio, chunk_size):
+    pm.reset()
+
+    feats = []
+    for i in range(0, len(audio.samples), chunk_size):
+        chunk = Audio(audio.samples[i:i + chunk_size], audio.sample_rate)
+        feats.append(pm.compute_stream(chunk, finish=i + chunk_size >= len(audio.samples)))
+
+    return np.concatenate(feats)
+
+
+class TestComputeStream(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        model_path = make_model(Path(cls.temp_dir.name))
+        cls.pm = read_pm(model_path, Namespace(model='test', device_id=-1, lang='ipa', approximate=False, prior=None))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def test_interior_frames(self):
+        for seed, duration in enumerate([0.5, 1.0, 1.33]):
+            audio = make_audio(duration, seed=seed)
+            expected = self.pm.compute(audio)
+
+            for chunk_size in [160, 1000, 1600, 4321, len(audio.samples)]:
+                feat = compute_stream(self.pm, audio, chunk_size)
+
+                self.assertEqual(feat.shape, expected.shape)
+
+                # only the edge windows differ: repeated instead of wrapped around
+                np.testing.assert_allclose(feat[1:-1], expected[1:-1], rtol=1e-5, atol=1e-5)
+
+    def test_chunk_size_invariance(self):
+        audio = make_audio(1.0)
+        expected = compute_stream(self.pm, audio, len(audio.samples))
+
+        for chunk_size in [1, 400, 1601]:
+            np.testing.assert_allclose(compute_stream(self.pm, audio, chunk_size), expected, rtol=1e-5, atol=1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
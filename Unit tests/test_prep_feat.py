@@ -0,0 +1,108 @@
+import tempfile
+import unittest
+import wave
+from pathlib import Path
+from allosaurus.bin.prep_feat import prepare_feature, prepare_shard
+from helpers import make_model, make_audio
+
+
+class TestPrepareFeature(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.model_dir = Path(cls.temp_dir.name)
+        make_model(cls.model_dir / 'test')
+
+        # utterances of different lengths and sample rates
+        cls.wav_dir = cls.model_dir / 'wav'
+        cls.wav_dir.mkdir()
+
+        cls.utts = []
+        for i in range(10):
+            audio = make_audio(0.3 + 0.1 * i, [16000, 8000][i % 2], seed=i)
+            wav_path = cls.wav_dir / f'{i}.wav'
+
+            with wave.open(str(wav_path), 'wb') as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(audio.sample_rate)
+                f.writeframes((audio.samples * 32767).astype('<i2').tobytes())
+
+            cls.utts.append((f'utt{i}', str(wav_path)))
+
+        cls.expected = cls.prepare(cls.make_data_path('expected'), 1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    @classmethod
+    def make_data_path(cls, name):
+        data_path = cls.model_dir / name
+        data_path.mkdir()
+        (data_path / 'wave').write_text(''.join(f'{utt_id} {wav_path}\n' for utt_id, wav_path in cls.utts), encoding='utf-8')
+
+        return data_path
+
+    @classmethod
+    def prepare(cls, data_path, workers, resume=False):
+        prepare_feature(data_path, 'test', workers, resume, alt_model_path=cls.model_dir)
+
+        return cls.read_output(data_path)
+
+    @classmethod
+    def read_output(cls, data_path):
+        # the scp points into the ark of its own directory
+        scp = (data_path / 'feat.scp').read_text(encoding='utf-8').replace(str(data_path.absolute()), '')
+
+        return (data_path / 'feat.ark').read_bytes(), scp, (data_path / 'shape').read_text(encoding='utf-8')
+
+    def assert_output(self, data_path, output):
+        ark, scp, shape = output
+
+        self.assertEqual(ark, self.expected[0])
+        self.assertEqual(scp, self.expected[1])
+        self.assertEqual(shape, self.expected[2])
+
+        # the shards are merged and removed
+        self.assertEqual(list(data_path.glob('*shard*')), [])
+
+    def test_workers(self):
+        for workers in [2, 3]:
+            data_path = self.make_data_path(f'workers{workers}')
+            self.assert_output(data_path, self.prepare(data_path, workers))
+
+    def test_resume(self):
+        data_path = self.make_data_path('resume')
+        workers = 3
+        shard_size = (len(self.utts) + workers - 1) // workers
+
+        # an interrupted run: every shard is written, shard 1 is cut in the middle of its last matrix
+        for shard_id in range(workers):
+            prepare_shard(data_path.absolute(), 'test', shard_id, self.utts[shard_id*shard_size:(shard_id+1)*shard_size],
+                          alt_model_path=self.model_dir)
+
+        ark_path = data_path / 'feat.shard1.ark'
+        ark_path.write_bytes(ark_path.read_bytes()[:-100])
+
+        self.assert_output(data_path, self.prepare(data_path, workers, resume=True))
+
+        # a single worker resumes its own files
+        ark_path = data_path / 'feat.ark'
+        ark_path.write_bytes(ark_path.read_bytes()[:-100])
+
+        self.assert_output(data_path, self.prepare(data_path, 1, resume=True))
+
+    def test_resume_other_workers(self):
+        data_path = self.make_data_path('other_workers')
+
+        for shard_id in range(2):
+            prepare_shard(data_path.absolute(), 'test', shard_id, self.utts[:1], alt_model_path=self.model_dir)
+
+        with self.assertRaises(AssertionError):
+            prepare_feature(data_path, 'test', 3, resume=True, alt_model_path=self.model_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
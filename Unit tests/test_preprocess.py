@@ -0,0 +1,80 @@
+import unittest
+import numpy as np
+from allosaurus.pm import preprocess
+
+
+def loop_framesig(sig, frame_len, frame_step, preemph=0.97, wintype='hamming'):
+    # frame by frame processing, preprocess.framesig before it was vectorized
+    slen = len(sig)
+    frame_len = int(preprocess.round_half_up(frame_len))
+    frame_step = int(preprocess.round_half_up(frame_step))
+    if slen <= frame_len:
+        numframes = 1
+    else:
+        numframes = 1 + ((slen - frame_len) // frame_step)
+
+    padsignal = sig[:(numframes - 1) * frame_step + frame_len]
+    if wintype == 'povey':
+        win = np.empty(frame_len)
+        for i in range(frame_len):
+            win[i] = (0.5 - 0.5 * np.cos(2 * np.pi / (frame_len - 1) * i)) ** 0.85
+    else:
+        win = np.hamming(frame_len)
+
+    frames = preprocess.rolling_window(padsignal, window=frame_len, step=frame_step)
+
+    frames = frames.astype(np.float32)
+    raw_frames = np.zeros(frames.shape)
+    for frm in range(frames.shape[0]):
+        frames[frm, :] -= np.mean(frames[frm, :])
+        raw_frames[frm, :] = frames[frm, :]
+        frames[frm, :] = np.append((1 - preemph) * frames[frm, 0], frames[frm, 1:] - preemph * frames[frm, :-1])
+
+    return frames * win, raw_frames
+
+
+class TestFramesig(unittest.TestCase):
+
+    def signals(self):
+        rs = np.random.RandomState(0)
+
+        for size in [400, 401, 1000, 16000]:
+            yield (rs.randn(size) * 3000).astype(np.int16)
+            yield (rs.randn(size) * 0.1 + 0.05).astype(np.float32)
+            yield rs.randn(size) * 0.1 - 0.05
+
+    def test_same_as_loop(self):
+        for sig in self.signals():
+            for wintype in ['povey', 'hamming']:
+                for stride_trick in [True, False]:
+                    expected_frames, expected_raw_frames = loop_framesig(sig, 400, 160, wintype=wintype)
+                    frames, raw_frames = preprocess.framesig(sig, 400, 160, wintype=wintype, stride_trick=stride_trick)
+
+                    self.assertEqual(raw_frames.dtype, np.float32)
+                    np.testing.assert_array_equal(frames, expected_frames)
+                    np.testing.assert_array_equal(raw_frames, expected_raw_frames)
+
+    def test_window(self):
+        win = preprocess.get_window(400, 'povey')
+
+        self.assertIs(preprocess.get_window(400, 'povey'), win)
+        self.assertFalse(win.flags.writeable)
+        np.testing.assert_array_equal(preprocess.get_window(400, 'hamming'), np.hamming(400))
+
+    def test_dc_offset_and_preemphasis(self):
+        rs = np.random.RandomState(1)
+        frames = rs.randn(5, 50).astype(np.float32) + 1.0
+
+        for frame, emphasized in zip(frames.copy(), preprocess.do_preemphasis(frames, 0.97)):
+            np.testing.assert_array_equal(emphasized, np.append((1 - 0.97) * frame[0], frame[1:] - 0.97 * frame[:-1]))
+
+        expected = [frame - np.mean(frame) for frame in frames]
+        np.testing.assert_array_equal(preprocess.do_remove_dc_offset(frames), expected)
+
+        # a single signal is still supported
+        signal = rs.randn(50)
+        np.testing.assert_allclose(preprocess.do_remove_dc_offset(signal.copy()), signal - signal.mean())
+
+
+if __name__ == '__main__':
+    unittest.main()
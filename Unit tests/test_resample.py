@@ -0,0 +1,48 @@
+import math
+import unittest
+import numpy as np
+from allosaurus.audio import Audio, resample_audio, get_resample_filter, RESAMPLE_QUALITY
+
+
+def sine(frequency, sample_rate, duration=1.0):
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+    return (0.5 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+class TestResample(unittest.TestCase):
+
+    def test_length(self):
+        for sample_rate in [8000, 11025, 22050, 32000, 44100, 48000, 44056]:
+            for sample_size in [0, 1, 7, 999, sample_rate]:
+                samples = np.random.RandomState(0).randn(sample_size).astype(np.float32)
+                audio = resample_audio(Audio(samples, sample_rate), 16000)
+
+                self.assertEqual(audio.sample_rate, 16000)
+                self.assertEqual(len(audio.samples), math.ceil(sample_size * 16000 / sample_rate))
+                self.assertEqual(audio.samples.dtype, np.float32)
+
+    def test_accuracy(self):
+        # a tone below both nyquist frequencies is preserved, edges are skipped
+        for sample_rate in [8000, 22050, 44100, 48000]:
+            for quality in RESAMPLE_QUALITY:
+                audio = resample_audio(Audio(sine(440, sample_rate), sample_rate), 16000, quality)
+                error = audio.samples - sine(440, 16000)
+
+                self.assertLess(np.abs(error[800:-800]).max(), 1e-2, (sample_rate, quality))
+
+    def test_long_filter_fallback(self):
+        # 44056 -> 16000 reduces to 2000 / 5507, too long for a polyphase filter
+        self.assertIsNone(get_resample_filter(44056, 16000))
+
+        audio = resample_audio(Audio(sine(440, 44056), 44056), 16000)
+        error = audio.samples - sine(440, 16000)
+
+        self.assertLess(np.abs(error[800:-800]).max(), 1e-2)
+
+    def test_same_rate(self):
+        audio = Audio(sine(440, 16000), 16000)
+        self.assertIs(resample_audio(audio, 16000), audio)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+import numpy as np
+from helpers import make_model, read_test_recognizer, make_audio
+from scheduler import BatchScheduler, SchedulerClosed
+
+
+class RecordingBatch:
+    # recognize_batch recording the size of every batch
+
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    def __call__(self, audios):
+        self.batches.append(len(audios))
+
+        if self.error is not None:
+            raise self.error
+
+        return [audio * 2 for audio in audios]
+
+
+class TestBatchScheduler(unittest.TestCase):
+
+    def make_scheduler(self, recognize_batch, max_batch_size, max_wait):
+        scheduler = BatchScheduler(recognize_batch, max_batch_size, max_wait)
+        self.addCleanup(scheduler.close)
+
+        return scheduler
+
+    def test_flush_by_size(self):
+        recognize_batch = RecordingBatch()
+
+        # the batch is flushed when it is full, long before max_wait
+        scheduler = self.make_scheduler(recognize_batch, 4, 30)
+
+        start = time.monotonic()
+        futures = [scheduler.submit(i) for i in range(4)]
+
+        self.assertEqual([future.result(5) for future in futures], [0, 2, 4, 6])
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(recognize_batch.batches, [4])
+
+    def test_flush_by_wait(self):
+        recognize_batch = RecordingBatch()
+        scheduler = self.make_scheduler(recognize_batch, 8, 0.1)
+
+        start = time.monotonic()
+        futures = [scheduler.submit(i) for i in range(3)]
+
+        self.assertEqual([future.result(5) for future in futures], [0, 2, 4])
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual(recognize_batch.batches, [3])
+
+    def test_exception(self):
+        error = ValueError('bad batch')
+        scheduler = self.make_scheduler(RecordingBatch(error), 3, 30)
+
+        futures = [scheduler.submit(i) for i in range(3)]
+
+        for future in futures:
+            self.assertIs(future.exception(5), error)
+
+        # the worker keeps serving after a failed batch
+        scheduler.recognize_batch = RecordingBatch()
+        self.assertEqual([future.result(5) for future in [scheduler.submit(i) for i in range(3)]], [0, 2, 4])
+
+    def test_close(self):
+        recognize_batch = RecordingBatch()
+        scheduler = BatchScheduler(recognize_batch, 8, 30)
+
+        futures = [scheduler.submit(i) for i in range(3)]
+
+        # pending requests are flushed without waiting for max_wait
+        start = time.monotonic()
+        scheduler.close()
+
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual([future.result() for future in futures], [0, 2, 4])
+
+        with self.assertRaises(SchedulerClosed):
+            scheduler.submit(3)
+
+        # closing again is a no-op
+        scheduler.close()
+
+    def test_same_as_single(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            recognizer = read_test_recognizer(make_model(Path(temp_dir), cmvn='speaker'))
+
+        scheduler = self.make_scheduler(recognizer.recognize_batch_result, 4, 0.05)
+        auds = [make_audio(0.5 + 0.3 * seed, seed=seed) for seed in range(10)]
+
+        # requests arrive from several threads, as they do from the server
+        results = [None] * len(auds)
+
+        def request(i):
+            results[i] = scheduler.submit(auds[i]).result(30)
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(len(auds))]
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+
+        for aud, result in zip(auds, results):
+            expected = recognizer.recognize_result(aud)
+
+            self.assertEqual(result.to_list(), expected.to_list())
+            np.testing.assert_array_equal(result.frame_idx, expected.frame_idx)
+
+
+if __name__ == '__main__':
+    unittest.main()
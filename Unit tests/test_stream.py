@@ -0,0 +1,65 @@
+import copy
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+from allosaurus.app import compute_logits
+from allosaurus.audio import Audio
+from helpers import make_model, read_test_recognizer, make_audio
+
+
+def split_audio(audio, chunk_size):
+    return [Audio(audio.samples[i:i + chunk_size], audio.sample_rate) for i in range(0, len(audio.samples), chunk_size)]
+
+
+class TestRecognizerStream(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.recognizer = read_test_recognizer(make_model(Path(cls.temp_dir.name), cmvn='speaker'))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def decode_stream_features(self, chunks):
+        # decode the features of compute_stream in one pass
+        pm = copy.copy(self.recognizer.pm)
+        pm.reset()
+
+        feats = np.concatenate([pm.compute_stream(chunk, i == len(chunks) - 1) for i, chunk in enumerate(chunks)])
+        lprobs = compute_logits(self.recognizer.am, np.expand_dims(feats, 0), np.array([len(feats)], dtype=np.int32))
+
+        return self.recognizer.lm.decode(lprobs[0], 'ipa')
+
+    def test_unlimited_context(self):
+        for seed in range(5):
+            chunks = split_audio(make_audio(1.0 + 0.4 * seed, seed=seed), 1600)
+
+            session = self.recognizer.stream(chunk_size=8, left_context=10000, right_context=10000)
+            for i, chunk in enumerate(chunks):
+                session.feed(chunk, finish=i == len(chunks) - 1)
+
+            result = session.result()
+            expected = self.decode_stream_features(chunks)
+
+            self.assertGreater(len(expected), 0)
+            self.assertEqual(result.to_list(), expected.to_list())
+            np.testing.assert_array_equal(result.frame_idx, expected.frame_idx)
+
+    def test_incremental_results(self):
+        chunks = split_audio(make_audio(2.0), 1600)
+
+        session = self.recognizer.stream()
+        new_phones = []
+        for chunk in chunks:
+            new_phones.extend(session.feed(chunk).to_list())
+        new_phones.extend(session.finish().to_list())
+
+        # phones returned along the way add up to the whole result
+        self.assertEqual(new_phones, session.result().to_list())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import io
+import struct
+import unittest
+import numpy as np
+from processing.audio import load_stream, read_wav_header, WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_EXTENSIBLE
+
+# KSDATAFORMAT_SUBTYPE_PCM / _IEEE_FLOAT without their format code
+SUBFORMAT_GUID = b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+
+
+def make_wav(samples, dtype, sample_rate=16000, extensible=False, extra_chunk=False):
+    # samples: (frame, channel) float array in [-1, 1]
+    samples = np.asarray(samples, dtype=np.float64)
+    channel_number = samples.shape[1]
+    dtype = np.dtype(dtype)
+
+    if dtype.kind == 'f':
+        audio_format = WAVE_FORMAT_IEEE_FLOAT
+        data = samples.astype(dtype).tobytes()
+    else:
+        audio_format = WAVE_FORMAT_PCM
+        scale = 2 ** (8 * dtype.itemsize - 1)
+        data = np.clip(np.round(samples * scale), -scale, scale - 1).astype(dtype).tobytes()
+
+    sample_width = dtype.itemsize
+    fmt = struct.pack('<HHIIHH', WAVE_FORMAT_EXTENSIBLE if extensible else audio_format, channel_number, sample_rate,
+                      sample_rate * channel_number * sample_width, channel_number * sample_width, 8 * sample_width)
+
+    if extensible:
+        fmt += struct.pack('<HHI', 22, 8 * sample_width, 0) + struct.pack('<H', audio_format) + SUBFORMAT_GUID
+
+    chunks = b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+
+    # odd sized chunks are padded to a word
+    if extra_chunk:
+        chunks += b'LIST' + struct.pack('<I', 3) + b'abc\x00'
+
+    chunks += b'data' + struct.pack('<I', len(data)) + data
+
+    return b'RIFF' + struct.pack('<I', 4 + len(chunks)) + b'WAVE' + chunks
+
+
+class TestLoadStream(unittest.TestCase):
+
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.samples = np.clip(rs.randn(1000, 2) * 0.3, -1, 0.99)
+
+    def assert_samples(self, data, expected, atol, sample_rate=16000):
+        audio = load_stream(io.BytesIO(data))
+
+        self.assertIsNotNone(audio)
+        self.assertEqual(audio.sample_rate, sample_rate)
+        self.assertEqual(audio.samples.dtype, np.float32)
+        np.testing.assert_allclose(audio.samples, expected, atol=atol)
+
+    def test_formats(self):
+        mono = self.samples[:, :1]
+
+        for dtype, atol in [('<i2', 1 / 32768), ('<i4', 1e-6), ('<f4', 1e-7), ('<f8', 1e-7)]:
+            for extensible in [False, True]:
+                self.assert_samples(make_wav(mono, dtype, extensible=extensible), mono[:, 0], atol)
+
+    def test_stereo(self):
+        for dtype, atol in [('<i2', 1 / 32768), ('<f4', 1e-7)]:
+            self.assert_samples(make_wav(self.samples, dtype), self.samples.mean(axis=1), atol)
+
+    def test_chunks(self):
+        self.assert_samples(make_wav(self.samples[:, :1], '<i2', 8000, extra_chunk=True), self.samples[:, 0], 1 / 32768, 8000)
+
+    def test_resample(self):
+        audio = load_stream(io.BytesIO(make_wav(self.samples[:, :1], '<i2', 8000)), 16000)
+
+        self.assertEqual(audio.sample_rate, 16000)
+        self.assertEqual(len(audio.samples), 2000)
+
+    def test_unsupported(self):
+        # 8 bit pcm is left to librosa
+        self.assertIsNone(load_stream(io.BytesIO(make_wav(self.samples, '<i2').replace(b'\x10\x00data', b'\x08\x00data'))))
+        self.assertIsNone(load_stream(io.BytesIO(b'')))
+        self.assertIsNone(load_stream(io.BytesIO(b'ID3' + bytes(100))))
+
+    def test_truncated(self):
+        data = make_wav(self.samples, '<i2', extensible=True, extra_chunk=True)
+        header = read_wav_header(data)
+
+        for size in range(len(data)):
+            # the header is either rejected or parsed completely, only the data chunk may be cut
+            output = read_wav_header(data[:size])
+            if output is not None:
+                self.assertEqual(output, header)
+
+            audio = load_stream(io.BytesIO(data[:size]))
+            if audio is not None:
+                self.assertEqual(len(audio.samples), (size - header[4]) // 4)
+
+    def test_garbage(self):
+        rs = np.random.RandomState(0)
+        data = make_wav(self.samples, '<f4', extensible=True)
+
+        for trial in range(500):
+            # random bytes after the RIFF tag, and valid wavs with random bytes overwritten
+            corrupt = bytearray(data[:12] + rs.bytes(rs.randint(0, 100)) if trial % 2 else data)
+            for position in rs.randint(12, len(corrupt), size=rs.randint(1, 5)) if len(corrupt) > 12 else []:
+                corrupt[position] = rs.randint(256)
+
+            header = read_wav_header(bytes(corrupt))
+            if header is not None:
+                self.assertGreater(header[1], 0)
+                self.assertGreater(header[3], 0)
+
+            # random float samples might be nan
+            with np.errstate(invalid='ignore'):
+                load_stream(io.BytesIO(bytes(corrupt)))
+
+
+if __name__ == '__main__':
+    unittest.main()
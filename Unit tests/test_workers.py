@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from argparse import Namespace
+from pathlib import Path
+import numpy as np
+from allosaurus.audio import Audio
+from helpers import make_model, read_test_recognizer, make_audio
+from workers import WorkerPool
+
+
+class ExitOnUnpickle(np.ndarray):
+    # samples which terminate the worker receiving them, as an oom kill or a native crash would
+
+    def __reduce__(self):
+        return os._exit, (1,)
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        model_path = make_model(Path(cls.temp_dir.name))
+        inference_config = Namespace(model='test', device_id=-1, lang='ipa', approximate=False, prior=None)
+
+        cls.recognizer = read_test_recognizer(model_path)
+        cls.pool = WorkerPool({'test': cls.recognizer}, {'test': (inference_config, model_path)}, processes=1, threads=1, timeout=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+        cls.temp_dir.cleanup()
+
+    def assert_result(self, result, audio):
+        expected = self.recognizer.recognize_result(audio)
+
+        self.assertEqual(result.to_list(), expected.to_list())
+        np.testing.assert_array_equal(result.frame_idx, expected.frame_idx)
+
+    def test_same_as_in_process(self):
+        for seed in range(3):
+            audio = make_audio(1.0 + 0.5 * seed, seed=seed)
+            self.assert_result(self.pool.recognize('test', self.recognizer, audio), audio)
+
+    def test_worker_killed(self):
+        audio = make_audio(1.5, seed=3)
+        killer = Audio(audio.samples.view(ExitOnUnpickle), audio.sample_rate)
+
+        # the task dies with its worker, the request is answered in-process instead of waiting forever
+        self.assert_result(self.pool.recognize('test', self.recognizer, killer), audio)
+
+        # the pool replaced the worker
+        self.assert_result(self.pool.recognize('test', self.recognizer, audio), audio)
+
+
+if __name__ == '__main__':
+    unittest.main()
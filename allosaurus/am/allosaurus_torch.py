@@ -102,4 +102,47 @@ class AllosaurusTorchModel(nn.Module):
             return [(output_tensor.cpu(),input_lengths.cpu()), phone_tensor.transpose(0,1)]
         
         # return (B,T,H) for gathering
-        return phone_tensor.transpose(0,1) 
\ No newline at end of file
+        return phone_tensor.transpose(0,1) 
+
+class AllosaurusInferenceModel(nn.Module):
+
+    def __init__(self, model):
+        """
+        inference-only view of a trained AllosaurusTorchModel, it shares the model's layers
+        and has no python branching so that it can be compiled with TorchScript
+
+        :param model: AllosaurusTorchModel
+        """
+        super(AllosaurusInferenceModel, self).__init__()
+
+        # the weights only need to be flattened once instead of every forward
+        model.blstm_layer.flatten_parameters()
+
+        self.blstm_layer = model.blstm_layer
+        self.phone_layer = model.phone_layer
+
+    def forward(self, input_tensor: torch.Tensor, input_lengths: torch.Tensor) -> torch.Tensor:
+        """
+        same as AllosaurusTorchModel.forward without return_lstm and return_both
+
+        :param input_tensor: an Tensor with shape (B,T,H)
+        :param input_lengths: lengths of input_tensor in descending order
+        :return: phone logits with shape (B,T,P)
+        """
+
+        # (B,T,H) -> (T,B,H)
+        input_tensor = input_tensor.transpose(0, 1).float()
+
+        # keep the max length for padding
+        total_length = input_tensor.size(0)
+
+        # (T,B,H) -> PackSequence -> PackSequence
+        pack_sequence = nn.utils.rnn.pack_padded_sequence(input_tensor, input_lengths.cpu())
+        hidden_pack_sequence, _ = self.blstm_layer(pack_sequence)
+
+        # PackSequence -> (T,B,2H) -> (T,B,P)
+        output_tensor, _ = nn.utils.rnn.pad_packed_sequence(hidden_pack_sequence, total_length=total_length)
+        phone_tensor = self.phone_layer(output_tensor)
+
+        # return (B,T,P) for gathering
+        return phone_tensor.transpose(0, 1)
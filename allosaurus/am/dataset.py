@@ -2,11 +2,23 @@ from allosaurus.pm.kdict import read_matrix
 from pathlib import Path
 from torch.utils.data import Dataset
 import numpy as np
+import threading
+import struct
+import mmap
 
 class AllosaurusDataset(Dataset):
 
-    def __init__(self, data_path):
+    def __init__(self, data_path, use_mmap=True):
+        """
+        dataset of prepared features and tokens
+
+        :param data_path: directory containing feat.scp, feat.ark, token and shape
+        :param use_mmap: map feat.ark into memory and return read-only views of FM matrices instead of reading them,
+                         the pages are shared through the OS cache by all workers reading the same ark
+        """
+
         self.data_path = Path(data_path)
+        self.use_mmap = use_mmap
 
         required_files = ['feat.scp', 'token', 'feat.ark', 'shape']
 
@@ -21,8 +33,15 @@ class AllosaurusDataset(Dataset):
         self.utt2offset = {}
         self.utt2shape = {}
         self.ark = None
+        self.ark_lock = threading.Lock()
         self._read_feat()
 
+        # payload offset and shape of FM matrices in the mapped ark
+        self.ark_map = None
+        self.utt2view = {}
+        if self.use_mmap:
+            self._map_feat()
+
         # extract all valid utt_ids
         token_utt_set = set(self.utt2token.keys())
         feat_utt_set = set(self.utt2offset.keys())
@@ -41,18 +60,80 @@ class AllosaurusDataset(Dataset):
 
         token = self.utt2token[utt_id]
 
+        if utt_id in self.utt2view:
+
+            # the map is not inherited by spawned workers, it is mapped again on their first access
+            if self.ark_map is None:
+                self._open_map()
+
+            data_offset, row_size, col_size = self.utt2view[utt_id]
+            feature = np.frombuffer(self.ark_map, dtype='<f4', count=row_size * col_size, offset=data_offset).reshape(row_size, col_size)
+
+            return (feature, token)
+
         offset = self.utt2offset[utt_id]
 
-        self.ark.seek(offset)
+        # the shared handle is only used for DM/CM matrices or when mmap is disabled
+        with self.ark_lock:
+            if self.ark is None:
+                self.ark = open(self.data_path / 'feat.ark', 'rb')
 
-        feature = read_matrix(self.ark, np.float32)
+            self.ark.seek(offset)
+            feature = read_matrix(self.ark, np.float32)
 
         return (feature, token)
 
+    def __getstate__(self):
+
+        # file handles, the map and the lock are reopened in the worker process
+        state = self.__dict__.copy()
+        state['ark'] = None
+        state['ark_map'] = None
+        state['ark_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+        self.ark_lock = threading.Lock()
+
     def close(self):
 
         if self.ark:
             self.ark.close()
+            self.ark = None
+
+        # views returned by __getitem__ keep the map alive, it is unmapped once they are released
+        self.ark_map = None
+
+    def _open_map(self):
+
+        with open(self.data_path / 'feat.ark', 'rb') as f:
+            self.ark_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _map_feat(self):
+        """
+        map feat.ark and parse the header of each matrix once
+
+        :return:
+        """
+
+        if (self.data_path / 'feat.ark').stat().st_size == 0:
+            return
+
+        self._open_map()
+
+        # FM header: "\0B" "FM " then the row and column sizes, each stored as a 1-byte size and an int32
+        for utt_id, offset in self.utt2offset.items():
+            header = self.ark_map[offset:offset+15]
+
+            if len(header) < 15 or header[:5] != b'\0BFM ' or header[5] != 4 or header[10] != 4:
+                continue
+
+            row_size, = struct.unpack_from('<i', header, 6)
+            col_size, = struct.unpack_from('<i', header, 11)
+
+            self.utt2view[utt_id] = (offset + 15, row_size, col_size)
 
     def _read_token(self):
         """
@@ -106,7 +187,8 @@ class AllosaurusDataset(Dataset):
 
         feat_reader.close()
 
-        self.ark = open(self.data_path / 'feat.ark', 'rb')
+        if not self.use_mmap:
+            self.ark = open(self.data_path / 'feat.ark', 'rb')
 
         #####################################################################
         # read shape
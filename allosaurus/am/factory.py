@@ -1,14 +1,57 @@
-from allosaurus.am.allosaurus_torch import AllosaurusTorchModel
-from allosaurus.am.utils import *
 from allosaurus.lm.inventory import Inventory
 from allosaurus.lm.unit import write_unit
 import json
+import inspect
+import importlib.util
+import io
+import os
 from argparse import Namespace
 from allosaurus.model import get_model_path
 
+# torch is not required to serve the onnx backend, torch models and exports assert it is installed
+try:
+    import torch
+    from allosaurus.am.allosaurus_torch import AllosaurusTorchModel, AllosaurusInferenceModel
+    from allosaurus.am.utils import *
+except ImportError:
+    torch = None
+
 def read_am(model_path, inference_config):
     """
-    load pretrained acoustic model
+    load pretrained acoustic model,
+    the TorchScript graph exported by script_am is used when it is present and not older than model.pt.
+    if inference_config.quantize is set, a dynamic int8 model is used for cpu inference instead.
+    if inference_config.backend is 'onnx', the graph exported by export_onnx_am is run with onnxruntime
+
+    :param model_path: path to the
+    :return:
+    """
+
+    if getattr(inference_config, 'backend', 'torch') == 'onnx':
+        return read_onnx_am(model_path, inference_config)
+
+    assert torch is not None, "torch is not installed, use the onnx backend instead"
+
+    if getattr(inference_config, 'quantize', False):
+        assert inference_config.device_id < 0, "dynamic quantization only supports cpu inference"
+
+        quantized_path = model_path / 'model_quantized.pt'
+
+        if is_up_to_date(quantized_path, model_path / 'model.pt'):
+            return read_script_am(quantized_path, inference_config.device_id)
+
+        return quantize_model(read_torch_am(model_path, inference_config))
+
+    script_path = model_path / 'model_script.pt'
+
+    if getattr(inference_config, 'script', True) and is_up_to_date(script_path, model_path / 'model.pt'):
+        return read_script_am(script_path, inference_config.device_id)
+
+    return read_torch_am(model_path, inference_config)
+
+def read_torch_am(model_path, inference_config):
+    """
+    load pretrained acoustic model as an eager AllosaurusTorchModel
 
     :param model_path: path to the
     :return:
@@ -25,6 +68,167 @@ def read_am(model_path, inference_config):
 
     return model
 
+def read_script_am(script_path, device_id):
+    """
+    load the TorchScript graph of an acoustic model
+
+    :param script_path: path to model_script.pt
+    :param device_id: gpu id (-1 indicates cpu only)
+    :return:
+    """
+
+    if device_id >= 0:
+        model = torch.jit.load(str(script_path), map_location=torch.device(f'cuda:{device_id}'))
+    else:
+        model = torch.jit.load(str(script_path), map_location=torch.device('cpu'))
+
+    model.eval()
+
+    return model
+
+def script_am(model_path):
+    """
+    compile the pretrained acoustic model into an inference-only TorchScript graph and save it as model_script.pt,
+    read_am picks it up afterwards
+
+    :param model_path: path to the model
+    :return: the compiled model
+    """
+
+    inference_config = Namespace(device_id=-1)
+    model = read_torch_am(model_path, inference_config)
+    model.eval()
+
+    script_model = torch.jit.script(AllosaurusInferenceModel(model))
+    script_model.save(str(model_path / 'model_script.pt'))
+
+    return script_model
+
+def quantize_model(model):
+    """
+    quantize the lstm and linear layers of an AllosaurusTorchModel into dynamic int8 layers
+
+    :param model: AllosaurusTorchModel on cpu
+    :return: quantized AllosaurusInferenceModel
+    """
+
+    model.eval()
+
+    return torch.quantization.quantize_dynamic(AllosaurusInferenceModel(model), {torch.nn.LSTM, torch.nn.Linear}, dtype=torch.qint8)
+
+def quantize_am(model_path):
+    """
+    quantize the pretrained acoustic model and save its TorchScript graph as model_quantized.pt,
+    read_am picks it up when quantization is enabled
+
+    :param model_path: path to the model
+    :return: the quantized model
+    """
+
+    inference_config = Namespace(device_id=-1)
+    model = quantize_model(read_torch_am(model_path, inference_config))
+
+    script_model = torch.jit.script(model)
+    script_model.save(str(model_path / 'model_quantized.pt'))
+
+    return script_model
+
+def read_onnx_am(model_path, inference_config):
+    """
+    load the ONNX graph of an acoustic model with onnxruntime
+
+    :param model_path: path to the model, it should contain model.onnx
+    :return: AllosaurusOnnxModel
+    """
+
+    from allosaurus.am.onnx_model import AllosaurusOnnxModel
+
+    onnx_path = model_path / 'model.onnx'
+    torch_path = model_path / 'model.pt'
+
+    assert inference_config.device_id < 0, "the onnx backend only supports cpu inference"
+    assert onnx_path.exists(), "model.onnx does not exist, please export it with export_model -f onnx"
+
+    # model.pt might not be shipped with a torch-free deployment
+    assert not torch_path.exists() or is_up_to_date(onnx_path, torch_path), "model.onnx is older than model.pt, please export it again"
+
+    return AllosaurusOnnxModel(onnx_path, getattr(inference_config, 'threads', 0))
+
+def export_onnx_am(model_path, onnx_path=None):
+    """
+    export the pretrained acoustic model into an ONNX graph saved as model.onnx,
+    read_am runs it when the onnx backend is selected
+
+    :param model_path: path to the model
+    :param onnx_path: where to save the graph, model_path / 'model.onnx' by default
+    :return:
+    """
+
+    assert torch is not None, "torch is not installed, it is required to export the onnx graph"
+    assert importlib.util.find_spec('onnx') is not None, "onnx is not installed, please install it with pip install onnx"
+
+    inference_config = Namespace(device_id=-1)
+    model = read_torch_am(model_path, inference_config)
+    model.eval()
+
+    inference_model = AllosaurusInferenceModel(model)
+
+    # any input works for the export, batch and time are dynamic axes
+    feat = torch.zeros(1, 10, model.feat_size)
+    feat_len = torch.tensor([10], dtype=torch.int32)
+
+    # packed sequences are only supported by the TorchScript-based exporter, newer torch defaults to dynamo
+    export_options = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        export_options['dynamo'] = False
+
+    if onnx_path is None:
+        onnx_path = model_path / 'model.onnx'
+
+    torch.onnx.export(inference_model, (feat, feat_len), str(onnx_path),
+                      input_names=['feat', 'feat_len'], output_names=['logits'],
+                      dynamic_axes={'feat': {0: 'batch', 1: 'time'}, 'feat_len': {0: 'batch'}, 'logits': {0: 'batch', 1: 'time'}},
+                      opset_version=13, **export_options)
+
+def am_size(am):
+    """
+    number of bytes held by the weights of an acoustic model
+
+    :param am: eager or TorchScript model, or AllosaurusOnnxModel
+    :return:
+    """
+
+    # onnx sessions keep the weights of model.onnx
+    if torch is None or not isinstance(am, torch.nn.Module):
+        return os.path.getsize(am.path)
+
+    state = am.state_dict()
+
+    if len(state) > 0 and all(torch.is_tensor(value) for value in state.values()):
+        return sum(value.numel() * value.element_size() for value in state.values())
+
+    # quantized weights are packed into script objects, only their serialized form tells their size
+    buffer = io.BytesIO()
+
+    if isinstance(am, torch.jit.ScriptModule):
+        torch.jit.save(am, buffer)
+    else:
+        torch.save(state, buffer)
+
+    return buffer.getbuffer().nbytes
+
+def is_up_to_date(artifact_path, model_path):
+    """
+    check whether an artifact derived from model.pt exists and was written after model.pt,
+    fine-tuning rewrites model.pt and makes old artifacts stale
+
+    :param artifact_path: path to the derived artifact
+    :param model_path: path to model.pt
+    :return: bool
+    """
+
+    return artifact_path.exists() and artifact_path.stat().st_mtime >= model_path.stat().st_mtime
+
 def transfer_am(train_config):
     """
     initialize the acoustic model with a pretrained model for fine-tuning
@@ -1,6 +1,13 @@
 from allosaurus.am.dataset import AllosaurusDataset
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import numpy as np
 
+# torch is only needed to pin prefetched batches
+try:
+    import torch
+except ImportError:
+    torch = None
+
 def read_loader(data_path, train_config):
     """
     create a dataloader for data_path
@@ -10,7 +17,13 @@ def read_loader(data_path, train_config):
     :return:
     """
 
-    return AllosaurusLoader(data_path, train_config)
+    loader = AllosaurusLoader(data_path, train_config)
+
+    # prepare the next batches in background while the current one is trained
+    if getattr(train_config, 'prefetch_size', 0) > 0:
+        loader = PrefetchLoader(loader, train_config)
+
+    return loader
 
 
 class AllosaurusLoader:
@@ -21,6 +34,12 @@ class AllosaurusLoader:
 
         self.dataset = AllosaurusDataset(data_path)
 
+        # number of frames of each utterance, utterances are sorted from the longest one
+        self.frame_sizes = np.array([self.dataset.utt2shape[utt_id][0] for utt_id in self.dataset.utt_ids], dtype=np.int64)
+
+        # relative noise added to the frame sizes when utterances are re-bucketed in each epoch
+        self.bucket_noise = getattr(train_config, 'bucket_noise', 0.0)
+
         self.batch_lst = []
 
         self._prepare_batch()
@@ -32,8 +51,30 @@ class AllosaurusLoader:
         self.dataset.close()
 
     def shuffle(self):
+
+        # re-bucket with noisy frame sizes, so that an utterance is batched with different neighbors in each epoch
+        if self.bucket_noise > 0:
+            self._prepare_batch(self.bucket_noise)
+
         np.random.shuffle(self.batch_lst)
 
+    def padding_efficiency(self):
+        """
+        ratio of real frames to padded frames over all batches (1.0 means no padding)
+
+        :return:
+        """
+
+        frame_size = 0
+        padded_frame_size = 0
+
+        for batch in self.batch_lst:
+            frame_sizes = self.frame_sizes[batch]
+            frame_size += frame_sizes.sum()
+            padded_frame_size += frame_sizes.max() * len(batch)
+
+        return frame_size / max(padded_frame_size, 1)
+
     def read_batch(self, batch_idx):
         assert batch_idx < len(self.batch_lst), "batch_idx "+str(batch_idx)+" is too large!!"
 
@@ -59,7 +100,7 @@ class AllosaurusLoader:
     def _collate_feat(self, feat_lst):
 
         batch_size = len(feat_lst)
-        frame_size = feat_lst[0].shape[0]
+        frame_size = max([len(feat) for feat in feat_lst])
         feat_size = feat_lst[0].shape[1]
 
         # collate feats
@@ -88,31 +129,146 @@ class AllosaurusLoader:
         return token_tensor, token_lengths
 
 
-    def _prepare_batch(self):
+    def _prepare_batch(self, noise=0.0):
+        """
+        bucket utterances of similar lengths into batches, the padded size of each batch (batch size x its longest utterance)
+        is at most batch_frame_size. an utterance longer than batch_frame_size is a batch by itself
 
-        batch = []
-        batch_frame_size = 0
+        :param noise: utterances are sorted by frame sizes scaled by a random factor in [1-noise, 1+noise]
+        :return:
+        """
+
+        if noise > 0:
+            order = np.argsort(-self.frame_sizes * np.random.uniform(1.0 - noise, 1.0 + noise, len(self.frame_sizes)), kind='stable')
+        else:
+            order = np.arange(len(self.frame_sizes))
 
-        for i in range(len(self.dataset)):
-            utt_id = self.dataset.utt_ids[i]
+        self.batch_lst = []
 
-            frame_size = self.dataset.utt2shape[utt_id][0]
+        batch = []
+        max_frame_size = 0
 
-            # batch frame is large enough
-            if batch_frame_size + frame_size >= self.train_config.batch_frame_size:
+        for i in order:
+            frame_size = self.frame_sizes[i]
 
-                # commit current batch to the list
-                self.batch_lst.append(batch)
+            # padded size is too large if this utterance joins the batch
+            if len(batch) > 0 and max(max_frame_size, frame_size) * (len(batch) + 1) > self.train_config.batch_frame_size:
 
-                # reset frame size
-                batch_frame_size = 0
+                self._commit_batch(batch)
 
                 # reset batch
                 batch = []
+                max_frame_size = 0
+
+            max_frame_size = max(max_frame_size, frame_size)
+            batch.append(int(i))
+
+        # commit the last batch
+        if len(batch) > 0:
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+
+        # the acoustic model packs sequences sorted from the longest one
+        batch = sorted(batch, key=lambda i: (-self.frame_sizes[i], i))
+        self.batch_lst.append(batch)
+
+
+class PrefetchLoader:
+
+    def __init__(self, loader, train_config):
+        """
+        wrapper of AllosaurusLoader which reads and collates the next prefetch_size batches in background,
+        so that disk reads and padding overlap with the training step
+
+        :param loader: AllosaurusLoader
+        :param train_config: prefetch_size, prefetch_workers, prefetch_process (collate in processes instead of threads) and pin_memory
+        """
+
+        self.loader = loader
+        self.train_config = train_config
+
+        self.prefetch_size = train_config.prefetch_size
+        self.pin_memory = getattr(train_config, 'pin_memory', False)
+
+        if self.pin_memory:
+            assert torch is not None and torch.cuda.is_available(), "pin_memory requires torch with cuda"
+
+        workers = max(1, getattr(train_config, 'prefetch_workers', 1))
+
+        # collating in processes avoids the GIL, the threads then only wait for the processes and pin the results
+        self.process_pool = None
+        if getattr(train_config, 'prefetch_process', False):
+            self.process_pool = ProcessPoolExecutor(workers, initializer=_init_prefetch_worker, initargs=(loader,))
+
+        self.thread_pool = ThreadPoolExecutor(workers)
+
+        # batch_idx -> future of the collated batch
+        self.futures = {}
+
+    def __len__(self):
+        return len(self.loader)
+
+    def close(self):
+        self._cancel()
+
+        self.thread_pool.shutdown(wait=True)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=True)
+
+        self.loader.close()
+
+    def shuffle(self):
+        # prefetched batches follow the old order
+        self._cancel()
+        self.loader.shuffle()
+
+    def padding_efficiency(self):
+        return self.loader.padding_efficiency()
+
+    def read_batch(self, batch_idx):
+        assert batch_idx < len(self.loader), "batch_idx "+str(batch_idx)+" is too large!!"
+
+        # schedule this batch and the following ones
+        for idx in range(batch_idx, min(batch_idx + self.prefetch_size + 1, len(self.loader))):
+            if idx not in self.futures:
+                self.futures[idx] = self.thread_pool.submit(self._read_batch, self.loader.batch_lst[idx])
+
+        # drop batches which are skipped
+        for idx in [idx for idx in self.futures if idx < batch_idx]:
+            self.futures.pop(idx).cancel()
+
+        return self.futures.pop(batch_idx).result()
+
+    def _read_batch(self, batch):
+
+        if self.process_pool is not None:
+            feat_batch, token_batch = self.process_pool.submit(_collate_batch, batch).result()
+        else:
+            feat_batch, token_batch = self.loader._collate_batch(batch)
+
+        # page-locked feats can be copied to gpu asynchronously, lengths and tokens are still needed as ndarray
+        if self.pin_memory:
+            feat, feat_lengths = feat_batch
+            feat_batch = (torch.from_numpy(feat).pin_memory(), feat_lengths)
+
+        return feat_batch, token_batch
+
+    def _cancel(self):
+        for future in self.futures.values():
+            future.cancel()
+
+        self.futures = {}
+
+
+# loader of the prefetching processes
+_prefetch_loader = None
+
+
+def _init_prefetch_worker(loader):
+    global _prefetch_loader
+    _prefetch_loader = loader
 
-            batch_frame_size += frame_size
-            batch.append(i)
 
-        # commit the last batch if it is a valid batch
-        if len(batch) > 0 and batch_frame_size < self.train_config.batch_frame_size:
-            self.batch_lst.append(batch)
\ No newline at end of file
+def _collate_batch(batch):
+    return _prefetch_loader._collate_batch(batch)
@@ -0,0 +1,46 @@
+import numpy as np
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+
+class AllosaurusOnnxModel:
+
+    def __init__(self, onnx_path, threads=0):
+        """
+        acoustic model backend running the ONNX graph exported by export_onnx_am with onnxruntime on cpu,
+        it does not need torch
+
+        :param onnx_path: path to model.onnx
+        :param threads: intra-op threads of onnxruntime, 0 keeps the onnxruntime default
+        """
+
+        assert onnxruntime is not None, "onnxruntime is not installed, please install it with pip install onnxruntime to use the onnx backend"
+
+        self.path = str(onnx_path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        if threads > 0:
+            options.intra_op_num_threads = threads
+
+        self.session = onnxruntime.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+
+    def __call__(self, input_tensor, input_lengths):
+        """
+        same interface as AllosaurusTorchModel.forward
+
+        :param input_tensor: features with shape (B,T,H), numpy array or cpu tensor
+        :param input_lengths: lengths of input_tensor in descending order
+        :return: numpy logits with shape (B,T,P)
+        """
+
+        feed = {
+            'feat': np.asarray(input_tensor, dtype=np.float32),
+            'feat_len': np.asarray(input_lengths, dtype=np.int32),
+        }
+
+        return self.session.run(['logits'], feed)[0]
@@ -9,6 +9,7 @@ from itertools import groupby
 from allosaurus.model import get_model_path
 import os
 import json
+import time
 
 class Trainer:
 
@@ -44,18 +45,7 @@ class Trainer:
 
         """
 
-        error_cnt_sum = 0.0
-
-        for i in range(len(token_lengths_ndarray)):
-            target_list = token_ndarray[i, :token_lengths_ndarray[i]].tolist()
-            logit = output_ndarray[i][:output_lengths_ndarray[i]]
-
-            raw_token = [x[0] for x in groupby(np.argmax(logit, axis=1))]
-            decoded_token = list(filter(lambda a: a != 0, raw_token))
-
-            error_cnt_sum += editdistance.distance(target_list, decoded_token)
-
-        return error_cnt_sum
+        return sum_edit_distance(output_ndarray, output_lengths_ndarray, token_ndarray, token_lengths_ndarray)
 
 
     def step(self, feat_batch, token_batch):
@@ -107,12 +97,23 @@ class Trainer:
             all_loss_sum = 0.0
             all_phone_error_sum = 0.0
 
+            # time spent waiting for batches, since the last report and in the whole epoch
+            all_data_time = 0.0
+            report_start = time.perf_counter()
+            epoch_data_time = 0.0
+            epoch_start = report_start
+
             # training loop
             for ii in range(batch_count):
 
                 self.optimizer.zero_grad()
 
+                data_start = time.perf_counter()
                 feat_batch, token_batch = train_loader.read_batch(ii)
+                data_time = time.perf_counter() - data_start
+
+                all_data_time += data_time
+                epoch_data_time += data_time
 
                 # forward step
                 loss_tensor, phone_error_sum, phone_count = self.step(feat_batch, token_batch)
@@ -131,14 +132,21 @@ class Trainer:
                 all_phone_error_sum += phone_error_sum
 
                 if ii % self.train_config.report_per_batch == 0:
-                    message = f'epoch[batch]: {epoch:02d}[{ii:04d}] | train loss {all_loss_sum/all_phone_count:0.5f} train per {all_phone_error_sum / all_phone_count:0.5f}'
+                    report_time = time.perf_counter() - report_start
+                    message = f'epoch[batch]: {epoch:02d}[{ii:04d}] | train loss {all_loss_sum/all_phone_count:0.5f} train per {all_phone_error_sum / all_phone_count:0.5f}' \
+                              f' | data wait {all_data_time:0.2f}s ({all_data_time / report_time:0.1%})'
                     self.reporter.write(message)
 
                     # reset all stats
                     all_phone_count = 0.0
                     all_loss_sum = 0.0
                     all_phone_error_sum = 0.0
+                    all_data_time = 0.0
+                    report_start = time.perf_counter()
 
+            epoch_time = time.perf_counter() - epoch_start
+            self.reporter.write(f"epoch{epoch} | train time {epoch_time:0.2f}s data wait {epoch_data_time:0.2f}s ({epoch_data_time / epoch_time:0.1%})"
+                                f" padding efficiency {train_loader.padding_efficiency():0.1%}")
 
             # evaluate this model
             validate_phone_error_rate = self.validate(validate_loader)
@@ -192,3 +200,61 @@ class Trainer:
             all_phone_count += phone_count
 
         return all_phone_error_sum/all_phone_count
+
+
+def sum_edit_distance(output_ndarray, output_lengths_ndarray, token_ndarray, token_lengths_ndarray):
+    """
+    compute SUM of ter in this batch
+
+    """
+
+    error_cnt_sum = 0.0
+
+    for i in range(len(token_lengths_ndarray)):
+        target_list = token_ndarray[i, :token_lengths_ndarray[i]].tolist()
+        logit = output_ndarray[i][:output_lengths_ndarray[i]]
+
+        raw_token = [x[0] for x in groupby(np.argmax(logit, axis=1))]
+        decoded_token = list(filter(lambda a: a != 0, raw_token))
+
+        error_cnt_sum += editdistance.distance(target_list, decoded_token)
+
+    return error_cnt_sum
+
+
+def evaluate_per(model, validate_loader, device_id=-1):
+    """
+    compute the phone error rate of an inference model on a loader, scored the same way as Trainer.validate.
+    it works with any acoustic model backend returned by read_am
+
+    :param model: callable with the (feat, feat_len) interface
+    :param validate_loader: AllosaurusLoader
+    :param device_id: gpu id (-1 indicates cpu only)
+    :return: phone error rate
+    """
+
+    all_phone_error_sum = 0
+    all_phone_count = 0
+
+    for ii in range(len(validate_loader)):
+
+        feat_batch, token_batch = validate_loader.read_batch(ii)
+
+        feat_tensor, feat_lengths_tensor = move_to_tensor(feat_batch, device_id)
+
+        with torch.no_grad():
+            output = model(feat_tensor, feat_lengths_tensor)
+
+        # the onnx backend returns numpy arrays
+        if isinstance(output, np.ndarray):
+            output_ndarray = output
+        else:
+            output_ndarray = output.cpu().numpy()
+
+        feat_ndarray, feat_lengths_ndarray = feat_batch
+        token_ndarray, token_lengths_ndarray = token_batch
+
+        all_phone_error_sum += sum_edit_distance(output_ndarray, feat_lengths_ndarray, token_ndarray, token_lengths_ndarray)
+        all_phone_count += sum(token_lengths_ndarray)
+
+    return all_phone_error_sum/all_phone_count
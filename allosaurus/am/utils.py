@@ -125,7 +125,8 @@ def apply_to_ndarray(f, sample):
 def tensor_to_cuda(sample, device_id=0):
 
     def _move_to_cuda(tensor):
-        return tensor.to(device_id)
+        # asynchronous when the tensor is pinned (see PrefetchLoader)
+        return tensor.to(device_id, non_blocking=True)
 
     return apply_to_tensor(_move_to_cuda, sample)
 
@@ -1,4 +1,3 @@
-from allosaurus.am.utils import *
 from pathlib import Path
 import allosaurus.audio
 from allosaurus.pm.factory import read_pm
@@ -6,8 +5,17 @@ from allosaurus.am.factory import read_am
 from allosaurus.lm.factory import read_lm
 from allosaurus.bin.download_model import download_model
 from allosaurus.model import resolve_model_name, get_all_models
+from allosaurus.lm.result import PhoneResult
 from argparse import Namespace
 from io import BytesIO
+import numpy as np
+import copy
+
+try:
+    import torch
+    from allosaurus.am.utils import move_to_tensor
+except ImportError:
+    torch = None
 
 def read_recognizer(inference_config_or_name='latest', alt_model_path=None):
     if alt_model_path:
@@ -46,6 +54,28 @@ def read_recognizer(inference_config_or_name='latest', alt_model_path=None):
 
     return Recognizer(pm, am, lm, inference_config)
 
+def compute_logits(am, feats, feat_len, device_id=-1):
+    """
+    run the acoustic model on padded features, torch modules and the onnx backend are both supported
+
+    :param am: acoustic model returned by read_am
+    :param feats: (B,T,H) numpy features
+    :param feat_len: (B,) lengths in descending order
+    :param device_id: gpu id (-1 indicates cpu only)
+    :return: (B,T,P) numpy logits
+    """
+
+    # the onnx backend works on numpy arrays directly
+    if torch is None or not isinstance(am, torch.nn.Module):
+        return am(feats, feat_len)
+
+    tensor_feat, tensor_feat_len = move_to_tensor([feats, feat_len], device_id)
+
+    with torch.no_grad():
+        tensor_lprobs = am(tensor_feat, tensor_feat_len)
+
+    return tensor_lprobs.cpu().numpy()
+
 class Recognizer:
 
     def __init__(self, pm, am, lm, config):
@@ -60,6 +90,15 @@ class Recognizer:
 
         return self.lm.inventory.is_available(lang_id)
 
+    def stream(self, lang_id='ipa', topk=1, emit=1.0, chunk_size=8, left_context=16, right_context=8):
+        """
+        start a streaming recognition session, see RecognizerStream
+
+        :return: RecognizerStream
+        """
+
+        return RecognizerStream(self, lang_id, topk, emit, chunk_size, left_context, right_context)
+
     def recognize(self, aud, lang_id='ipa', topk=1, emit=1.0, timestamp=False):
         # # recognize a single file
         #
@@ -70,21 +109,214 @@ class Recognizer:
         # # load wav audio
         # aud = allosaurus.allosaurus.audio.read_audio(filename)
 
+        return self.recognize_result(aud, lang_id, topk, emit).format(timestamp)
+
+    def recognize_result(self, aud, lang_id='ipa', topk=1, emit=1.0):
+        """
+        recognize a single audio into a structured result
+
+        :param aud: allosaurus.audio.Audio
+        :return: PhoneResult with phone ids, frames, probs and timestamps, use str() or format() to get the text output
+        """
+
+        return self.recognize_batch_result([aud], lang_id, topk, emit)[0]
+
+    def recognize_batch(self, auds, lang_id='ipa', topk=1, emit=1.0, timestamp=False):
+        """
+        recognize a list of audios, the output of each audio is the same as recognize
+
+        :param auds: list of allosaurus.audio.Audio
+        :return: list of str
+        """
+
+        return [result.format(timestamp) for result in self.recognize_batch_result(auds, lang_id, topk, emit)]
+
+    def recognize_batch_result(self, auds, lang_id='ipa', topk=1, emit=1.0):
+        """
+        recognize a list of audios with a single forward of the acoustic model
+
+        :param auds: list of allosaurus.audio.Audio
+        :return: list of PhoneResult in the same order as auds
+        """
+
+        if len(auds) == 0:
+            return []
+
         # extract feature
-        feat = self.pm.compute(aud)
+        feat_lst = [self.pm.compute(aud) for aud in auds]
+
+        # packing the batch in the acoustic model requires descending lengths
+        order = sorted(range(len(feat_lst)), key=lambda i: feat_lst[i].shape[0], reverse=True)
+
+        # pad all features to the longest one
+        feat_len = np.array([feat_lst[i].shape[0] for i in order], dtype=np.int32)
+        feats = np.zeros([len(order), feat_len[0], feat_lst[0].shape[1]], dtype=feat_lst[0].dtype)
+
+        for row, i in enumerate(order):
+            feats[row, :feat_len[row]] = feat_lst[i]
+
+        batch_lprobs = compute_logits(self.am, feats, feat_len, self.config.device_id)
+
+        # decode each utterance without its padding frames
+        results = [None] * len(order)
+        for row, i in enumerate(order):
+            results[i] = self.lm.decode(batch_lprobs[row, :feat_len[row]], lang_id, topk, emit=emit)
+
+        return results
+
+
+class RecognizerStream:
+
+    def __init__(self, recognizer, lang_id='ipa', topk=1, emit=1.0, chunk_size=8, left_context=16, right_context=8):
+        """
+        RecognizerStream recognizes an utterance chunk by chunk.
+
+        the acoustic model is bidirectional, so feature frames are recognized in chunks of chunk_size frames,
+        each chunk is run together with left_context previous frames and right_context lookahead frames,
+        and only the logits of the chunk itself are kept and decoded.
+
+        a feature frame covers 30ms, so a phone is returned (right_context + chunk_size - 1) to right_context frames
+        after it is spoken, 240ms to 450ms with the defaults. lower chunk_size and right_context reduce the latency
+        at the cost of accuracy.
+
+        the result is not the same as recognize_result even with unlimited context: the features are computed by
+        compute_stream, which normalizes with running cmvn statistics and repeats the edge windows instead of
+        wrapping around the utterance. with unlimited context the result equals decoding those features at once.
+
+        :param recognizer: Recognizer
+        :param chunk_size: number of feature frames decoded each time
+        :param left_context: number of previous feature frames given to the acoustic model
+        :param right_context: number of lookahead feature frames, a chunk is decoded only after they arrive
+        """
 
-        # add batch dim
-        feats = np.expand_dims(feat, 0)
-        feat_len = np.array([feat.shape[0]], dtype=np.int32)
+        self.recognizer = recognizer
+        self.config = recognizer.config
 
-        tensor_batch_feat, tensor_batch_feat_len = move_to_tensor([feats, feat_len], self.config.device_id)
+        self.lang_id = lang_id
+        self.topk = topk
+        self.emit = emit
 
-        tensor_batch_lprobs = self.am(tensor_batch_feat, tensor_batch_feat_len)
+        self.chunk_size = chunk_size
+        self.left_context = left_context
+        self.right_context = right_context
 
-        if self.config.device_id >= 0:
-            batch_lprobs = tensor_batch_lprobs.cpu().detach().numpy()
+        # each session needs its own feature streaming states
+        self.pm = copy.copy(recognizer.pm)
+        self.pm.reset()
+
+        # feature frames from feat_offset, they are kept until no chunk needs them as context
+        self.feats = None
+        self.feat_offset = 0
+
+        # index of the first frame which is not decoded yet
+        self.decoded_index = 0
+
+        # decoded phones of all chunks
+        self.results = []
+
+    def feed(self, aud, finish=False):
+        """
+        feed the next audio chunk
+
+        :param aud: allosaurus.audio.Audio
+        :param finish: this is the last chunk, all remaining frames are decoded
+        :return: PhoneResult with phones which are newly decoded from this chunk
+        """
+
+        feat = self.pm.compute_stream(aud, finish)
+
+        if self.feats is None:
+            self.feats = feat
         else:
-            batch_lprobs = tensor_batch_lprobs.detach().numpy()
+            self.feats = np.concatenate((self.feats, feat))
+
+        frame_cnt = self.feat_offset + len(self.feats)
+        new_results = []
+
+        while self.decoded_index < frame_cnt:
+
+            chunk_end = min(self.decoded_index + self.chunk_size, frame_cnt)
+
+            # wait for the lookahead frames unless the utterance is finished
+            if not finish and (chunk_end - self.decoded_index < self.chunk_size or chunk_end + self.right_context > frame_cnt):
+                break
+
+            result = self.decode_chunk(self.decoded_index, chunk_end, frame_cnt)
+            if result is not None:
+                self.results.append(result)
+                new_results.append(result)
+
+            self.decoded_index = chunk_end
+
+        # drop frames which are not needed as left context anymore
+        first_needed = max(self.decoded_index - self.left_context, 0)
+        if first_needed > self.feat_offset:
+            self.feats = self.feats[first_needed - self.feat_offset:]
+            self.feat_offset = first_needed
+
+        return self.merge(new_results)
+
+    def finish(self, aud=None):
+        """
+        finish the utterance
+
+        :param aud: optional last audio chunk
+        :return: PhoneResult with phones which are newly decoded
+        """
+
+        if aud is None:
+            aud = allosaurus.audio.Audio(np.zeros(0, dtype=np.float32), self.pm.sample_rate)
+
+        return self.feed(aud, finish=True)
+
+    def result(self):
+        """
+        all phones decoded so far
+
+        :return: PhoneResult
+        """
+
+        return self.merge(self.results)
+
+    def decode_chunk(self, chunk_start, chunk_end, frame_cnt):
+
+        window_start = max(chunk_start - self.left_context, 0)
+        window_end = min(chunk_end + self.right_context, frame_cnt)
+
+        feats = self.feats[window_start - self.feat_offset:window_end - self.feat_offset]
+        feats = np.expand_dims(feats, 0)
+        feat_len = np.array([feats.shape[1]], dtype=np.int32)
+
+        lprobs = compute_logits(self.recognizer.am, feats, feat_len, self.config.device_id)[0, chunk_start - window_start:chunk_end - window_start]
+
+        result = self.recognizer.lm.decode(lprobs, self.lang_id, self.topk, emit=self.emit)
+        result.frame_idx = result.frame_idx + chunk_start
+
+        # ctc collapses the same phone across the chunk boundary
+        if len(result) > 0 and len(self.results) > 0:
+            last_result = self.results[-1]
+            if last_result.domain_ids[-1, 0] == result.domain_ids[0, 0]:
+                result.frame_idx = result.frame_idx[1:]
+                result.domain_ids = result.domain_ids[1:]
+                result.probs = result.probs[1:]
+
+        if len(result) == 0:
+            return None
+
+        return result
+
+    def merge(self, results):
+
+        if len(results) == 0:
+            mask = self.recognizer.lm.inventory.get_mask(self.lang_id, approximation=self.config.approximate)
+            return PhoneResult(mask, np.zeros(0, dtype=np.int64), np.zeros((0, self.topk), dtype=np.int64),
+                               np.zeros((0, self.topk), dtype=np.float32), self.config.window_shift, self.config.window_size)
+
+        if len(results) == 1:
+            return results[0]
 
-        token = self.lm.compute(batch_lprobs[0], lang_id, topk, emit=emit, timestamp=timestamp)
-        return token
+        return PhoneResult(results[-1].mask,
+                           np.concatenate([result.frame_idx for result in results]),
+                           np.concatenate([result.domain_ids for result in results]),
+                           np.concatenate([result.probs for result in results]),
+                           self.config.window_shift, self.config.window_size)
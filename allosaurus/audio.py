@@ -1,7 +1,23 @@
 import wave
+import math
+import threading
 import numpy as np
 from pathlib import Path
-import resampy
+from scipy.signal import firwin, upfirdn, resample
+
+# resampling quality: (zero crossings on each side of the low-pass filter, kaiser window beta)
+RESAMPLE_QUALITY = {
+    'low': (8, 5.0),
+    'medium': (16, 8.0),
+    'high': (32, 10.0),
+}
+
+# longest polyphase filter, rate pairs with a larger reduced ratio (e.g. 44056 -> 16000) are resampled in the frequency domain
+MAX_RESAMPLE_TAPS = 65536
+
+# polyphase filters keyed by (sample_rate, target_sample_rate, quality)
+_resample_filter_cache = {}
+_resample_filter_lock = threading.Lock()
 
 
 def read_audio(filename, header_only=False, channel=0):
@@ -51,12 +67,60 @@ def read_audio(filename, header_only=False, channel=0):
     return audio
 
 
-def resample_audio(audio, target_sample_rate):
+def get_resample_filter(sample_rate, target_sample_rate, quality='medium'):
+    """
+    get the polyphase low-pass filter to resample from sample_rate to target_sample_rate,
+    the filter is designed once for each rate pair and quality
+
+    :param sample_rate:
+    :param target_sample_rate:
+    :param quality: one of RESAMPLE_QUALITY
+    :return: (up, down, filter, half_len), the float32 filter is zero-padded so that outputs are centered.
+             None if the filter would be longer than MAX_RESAMPLE_TAPS
     """
-    resample the audio by the target_sample_rate
+
+    assert quality in RESAMPLE_QUALITY, "quality should be one of "+str(list(RESAMPLE_QUALITY.keys()))
+
+    key = (sample_rate, target_sample_rate, quality)
+
+    with _resample_filter_lock:
+        if key in _resample_filter_cache:
+            return _resample_filter_cache[key]
+
+    zero_crossings, beta = RESAMPLE_QUALITY[quality]
+
+    g = math.gcd(sample_rate, target_sample_rate)
+    up = target_sample_rate // g
+    down = sample_rate // g
+
+    # linear phase low-pass filter at the lower nyquist frequency
+    max_rate = max(up, down)
+    half_len = zero_crossings * max_rate
+
+    if 2 * half_len + 1 > MAX_RESAMPLE_TAPS:
+        resample_filter = None
+    else:
+        h = firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', beta)) * up
+
+        # pad the filter so that outputs are aligned with the input samples
+        pre_pad = down - half_len % down
+        h = np.concatenate((np.zeros(pre_pad), h)).astype(np.float32)
+
+        resample_filter = (up, down, h, half_len + pre_pad)
+
+    with _resample_filter_lock:
+        _resample_filter_cache[key] = resample_filter
+
+    return resample_filter
+
+
+def resample_audio(audio, target_sample_rate, quality='medium'):
+    """
+    resample the audio by the target_sample_rate with a cached polyphase filter
 
     :param audio:
     :param target_sample_rate:
+    :param quality: one of RESAMPLE_QUALITY
     :return:
     """
 
@@ -64,7 +128,33 @@ def resample_audio(audio, target_sample_rate):
     if audio.sample_rate == target_sample_rate:
         return audio
 
-    new_samples = resampy.resample(audio.samples, audio.sample_rate, target_sample_rate)
+    resample_filter = get_resample_filter(audio.sample_rate, target_sample_rate, quality)
+
+    samples = np.asarray(audio.samples, dtype=np.float32)
+    sample_size = len(samples)
+
+    if resample_filter is None:
+        g = math.gcd(audio.sample_rate, target_sample_rate)
+        new_sample_size = (sample_size * (target_sample_rate // g) + audio.sample_rate // g - 1) // (audio.sample_rate // g)
+
+        if sample_size == 0:
+            return Audio(samples, target_sample_rate)
+
+        return Audio(resample(samples, new_sample_size).astype(np.float32), target_sample_rate)
+
+    up, down, h, pre_remove = resample_filter
+
+    new_sample_size = (sample_size * up + down - 1) // down
+    pre_remove = pre_remove // down
+
+    # the filter rarely needs more zeros to produce all outputs:
+    # upfirdn returns ((sample_size - 1) * up + len(h) + post_pad - 1) // down + 1 outputs
+    post_pad = max((new_sample_size + pre_remove - 1) * down - ((sample_size - 1) * up + len(h) - 1), 0)
+
+    if post_pad > 0:
+        h = np.concatenate((h, np.zeros(post_pad, dtype=np.float32)))
+
+    new_samples = upfirdn(h, samples, up, down)[pre_remove:pre_remove + new_sample_size]
 
     new_audio = Audio(new_samples, target_sample_rate)
 
@@ -17,7 +17,8 @@ if __name__ == '__main__':
     parser.add_argument('--device_id',        required=True, type=int, help='gpu cuda_device_id. use -1 if you do not have gpu')
 
     # non required options
-    parser.add_argument('--batch_frame_size', type=int,   default=6000,  help='this indicates how many frame in each batch, if you get any memory related errors, please use a lower value for this size')
+    parser.add_argument('--batch_frame_size', type=int,   default=6000,  help='this indicates how many frame (including padding) in each batch, if you get any memory related errors, please use a lower value for this size')
+    parser.add_argument('--bucket_noise',     type=float, default=0.0,   help='randomness of the length bucketing in each epoch (e.g. 0.1), utterance lengths are scaled by a random factor in [1-noise, 1+noise] before batching. by default the buckets are fixed')
     parser.add_argument('--criterion',        type=str,   default='ctc', choices=['ctc'], help='criterion, only ctc now')
     parser.add_argument('--optimizer',        type=str,   default='sgd', choices=['sgd'], help='optimizer, only sgd now')
     parser.add_argument('--lr',               type=float, default=0.01,  help='learning rate')
@@ -26,6 +27,10 @@ if __name__ == '__main__':
     parser.add_argument('--log',              type=str,   default='none',help='file to store training logs. do not save if none')
     parser.add_argument('--verbose',          type=bool,  default=True,  help='print all training logs on stdout')
     parser.add_argument('--report_per_batch', type=int,   default=10,    help='report training stats every N epoch')
+    parser.add_argument('--prefetch_size',    type=int,   default=0,     help='number of batches prepared in background while training (e.g. 2), by default each batch is read when it is needed')
+    parser.add_argument('--prefetch_workers', type=int,   default=1,     help='number of threads (or processes) preparing batches')
+    parser.add_argument('--prefetch_process', action='store_true',       help='prepare batches in processes instead of threads')
+    parser.add_argument('--pin_memory',       action='store_true',       help='pin prefetched feats for faster copies to gpu')
 
     train_config = parser.parse_args()
 
@@ -0,0 +1,138 @@
+from pathlib import Path
+from argparse import Namespace
+from allosaurus.model import get_model_path
+from allosaurus.am.allosaurus_torch import AllosaurusInferenceModel
+from allosaurus.am.factory import read_torch_am, read_script_am, read_onnx_am, quantize_model, export_onnx_am, is_up_to_date, am_size
+from allosaurus.am.loader import read_loader
+from allosaurus.am.trainer import evaluate_per
+import numpy as np
+import tempfile
+import argparse
+import torch
+import time
+
+
+def benchmark(model, feat, feat_len, repeat):
+    """
+    run the acoustic model repeatedly on a batch
+
+    :param model: callable with the (feat, feat_len) interface
+    :return: list of elapsed times in seconds and the last output
+    """
+
+    elapsed = []
+    output = None
+
+    with torch.no_grad():
+        # warm up, the first TorchScript call also optimizes the graph
+        model(feat, feat_len)
+
+        for i in range(repeat):
+            start = time.perf_counter()
+            output = model(feat, feat_len)
+            elapsed.append(time.perf_counter() - start)
+
+    # the onnx backend returns numpy arrays
+    if isinstance(output, torch.Tensor):
+        output = output.numpy()
+
+    return elapsed, output
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser('benchmark per-utterance latency of the acoustic model backends on cpu')
+    parser.add_argument('-m', '--model',    type=str,   default='latest', help='model name to benchmark')
+    parser.add_argument('-p', '--path',     type=str,   default='none',   help='model directory, it overrides the model name')
+    parser.add_argument('-d', '--duration', type=float, nargs='+', default=[1.0, 3.0, 10.0], help='utterance durations in seconds')
+    parser.add_argument('-r', '--repeat',   type=int,   default=10,       help='number of runs for each utterance')
+    parser.add_argument('-t', '--threads',  type=int,   default=0,        help='torch threads, 0 keeps the torch default')
+    parser.add_argument('--data',             type=str,   default='none',   help='prepared validation directory (see prep_feat and prep_token), the phone error rate of each backend is computed on it')
+    parser.add_argument('--batch_frame_size', type=int,   default=6000,     help='number of frames in each validation batch')
+
+    args = parser.parse_args()
+
+    if args.path != 'none':
+        model_path = Path(args.path)
+    else:
+        model_path = get_model_path(args.model)
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    eager_model = read_torch_am(model_path, Namespace(device_id=-1))
+    eager_model.eval()
+
+    # use the exported graph if it is present, otherwise compile it in memory
+    if is_up_to_date(model_path / 'model_script.pt', model_path / 'model.pt'):
+        script_model = read_script_am(model_path / 'model_script.pt', -1)
+    else:
+        script_model = torch.jit.script(AllosaurusInferenceModel(eager_model))
+
+    # use the exported quantized graph if it is present, otherwise quantize in memory
+    if is_up_to_date(model_path / 'model_quantized.pt', model_path / 'model.pt'):
+        quantized_model = read_script_am(model_path / 'model_quantized.pt', -1)
+    else:
+        quantized_model = quantize_model(read_torch_am(model_path, Namespace(device_id=-1)))
+
+    models = {
+        'eager': eager_model,
+        'script': script_model,
+        'quantized': quantized_model,
+    }
+
+    # onnxruntime is optional, the graph is exported unless an up-to-date one is present
+    try:
+        import onnxruntime
+    except ImportError:
+        onnxruntime = None
+        print("onnxruntime is not available, the onnx backend is not benchmarked")
+
+    # artifacts are never written into the model directory, read_am would start serving them
+    temp_dir = tempfile.TemporaryDirectory()
+
+    if onnxruntime is not None:
+        if is_up_to_date(model_path / 'model.onnx', model_path / 'model.pt'):
+            models['onnx'] = read_onnx_am(model_path, Namespace(device_id=-1, threads=args.threads))
+        else:
+            export_onnx_am(model_path, Path(temp_dir.name) / 'model.onnx')
+            models['onnx'] = read_onnx_am(Path(temp_dir.name), Namespace(device_id=-1, threads=args.threads))
+
+    print("model size")
+    for name, model in models.items():
+        print(f"  {name:<10} {am_size(model) / 1024 / 1024:8.2f} MB")
+
+    if args.data != 'none':
+        validate_loader = read_loader(args.data, Namespace(batch_frame_size=args.batch_frame_size))
+
+        print("phone error rate")
+        for name, model in models.items():
+            print(f"  {name:<10} {evaluate_per(model, validate_loader):8.5f}")
+
+        validate_loader.close()
+
+    # features are stacked windows at 30ms per frame
+    frame_per_second = 100 / 3
+
+    for duration in args.duration:
+        frame_size = int(duration * frame_per_second)
+
+        feat = torch.from_numpy(np.random.RandomState(0).randn(1, frame_size, eager_model.feat_size).astype(np.float32))
+        feat_len = torch.tensor([frame_size], dtype=torch.int32)
+
+        print(f"{duration:.1f}s utterance ({frame_size} frames)")
+
+        reference = None
+        for name, model in models.items():
+            elapsed, output = benchmark(model, feat, feat_len, args.repeat)
+
+            line = f"  {name:<10} mean {np.mean(elapsed) * 1000:8.2f} ms  p50 {np.median(elapsed) * 1000:8.2f} ms  min {np.min(elapsed) * 1000:8.2f} ms"
+
+            if reference is None:
+                reference = output
+            else:
+                line += f"  max diff {np.abs(output - reference).max():.2e}"
+
+            print(line)
+
+    temp_dir.cleanup()
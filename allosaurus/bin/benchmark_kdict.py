@@ -0,0 +1,112 @@
+from allosaurus.pm.kdict import KaldiWriter, read_matrix, read_string, read_integer, write_string, write_integer
+from pathlib import Path
+import numpy as np
+import tempfile
+import argparse
+import struct
+import time
+
+
+def struct_read_string(f):
+    """
+    byte by byte token reader, the previous kdict implementation kept as the baseline
+    """
+
+    s = ""
+    while True:
+        c = f.read(1).decode('utf-8')
+        if c == "": raise ValueError("EOF encountered while reading a string.")
+        if c == " ": return s
+        s += c
+
+
+def struct_read_matrix(f, dtype=np.float32):
+    """
+    struct based FM reader, the previous kdict implementation kept as the baseline
+    """
+
+    f.read(2)
+    struct_read_string(f)
+
+    nRows = read_integer(f)
+    nCols = read_integer(f)
+
+    data = struct.unpack("<%df" % (nRows * nCols), f.read(nRows * nCols * 4))
+    data = np.array(data, dtype=dtype)
+    return data.reshape(nRows, nCols)
+
+
+def struct_write_matrix(f, data):
+    """
+    struct based FM writer, the previous kdict implementation kept as the baseline
+    """
+
+    cnt = f.write('\0B'.encode('utf-8'))
+    cnt += write_string(f, "FM")
+    cnt += write_integer(f, data.shape[0])
+    cnt += write_integer(f, data.shape[1])
+    cnt += f.write(struct.pack("<%df" % data.size, *data.ravel()))
+    return cnt
+
+
+def write_ark(ark_path, utt_ids, feats, write_matrix_fn):
+
+    with open(ark_path, 'wb') as f:
+        for utt_id, feat in zip(utt_ids, feats):
+            write_string(f, utt_id)
+            write_matrix_fn(f, feat)
+
+
+def read_ark(ark_path, utt_size, read_string_fn, read_matrix_fn):
+
+    feats = []
+    with open(ark_path, 'rb') as f:
+        for i in range(utt_size):
+            read_string_fn(f)
+            feats.append(read_matrix_fn(f))
+
+    return feats
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser('benchmark the kaldi ark reader and writer on a synthetic ark')
+    parser.add_argument('-n', '--utt_size',   type=int, default=500, help='number of utterances in the synthetic ark')
+    parser.add_argument('-f', '--frame_size', type=int, default=300, help='number of frames of each utterance')
+    parser.add_argument('-d', '--feat_size',  type=int, default=120, help='feature dimension')
+
+    args = parser.parse_args()
+
+    rs = np.random.RandomState(0)
+    utt_ids = ['utt%06d' % i for i in range(args.utt_size)]
+    feats = [rs.randn(args.frame_size, args.feat_size).astype(np.float32) for i in range(args.utt_size)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        ark_path = Path(temp_dir) / 'feat.ark'
+
+        start = time.perf_counter()
+        write_ark(ark_path, utt_ids, feats, struct_write_matrix)
+        struct_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        writer = KaldiWriter(Path(temp_dir) / 'feat')
+        writer.write(utt_ids, feats)
+        writer.close()
+        numpy_write = time.perf_counter() - start
+
+        assert ark_path.read_bytes() == (Path(temp_dir) / 'feat.ark').read_bytes()
+        size_mb = ark_path.stat().st_size / 1024 / 1024
+
+        start = time.perf_counter()
+        struct_feats = read_ark(ark_path, args.utt_size, struct_read_string, struct_read_matrix)
+        struct_read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        numpy_feats = read_ark(ark_path, args.utt_size, read_string, read_matrix)
+        numpy_read = time.perf_counter() - start
+
+        assert all(np.array_equal(a, b) for a, b in zip(struct_feats, numpy_feats))
+
+    print(f"synthetic ark: {args.utt_size} utterances x {args.frame_size} frames x {args.feat_size} dims ({size_mb:.1f} MB)")
+    print(f"  write  struct {struct_write:8.3f} s  numpy {numpy_write:8.3f} s  speedup {struct_write / numpy_write:6.1f}x")
+    print(f"  read   struct {struct_read:8.3f} s  numpy {numpy_read:8.3f} s  speedup {struct_read / numpy_read:6.1f}x")
@@ -0,0 +1,75 @@
+from allosaurus.audio import Audio, resample_audio, RESAMPLE_QUALITY
+import numpy as np
+import argparse
+import time
+
+
+def benchmark(resample, samples, repeat):
+    """
+    run resample repeatedly and return the best elapsed time (in seconds) and the output
+
+    :param resample: function from samples to resampled samples
+    :param samples:
+    :param repeat:
+    :return:
+    """
+
+    best = float('inf')
+    output = None
+
+    for i in range(repeat):
+        start = time.perf_counter()
+        output = resample(samples)
+        best = min(best, time.perf_counter() - start)
+
+    return best, output
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser('benchmark the polyphase resampler against resampy')
+    parser.add_argument('-s', '--sample_rate', type=int, nargs='+', default=[8000, 22050, 44100, 48000], help='source sample rates to benchmark')
+    parser.add_argument('-t', '--target_sample_rate', type=int, default=16000, help='target sample rate')
+    parser.add_argument('-d', '--duration', type=float, default=10.0, help='duration of the synthetic audio in seconds')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='number of runs for each case, the best run is reported')
+
+    args = parser.parse_args()
+
+    try:
+        import resampy
+    except ImportError:
+        resampy = None
+        print("resampy is not available, only the polyphase resampler is benchmarked")
+
+    for sample_rate in args.sample_rate:
+
+        # a few tones with some noise, scaled to the librosa range
+        t = np.arange(int(sample_rate * args.duration)) / sample_rate
+        samples = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.2 * np.sin(2 * np.pi * 1800 * t)
+        samples += 0.01 * np.random.RandomState(0).randn(len(t))
+        samples = samples.astype(np.float32)
+
+        print(f"{sample_rate} -> {args.target_sample_rate} ({args.duration:.1f}s)")
+
+        reference = None
+        if resampy is not None:
+            elapsed, reference = benchmark(lambda x: resampy.resample(x, sample_rate, args.target_sample_rate), samples, args.repeat)
+            print(f"  resampy      {elapsed * 1000:8.2f} ms  rtf {elapsed / args.duration:.5f}")
+
+        for quality in RESAMPLE_QUALITY:
+
+            # the first call designs the filter, later calls use the cached one
+            start = time.perf_counter()
+            resample_audio(Audio(samples, sample_rate), args.target_sample_rate, quality)
+            first = time.perf_counter() - start
+
+            elapsed, output = benchmark(lambda x: resample_audio(Audio(x, sample_rate), args.target_sample_rate, quality).samples, samples, args.repeat)
+            line = f"  {quality:<12} {elapsed * 1000:8.2f} ms  rtf {elapsed / args.duration:.5f}  first call {first * 1000:8.2f} ms"
+
+            if reference is not None:
+                size = min(len(reference), len(output))
+                error = reference[:size] - output[:size]
+                snr = 10 * np.log10(np.sum(reference[:size] ** 2) / max(np.sum(error ** 2), 1e-20))
+                line += f"  snr vs resampy {snr:6.1f} dB"
+
+            print(line)
@@ -0,0 +1,38 @@
+from pathlib import Path
+from allosaurus.model import get_model_path
+from allosaurus.am.factory import script_am, quantize_am, export_onnx_am
+from allosaurus.lm.inventory import Inventory
+import argparse
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser('export the acoustic model into an inference artifact which read_am loads when present')
+    parser.add_argument('-m', '--model', type=str, default='latest', help='model name to be exported')
+    parser.add_argument('-p', '--path',  type=str, default='none',   help='model directory, it overrides the model name (e.g. a model directory of the web service)')
+    parser.add_argument('-f', '--format', type=str, default='script', choices=['script', 'quantized', 'onnx', 'feature'],
+                        help='script: TorchScript graph saved as model_script.pt, quantized: dynamic int8 TorchScript graph saved as model_quantized.pt, '
+                             'onnx: ONNX graph saved as model.onnx for the onnxruntime backend, '
+                             'feature: articulatory features of the phones saved as phone_feature.npz for approximate masks')
+
+    args = parser.parse_args()
+
+    if args.path != 'none':
+        model_path = Path(args.path)
+    else:
+        model_path = get_model_path(args.model)
+
+    if args.format == 'script':
+        script_am(model_path)
+        print("exported", model_path / 'model_script.pt')
+
+    elif args.format == 'quantized':
+        quantize_am(model_path)
+        print("exported", model_path / 'model_quantized.pt')
+
+    elif args.format == 'onnx':
+        export_onnx_am(model_path)
+        print("exported", model_path / 'model.onnx')
+
+    elif args.format == 'feature':
+        Inventory(model_path).get_domain_feature(persist=True)
+        print("exported", model_path / 'phone_feature.npz')
@@ -1,53 +1,261 @@
 import argparse
+import multiprocessing
+import os
+import shutil
 from pathlib import Path
 from allosaurus.model import resolve_model_name
 from allosaurus.audio import read_audio
 from allosaurus.pm.factory import read_pm
-from allosaurus.pm.kdict import KaldiWriter
+from allosaurus.pm.kdict import KaldiWriter, read_matrix_shape, read_scp_offset
 from tqdm import tqdm
 
-def prepare_feature(data_path, model):
+def prepare_feature(data_path, model, workers=1, resume=False, alt_model_path=None):
+    """
+    extract features of every utterance in data_path/wave into data_path/feat.ark, feat.scp and shape
 
-    model_path = Path(__file__).parent.parent / 'pretrained' / model
+    a single worker writes feat.ark, feat.scp and shape directly. with more workers, the wave list is split into one contiguous shard
+    per worker, each worker writes its own feat.shard<k>.ark/scp and shape.shard<k>, the shards are merged in the order of the wave list
+    once all of them are finished
 
-    # create pm (pm stands for preprocess model: audio -> feature etc..)
-    pm = read_pm(model_path, None)
+    :param data_path: directory containing the wave file
+    :param model: name of the pretrained model whose pm is used
+    :param workers: number of processes extracting features
+    :param resume: keep the utterances already extracted by an interrupted run with the same number of workers
+    :param alt_model_path: directory containing the model instead of the pretrained directory
+    :return:
+    """
 
     # data path should be pointing the absolute path
     data_path = data_path.absolute()
 
+    # format: utt_id audio_path
+    utts = []
+    with open(data_path / 'wave', 'r', encoding='utf-8') as f:
+        for line in f:
+            fields = line.strip().split()
+            if len(fields) == 0:
+                continue
+
+            assert Path(fields[1]).exists(), fields[1]+" does not exist!"
+            utts.append((fields[0], fields[1]))
+
+    # shards left by a previous run
+    shard_ids = sorted(int(p.name[len('feat.shard'):-len('.scp')]) for p in data_path.glob('feat.shard*.scp'))
+
+    if resume:
+        assert len(shard_ids) == 0 or (workers > 1 and shard_ids == list(range(workers))), \
+            f"the interrupted run used {max(len(shard_ids), 1)} workers, please resume with the same number of workers"
+    else:
+        for shard_id in shard_ids:
+            remove_shard(data_path, shard_id)
+
+    # a single worker needs neither shards nor merge
+    if workers == 1:
+        prepare_shard(data_path, model, None, utts, resume, alt_model_path)
+        return
+
+    if not resume:
+        # every shard exists from the start, so that the number of workers of an interrupted run is known
+        for shard_id in range(workers):
+            KaldiWriter(data_path / f'feat.shard{shard_id}').close()
+            open(data_path / f'shape.shard{shard_id}', 'w').close()
+
+    shard_size = (len(utts) + workers - 1) // workers
+    shards = [(data_path, model, shard_id, utts[shard_id*shard_size:(shard_id+1)*shard_size], True, alt_model_path)
+              for shard_id in range(workers)]
+
+    with multiprocessing.Pool(workers) as pool:
+        for shard_id in tqdm(pool.imap_unordered(prepare_shard_star, shards), total=workers):
+            pass
+
+    merge_shards(data_path, workers)
+
+
+def prepare_shard(data_path, model, shard_id, utts, resume=False, alt_model_path=None):
+    """
+    extract features of one shard of the wave list
+
+    :param data_path:
+    :param model:
+    :param shard_id: None writes feat.ark, feat.scp and shape instead of a shard
+    :param utts: list of (utt_id, audio_path)
+    :param resume: skip utterances already in the shard
+    :param alt_model_path: directory containing the model instead of the pretrained directory
+    :return: shard_id
+    """
+
+    if alt_model_path:
+        model_path = Path(alt_model_path) / model
+    else:
+        model_path = Path(__file__).parent.parent / 'pretrained' / model
+
+    # create pm (pm stands for preprocess model: audio -> feature etc..)
+    pm = read_pm(model_path, None)
+
+    feat_path = data_path / shard_name('feat', shard_id)
+    shape_path = data_path / shard_name('shape', shard_id)
+
+    finished = recover_shard(data_path, shard_id) if resume else set()
+
     # writer for feats
-    feat_writer = KaldiWriter(data_path / 'feat')
+    feat_writer = KaldiWriter(feat_path, append=resume)
 
     # writer for the shape of each utterance
     # format: utt_id shape[0] shape[1]
-    shape_writer = open(data_path / 'shape', 'w')
+    shape_writer = open(shape_path, 'a' if resume else 'w')
 
-    for line in tqdm(open(data_path / 'wave', 'r', encoding='utf-8').readlines()):
-        fields = line.strip().split()
-        utt_id = fields[0]
-        audio_path = fields[1]
+    for utt_id, audio_path in tqdm(utts, disable=bool(shard_id) or len(finished) == len(utts)):
 
-        assert Path(audio_path).exists(), audio_path+" does not exist!"
+        if utt_id in finished:
+            continue
 
         audio = read_audio(audio_path)
 
         # extract feature
         feat = pm.compute(audio)
 
+        feat_writer.write(utt_id, feat)
+
         # write shape
         shape_writer.write(f'{utt_id} {feat.shape[0]} {feat.shape[1]}\n')
 
-        feat_writer.write(utt_id, feat)
+        # an interrupted run can be resumed from the last utterance on disk
+        feat_writer.flush()
+        shape_writer.flush()
 
     feat_writer.close()
     shape_writer.close()
 
+    return shard_id
+
+
+def prepare_shard_star(args):
+    return prepare_shard(*args)
+
+
+def shard_name(name, shard_id):
+    return name if shard_id is None else f'{name}.shard{shard_id}'
+
+
+def recover_shard(data_path, shard_id):
+    """
+    drop the incomplete tail of a shard written by an interrupted run
+
+    :param data_path:
+    :param shard_id: None recovers feat.ark, feat.scp and shape
+    :return: set of utt_ids whose features are completely written in the shard
+    """
+
+    ark_path = data_path / (shard_name('feat', shard_id) + '.ark')
+    scp_path = data_path / (shard_name('feat', shard_id) + '.scp')
+    shape_path = data_path / shard_name('shape', shard_id)
+
+    if not scp_path.exists() or not shape_path.exists() or not ark_path.exists():
+        return set()
+
+    # the last line of both files might be cut by the interruption
+    utt_ids, offsets = [], []
+    for line in open(scp_path, 'r', encoding='utf-8').read().split('\n')[:-1]:
+        utt_id, pointer = line.split()
+        utt_ids.append(utt_id)
+        offsets.append(int(pointer[pointer.rfind(':')+1:]))
+
+    shapes = open(shape_path, 'r', encoding='utf-8').read().split('\n')[:-1]
+
+    # the shape is written after the feature, so every utterance in the shape file is in the scp
+    utt_size = min(len(utt_ids), len(shapes))
+
+    ark_size = ark_path.stat().st_size
+    ark_end = 0
+
+    with open(ark_path, 'rb') as f:
+        for i in range(utt_size):
+            if shapes[i].split()[0] != utt_ids[i]:
+                utt_size = i
+                break
+
+            try:
+                f.seek(offsets[i])
+                read_matrix_shape(f)
+            except ValueError:
+                utt_size = i
+                break
+
+            if f.tell() > ark_size:
+                utt_size = i
+                break
+
+            ark_end = f.tell()
+
+    # truncate all files to the complete utterances
+    with open(ark_path, 'r+b') as f:
+        f.truncate(ark_end)
+
+    with open(scp_path, 'r', encoding='utf-8') as f:
+        scp_lines = f.readlines()[:utt_size]
+
+    with open(scp_path, 'w', encoding='utf-8') as f:
+        f.writelines(scp_lines)
+
+    with open(shape_path, 'w', encoding='utf-8') as f:
+        f.writelines(shape + '\n' for shape in shapes[:utt_size])
+
+    return set(utt_ids[:utt_size])
+
+
+def merge_shards(data_path, shard_size):
+    """
+    concatenate the shards into feat.ark, feat.scp and shape in the order of the wave list, and remove the shards
+
+    :param data_path:
+    :param shard_size:
+    :return:
+    """
+
+    ark_path = data_path / 'feat.ark'
+    feat_size = None
+
+    with open(ark_path, 'wb') as ark_writer, open(data_path / 'feat.scp', 'w', encoding='utf-8') as scp_writer, \
+            open(data_path / 'shape', 'w', encoding='utf-8') as shape_writer:
+
+        for shard_id in range(shard_size):
+
+            # offsets in the shard are shifted by the size of the previous shards
+            ark_offset = ark_writer.tell()
+
+            with open(data_path / f'feat.shard{shard_id}.ark', 'rb') as f:
+                shutil.copyfileobj(f, ark_writer)
+
+            utt_ids, _, offsets = read_scp_offset(str(data_path / f'feat.shard{shard_id}.scp'))
+            for utt_id, offset in zip(utt_ids, offsets):
+                scp_writer.write("%s %s:%d\n" % (utt_id, ark_path, ark_offset + offset))
+
+            for line in open(data_path / f'shape.shard{shard_id}', 'r', encoding='utf-8'):
+                fields = line.split()
+
+                if feat_size is None:
+                    feat_size = fields[2]
+
+                assert fields[2] == feat_size, f"{fields[0]} has {fields[2]} feature dims, other utterances have {feat_size}"
+                shape_writer.write(line)
+
+    for shard_id in range(shard_size):
+        remove_shard(data_path, shard_id)
+
+
+def remove_shard(data_path, shard_id):
+
+    for path in [data_path / f'feat.shard{shard_id}.ark', data_path / f'feat.shard{shard_id}.scp', data_path / f'shape.shard{shard_id}']:
+        if path.exists():
+            os.remove(path)
+
 if __name__ == '__main__':
 
     parser = argparse.ArgumentParser('allosaurus tool to extract audio feature for fine-tuning')
     parser.add_argument('--path', required=True, type=str, help='path to the directory containing the wave file')
     parser.add_argument('--model', type=str, default='latest', help='specify the model you want to fine-tune')
+    parser.add_argument('--workers', type=int, default=1, help='number of processes extracting features')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted extraction with the same number of workers')
 
     args = parser.parse_args()
     data_path = Path(args.path)
@@ -55,6 +263,7 @@ if __name__ == '__main__':
     wave_path = data_path / 'wave'
 
     assert wave_path.exists(), "the path directory should contain a wave file, please check README.md for details"
+    assert args.workers >= 1, "the number of workers should be at least 1"
 
     # resolve model's name
     model_name = resolve_model_name(args.model)
@@ -65,7 +274,7 @@ if __name__ == '__main__':
     args.model = model_name
 
     # extract feature
-    prepare_feature(data_path, args.model)
+    prepare_feature(data_path, args.model, args.workers, args.resume)
 
 
 
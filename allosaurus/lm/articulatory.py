@@ -1,14 +1,44 @@
 import panphon
+import threading
 import numpy as np
 
+# panphon's feature table is expensive to load, all masks share a single Articulatory
+_articulatory = None
+_articulatory_lock = threading.Lock()
+
+
+def read_articulatory():
+    """
+    get the process-wide Articulatory, it is created on the first call
+
+    :return: Articulatory
+    """
+
+    global _articulatory
+
+    with _articulatory_lock:
+        if _articulatory is None:
+            _articulatory = Articulatory()
+
+    return _articulatory
+
+
 class Articulatory:
 
     def __init__(self):
 
         self.feature_table = panphon.FeatureTable()
 
+        # phone -> feature vector, features of a phone never change
+        self.feature_cache = dict()
+
     def feature(self, phone):
 
+        if phone in self.feature_cache:
+            return self.feature_cache[phone]
+
+        cache_key = phone
+
         try:
             feats = self.feature_table.word_to_vector_list(phone, numeric=True)
         except:
@@ -23,6 +53,23 @@ class Articulatory:
         else:
             feats = np.array(feats[0], dtype=np.float32)
 
+        self.feature_cache[cache_key] = feats
+
+        return feats
+
+    def feature_matrix(self, phones):
+        """
+        stack features of all phones into a matrix
+
+        :param phones: list of phones
+        :return: float32 matrix with shape (len(phones), 24)
+        """
+
+        feats = np.zeros((len(phones), 24), dtype=np.float32)
+
+        for i, phone in enumerate(phones):
+            feats[i] = self.feature(phone)
+
         return feats
 
     def similarity(self, p1, p2):
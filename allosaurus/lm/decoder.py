@@ -1,4 +1,5 @@
 from allosaurus.lm.inventory import *
+from allosaurus.lm.result import PhoneResult
 from pathlib import Path
 from itertools import groupby
 import numpy as np
@@ -31,62 +32,52 @@ class PhoneDecoder:
         :return:
         """
 
-        # apply mask if lang_id specified, this is to restrict the output phones to the desired phone subset
-
-        mask = self.inventory.get_mask(lang_id, approximation=self.config.approximate)
-
-        logits = mask.mask_logits(logits)
-
-        emit_frame_idx = []
+        return self.decode(logits, lang_id, topk, emit).format(timestamp)
 
-        cur_max_arg = -1
-
-        # find all emitting frames
-        for i in range(len(logits)):
+    def decode(self, logits, lang_id=None, topk=1, emit=1.0):
+        """
+        decode phones from logits into a PhoneResult
 
-            logit = logits[i]
-            logit[0] /= emit
+        :param logits: numpy array of logits
+        :param emit: blank factor
+        :return: PhoneResult
+        """
 
-            arg_max = np.argmax(logit)
+        # apply mask if lang_id specified, this is to restrict the output phones to the desired phone subset
 
-            # this is an emitting frame
-            if arg_max != cur_max_arg and arg_max != 0:
-                emit_frame_idx.append(i)
-                cur_max_arg = arg_max
+        mask = self.inventory.get_mask(lang_id, approximation=self.config.approximate)
 
-        # decode all emitting frames
-        decoded_seq = []
-        for idx in emit_frame_idx:
-            logit = logits[idx]
-            exp_prob = np.exp(logit - np.max(logit))
-            probs = exp_prob / exp_prob.sum()
+        logits = mask.mask_logits(logits)
 
-            top_phones = logit.argsort()[-topk:][::-1]
-            top_probs = sorted(probs)[-topk:][::-1]
+        # scale blank of all frames
+        logits[:, 0] /= emit
 
-            stamp = f"{self.config.window_shift*idx:.3f} {self.config.window_size:.3f} "
+        arg_max = np.argmax(logits, axis=1)
 
-            if topk == 1:
+        # find all emitting frames: non-blank frames whose phone differs from the previous non-blank frame
+        nonblank_idx = np.nonzero(arg_max != 0)[0]
+        nonblank_arg_max = arg_max[nonblank_idx]
 
-                phones_str = ' '.join(mask.get_units(top_phones))
-                if timestamp:
-                    phones_str = stamp + phones_str
+        is_emit = np.ones(len(nonblank_idx), dtype=bool)
+        is_emit[1:] = nonblank_arg_max[1:] != nonblank_arg_max[:-1]
 
-                decoded_seq.append(phones_str)
-            else:
-                phone_prob_lst = [f"{phone} ({prob:.3f})" for phone, prob in zip(mask.get_units(top_phones), top_probs)]
-                phones_str = ' '.join(phone_prob_lst)
+        emit_frame_idx = nonblank_idx[is_emit]
 
-                if timestamp:
-                    phones_str = stamp + phones_str
+        # decode all emitting frames at once
+        emit_logits = logits[emit_frame_idx]
+        topk = min(topk, logits.shape[1])
 
-                decoded_seq.append(phones_str)
+        exp_prob = np.exp(emit_logits - np.max(emit_logits, axis=1, keepdims=True))
+        probs = exp_prob / exp_prob.sum(axis=1, keepdims=True)
 
-        if timestamp:
-            phones = '\n'.join(decoded_seq)
-        elif topk == 1:
-            phones = ' '.join(decoded_seq)
+        if topk == 1:
+            top_phones = arg_max[emit_frame_idx].reshape(-1, 1)
         else:
-            phones = ' | '.join(decoded_seq)
+            # select top k with argpartition, then only sort those k phones
+            top_phones = np.argpartition(-emit_logits, topk-1, axis=1)[:, :topk]
+            top_order = np.argsort(-np.take_along_axis(emit_logits, top_phones, axis=1), axis=1)
+            top_phones = np.take_along_axis(top_phones, top_order, axis=1)
+
+        top_probs = np.take_along_axis(probs, top_phones, axis=1)
 
-        return phones
\ No newline at end of file
+        return PhoneResult(mask, emit_frame_idx, top_phones, top_probs, self.config.window_shift, self.config.window_size)
@@ -1,10 +1,14 @@
 import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
 from allosaurus.lm.mask import *
 
 
 class Inventory:
 
-    def __init__(self, model_path, inference_config=None):
+    def __init__(self, model_path, inference_config=None, mask_cache_size=32):
 
         self.model_path = model_path
 
@@ -16,6 +20,14 @@ class Inventory:
 
         self.inference_config = inference_config
 
+        # articulatory feature matrix of all phones, only needed for approximation
+        self.domain_feature = None
+
+        # most recently used masks keyed by (lang_id, approximation, prior), each stored with the version of its unit and prior files
+        self.mask_cache = OrderedDict()
+        self.mask_cache_size = mask_cache_size
+        self.mask_cache_lock = threading.Lock()
+
         # load all available inventories
         langs = json.load(open(str(model_path) + '/inventory/index.json', 'r', encoding='utf-8'))
 
@@ -51,26 +63,36 @@ class Inventory:
         Returns:
         """
 
+        target_unit = read_unit(str(self.get_unit_file(lang_id)))
+
+        return target_unit
+
+    def get_unit_file(self, lang_id):
+        """
+        path of the unit file read for lang_id
+
+        Args:
+            lang_id: ISO id, glottocode or a unit path
+
+        Returns:
+            the updated unit file if there is one, otherwise the default unit file
+        """
+
         # we can also specify a unit path as lang_id, makes it easier to customize
         if lang_id not in self.lang2phonefile:
 
             if not Path(lang_id).exists():
                 assert lang_id in self.lang2phonefile, "Language "+lang_id+" is not available !"
             else:
-                target_unit = read_unit(str(lang_id))
-                return target_unit
+                return Path(lang_id)
 
 
         # search customized file first, if not exist use the default one.
         updated_unit_file = self.model_path / 'inventory' / ('updated_'+self.lang2phonefile[lang_id])
         if updated_unit_file.exists():
-            unit_file = updated_unit_file
+            return updated_unit_file
         else:
-            unit_file = self.model_path / 'inventory' / self.lang2phonefile[lang_id]
-
-        target_unit = read_unit(str(unit_file))
-
-        return target_unit
+            return self.model_path / 'inventory' / self.lang2phonefile[lang_id]
 
     def update_unit(self, lang_id, unit_file):
         """
@@ -96,6 +118,9 @@ class Inventory:
         # save the new file
         write_unit(new_unit, updated_unit_file)
 
+        # masks built from the old unit are stale now
+        self.invalidate_mask(lang_id)
+
     def restore_unit(self, lang_id):
         """
         restore the original phone units
@@ -118,12 +143,142 @@ class Inventory:
         # delete this file
         updated_unit_file.unlink()
 
+        # masks built from the updated unit are stale now
+        self.invalidate_mask(lang_id)
+
     def get_mask(self, lang_id=None, approximation=False):
+        """
+        get the mask of lang_id, masks are cached as building them requires reading the unit and prior files
+
+        Args:
+            lang_id: ISO id, glottocode or a unit path
+            approximation: map unseen phones with articulatory features
+
+        Returns:
+            UnitMask, it should be treated as read-only as it is shared between calls
+        """
 
         # use its unit as the mask if the recognition target is the entire inventory
         if lang_id is None or lang_id == 'ipa':
+            lang_id = 'ipa'
+
+        prior = self.inference_config.prior if self.inference_config else None
+        key = (lang_id, approximation, prior)
+
+        # update_phone and restore_phone usually run in another process, the files themselves tell whether a mask is stale
+        unit_file = None if lang_id == 'ipa' else self.get_unit_file(lang_id)
+        version = (file_version(unit_file), file_version(prior))
+
+        with self.mask_cache_lock:
+            if key in self.mask_cache and self.mask_cache[key][0] == version:
+                self.mask_cache.move_to_end(key)
+                return self.mask_cache[key][1]
+
+        if lang_id == 'ipa':
             target_unit = self.unit
         else:
-            target_unit = self.get_unit(lang_id)
+            target_unit = read_unit(str(unit_file))
+
+        domain_feature = self.get_domain_feature() if approximation else None
+
+        mask = UnitMask(self.unit, target_unit, approximation, self.inference_config, domain_feature)
+
+        with self.mask_cache_lock:
+            self.mask_cache[key] = (version, mask)
+            self.mask_cache.move_to_end(key)
+
+            # evict the least recently used mask
+            while len(self.mask_cache) > self.mask_cache_size:
+                self.mask_cache.popitem(last=False)
+
+        return mask
+
+    def get_domain_feature(self, persist=False):
+        """
+        articulatory feature matrix of all phones in phone.txt.
+        it is read from phone_feature.npz next to the model when present (see export_model -f feature),
+        so that processes can skip panphon
+
+        Args:
+            persist: save the matrix into the model path after computing it, serving never writes into the model path
+
+        Returns:
+            float32 matrix indexed by phone id
+        """
+
+        if self.domain_feature is not None:
+            return self.domain_feature
+
+        feature_file = Path(self.model_path) / 'phone_feature.npz'
+        phones = np.array([self.unit.id_to_unit[idx] for idx in sorted(self.unit.id_to_unit.keys())])
+
+        # the persisted matrix is only valid for the same phone list
+        if feature_file.exists():
+            with np.load(str(feature_file)) as saved:
+                if np.array_equal(saved['phones'], phones):
+                    self.domain_feature = saved['feature']
+
+        if self.domain_feature is None:
+            self.domain_feature = domain_feature_matrix(self.unit, read_articulatory())
+
+            if persist:
+                # write to a unique temp file first so other processes and threads never load a partial file
+                try:
+                    fd, tmp_file = tempfile.mkstemp(prefix='phone_feature.npz.', dir=str(feature_file.parent))
+                    try:
+                        with os.fdopen(fd, 'wb') as f:
+                            np.savez(f, phones=phones, feature=self.domain_feature)
+                        os.replace(tmp_file, str(feature_file))
+                    except OSError:
+                        os.remove(tmp_file)
+                        raise
+                except OSError:
+                    # read-only model directories simply recompute it next time
+                    pass
+
+        return self.domain_feature
+
+    def invalidate_mask(self, lang_id=None):
+        """
+        drop cached masks of lang_id, or all cached masks if lang_id is None
+
+        Args:
+            lang_id: ISO id or glottocode
+
+        Returns:
+
+        """
+
+        with self.mask_cache_lock:
+            if lang_id is None:
+                self.mask_cache.clear()
+                return
+
+            # iso id and glottocode share the same phone file
+            phone_file = self.lang2phonefile.get(lang_id)
+
+            for key in list(self.mask_cache.keys()):
+                if key[0] == lang_id or (phone_file is not None and self.lang2phonefile.get(key[0]) == phone_file):
+                    del self.mask_cache[key]
+
+
+def file_version(path):
+    """
+    identify the content of a file without reading it
+
+    Args:
+        path: file path or None
+
+    Returns:
+        (path, modification time, size), or None if there is no such file
+    """
+
+    if path is None:
+        return None
+
+    try:
+        stat = os.stat(str(path))
+    except OSError:
+        return None
 
-        return UnitMask(self.unit, target_unit, approximation, self.inference_config)
\ No newline at end of file
+    return str(path), stat.st_mtime_ns, stat.st_size
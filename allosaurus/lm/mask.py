@@ -18,14 +18,33 @@ def read_prior(prior_path):
 
 
 
+def domain_feature_matrix(domain_unit, articulatory):
+    """
+    articulatory feature matrix of all domain units, rows are indexed by domain idx and <blk> is left as zeros
+
+    :param domain_unit: all available units (phones)
+    :param articulatory: Articulatory
+    :return: float32 matrix
+    """
+
+    feats = np.zeros((max(domain_unit.id_to_unit.keys()) + 1, 24), dtype=np.float32)
+
+    for domain_idx in domain_unit.id_to_unit.keys():
+        if domain_idx != 0:
+            feats[domain_idx] = articulatory.feature(domain_unit.get_unit(domain_idx))
+
+    return feats
+
+
 class UnitMask:
 
-    def __init__(self, domain_unit, target_unit, approximation=False, inference_config=None):
+    def __init__(self, domain_unit, target_unit, approximation=False, inference_config=None, domain_feature=None):
         """
         MaskUnit provides interface to mask phones
 
         :param domain_unit: all available units (phones)
         :param target_unit: usually a subset of domain_unit
+        :param domain_feature: articulatory feature matrix of domain_unit indexed by domain idx, computed if not provided
         """
 
         self.inference_config = inference_config
@@ -36,6 +55,8 @@ class UnitMask:
         # whether or not to use articulatory feature to map unseen units
         self.approximation = approximation
 
+        self.domain_feature = domain_feature
+
         # available index in all_unit
         self.valid_mask = set()
 
@@ -55,11 +76,20 @@ class UnitMask:
         self.create_mask()
 
         if self.approximation:
-            self.articulatory = Articulatory()
+            self.articulatory = read_articulatory()
             self.approxmiate_phone()
 
         # create a mask for masking numpy array
-        self.invalid_index_mask = sorted(list(self.invalid_mask))
+        self.invalid_index_mask = np.array(sorted(self.invalid_mask), dtype=np.int64)
+
+        # lookup tables from domain idx to target idx (-1 for masked units) and to target unit
+        table_size = max(self.domain_unit.id_to_unit.keys()) + 1
+        self.target_index = np.full(table_size, -1, dtype=np.int64)
+        self.unit_table = np.empty(table_size, dtype=object)
+
+        for domain_idx, target_idx in self.unit_map.items():
+            self.target_index[domain_idx] = target_idx
+            self.unit_table[domain_idx] = self.target_unit.get_unit(target_idx)
 
 
     def __str__(self):
@@ -105,36 +135,42 @@ class UnitMask:
 
     def approxmiate_phone(self):
 
-        # register all valid phones
-        for target_idx, target_phone in self.target_unit.id_to_unit.items():
-            if target_phone not in self.domain_unit:
+        # target phones which are not available in the domain
+        unseen_target = [(target_idx, target_phone) for target_idx, target_phone in self.target_unit.id_to_unit.items()
+                         if target_phone not in self.domain_unit]
+
+        if len(unseen_target) == 0:
+            return
 
-                # find the most similar phone from the invalid set
-                max_domain_idx = -1
-                max_domain_score = -10000
+        if self.domain_feature is None:
+            self.domain_feature = domain_feature_matrix(self.domain_unit, self.articulatory)
 
-                for domain_idx in self.invalid_mask:
+        target_feature = self.articulatory.feature_matrix([target_phone for _, target_phone in unseen_target])
 
-                    domain_phone = self.domain_unit.get_unit(domain_idx)
+        # similarity between every unseen target phone and every domain phone
+        scores = np.matmul(target_feature, self.domain_feature.T)
 
-                    #print("domain ", domain_phone, " target ", target_phone)
-                    score = self.articulatory.similarity(domain_phone, target_phone)
+        invalid = np.zeros(len(self.domain_feature), dtype=bool)
+        invalid[list(self.invalid_mask)] = True
 
-                    if score >= max_domain_score:
-                        max_domain_score = score
-                        max_domain_idx = domain_idx
+        for (target_idx, target_phone), score in zip(unseen_target, scores):
 
+            # find the most similar phone from the invalid set,
+            # the largest idx wins on ties
+            assert np.any(invalid)
+            score = np.where(invalid, score, -np.inf)
+            max_domain_idx = len(score) - 1 - int(np.argmax(score[::-1]))
 
-                assert max_domain_idx not in self.valid_mask
-                assert max_domain_idx != -1
+            assert max_domain_idx not in self.valid_mask
 
-                # map max_domain_idx to target_idx
-                self.invalid_mask -= { max_domain_idx }
-                self.valid_mask.add(max_domain_idx)
+            # map max_domain_idx to target_idx
+            invalid[max_domain_idx] = False
+            self.invalid_mask -= { max_domain_idx }
+            self.valid_mask.add(max_domain_idx)
 
-                #print("target phone", target_phone, ' mapped to idx ', max_domain_idx)
+            #print("target phone", target_phone, ' mapped to idx ', max_domain_idx)
 
-                self.unit_map[max_domain_idx] = target_idx
+            self.unit_map[max_domain_idx] = target_idx
 
 
     def print_maps(self):
@@ -163,14 +199,8 @@ class UnitMask:
         :return: a list of unit
         """
 
-        unit_lst = []
-
-        for idx in ids:
-
-            assert idx in self.unit_map
-
-            target_idx = self.unit_map[idx]
+        ids = np.asarray(ids, dtype=np.int64)
 
-            unit_lst.append(self.target_unit.get_unit(target_idx))
+        assert np.all(self.target_index[ids] >= 0)
 
-        return unit_lst
\ No newline at end of file
+        return self.unit_table[ids].tolist()
\ No newline at end of file
@@ -0,0 +1,128 @@
+import numpy as np
+
+
+class PhoneResult:
+
+    def __init__(self, mask, frame_idx, phone_ids, probs, window_shift, window_size):
+        """
+        PhoneResult keeps the decoded phones of an utterance as arrays, strings are only built when requested
+
+        :param mask: UnitMask used for decoding, it maps domain ids to target units
+        :param frame_idx: (K,) index of each emitting frame
+        :param phone_ids: (K, topk) domain phone ids of each emitting frame, sorted by probability
+        :param probs: (K, topk) probability of each phone
+        :param window_shift: seconds between two frames
+        :param window_size: seconds covered by each frame
+        """
+
+        self.mask = mask
+
+        self.frame_idx = frame_idx
+        self.domain_ids = phone_ids
+        self.probs = probs
+
+        self.window_shift = window_shift
+        self.window_size = window_size
+
+        # unit strings are resolved lazily
+        self._units = None
+
+    def __str__(self):
+        return self.format()
+
+    def __repr__(self):
+        return '<PhoneResult: ' + str(len(self)) + ' phones, topk: ' + str(self.topk) + '>'
+
+    def __len__(self):
+        return len(self.frame_idx)
+
+    @property
+    def topk(self):
+        return self.domain_ids.shape[1]
+
+    @property
+    def phone_ids(self):
+        """
+        ids of the phones in the target unit
+
+        :return: (K, topk) int array
+        """
+        return self.mask.target_index[self.domain_ids]
+
+    @property
+    def start(self):
+        """
+        approximate start time of each emitting frame in seconds
+
+        :return: (K,) float array
+        """
+        return self.window_shift * self.frame_idx
+
+    @property
+    def duration(self):
+        """
+        approximate duration of each emitting frame in seconds
+
+        :return: (K,) float array
+        """
+        return np.full(len(self.frame_idx), self.window_size)
+
+    @property
+    def units(self):
+        """
+        phones of each emitting frame
+
+        :return: list of K lists, each with topk phones
+        """
+
+        if self._units is None:
+            flat_units = self.mask.get_units(self.domain_ids.ravel())
+            topk = self.topk
+            self._units = [flat_units[i*topk:(i+1)*topk] for i in range(len(self.frame_idx))]
+
+        return self._units
+
+    def format(self, timestamp=False):
+        """
+        format phones the same as the allosaurus command line output
+
+        :param timestamp: prefix each phone with its start time and duration, one line per emitting frame
+        :return: str
+        """
+
+        decoded_seq = []
+
+        for start, units, probs in zip(self.start, self.units, self.probs):
+
+            if self.topk == 1:
+                phones_str = units[0]
+            else:
+                phone_prob_lst = [f"{phone} ({prob:.3f})" for phone, prob in zip(units, probs)]
+                phones_str = ' '.join(phone_prob_lst)
+
+            if timestamp:
+                phones_str = f"{start:.3f} {self.window_size:.3f} " + phones_str
+
+            decoded_seq.append(phones_str)
+
+        if timestamp:
+            phones = '\n'.join(decoded_seq)
+        elif self.topk == 1:
+            phones = ' '.join(decoded_seq)
+        else:
+            phones = ' | '.join(decoded_seq)
+
+        return phones
+
+    def to_list(self):
+        """
+        json serializable phones
+
+        :return: list of dict with start, duration, phones and probs of each emitting frame
+        """
+
+        return [{'start': round(float(start), 3),
+                 'duration': round(float(self.window_size), 3),
+                 'phones': units,
+                 'probs': [round(float(prob), 3) for prob in probs]}
+                for start, units, probs in zip(self.start, self.units, self.probs)]
@@ -7,7 +7,7 @@ from scipy.fftpack import dct
 
 def mfcc(signal,samplerate=16000,winlen=0.025,winstep=0.01,numcep=13,
          nfilt=23,lowfreq=20,highfreq=None,dither=1.0,remove_dc_offset=True,preemph=0.97,
-         ceplifter=22,useEnergy=True,wintype='povey'):
+         ceplifter=22,useEnergy=True,wintype='povey',fb=None,dct_matrix=None):
     """Compute MFCC features from an audio signal.
 
     :param signal: the audio signal from which to compute features. Should be an N*1 array
@@ -23,18 +23,23 @@ def mfcc(signal,samplerate=16000,winlen=0.025,winstep=0.01,numcep=13,
     :param ceplifter: apply a lifter to final cepstral coefficients. 0 is no lifter. Default is 22.
     :param appendEnergy: if this is true, the zeroth cepstral coefficient is replaced with the log of the total frame energy.
     :param winfunc: the analysis window to apply to each frame. By default no window is applied. You can use numpy window functions here e.g. winfunc=numpy.hamming
+    :param fb: precomputed filterbank from get_filterbanks, computed from the other parameters if None.
+    :param dct_matrix: precomputed liftered DCT matrix from get_dct_matrix, the DCT and lifter are computed directly if None.
     :returns: A numpy array of size (NUMFRAMES by numcep) containing features. Each row holds 1 feature vector.
     """
-    feat,energy = fbank(signal,samplerate,winlen,winstep,nfilt,lowfreq,highfreq,dither,remove_dc_offset,preemph,wintype)
+    feat,energy = fbank(signal,samplerate,winlen,winstep,nfilt,lowfreq,highfreq,dither,remove_dc_offset,preemph,wintype,fb)
     feat = numpy.log(feat)
-    feat = dct(feat, type=2, axis=1, norm='ortho')[:,:numcep]
-    feat = lifter(feat,ceplifter)
+    if dct_matrix is None:
+        feat = dct(feat, type=2, axis=1, norm='ortho')[:,:numcep]
+        feat = lifter(feat,ceplifter)
+    else:
+        feat = numpy.dot(feat, dct_matrix)
     if useEnergy: feat[:,0] = numpy.log(energy) # replace first cepstral coefficient with log of frame energy
     return feat
 
 def fbank(signal,samplerate=16000,winlen=0.025,winstep=0.01,
           nfilt=40,lowfreq=0,highfreq=None,dither=1.0,remove_dc_offset=True, preemph=0.97,
-          wintype='hamming'):
+          wintype='hamming',fb=None):
     """Compute Mel-filterbank energy features from an audio signal.
 
     :param signal: the audio signal from which to compute features. Should be an N*1 array
@@ -48,6 +53,7 @@ def fbank(signal,samplerate=16000,winlen=0.025,winstep=0.01,
     :param preemph: apply preemphasis filter with preemph as coefficient. 0 is no filter. Default is 0.97.
     :param winfunc: the analysis window to apply to each frame. By default no window is applied. You can use numpy window functions here e.g. winfunc=numpy.hamming
      winfunc=lambda x:numpy.ones((x,))
+    :param fb: precomputed filterbank from get_filterbanks, computed from the other parameters if None.
     :returns: 2 values. The first is a numpy array of size (NUMFRAMES by nfilt) containing features. Each row holds 1 feature vector. The
         second return value is the energy in each frame (total energy, unwindowed)
     """
@@ -59,10 +65,11 @@ def fbank(signal,samplerate=16000,winlen=0.025,winstep=0.01,
     nfft = preprocess.round_up_power_of_two(int(samplerate * winlen))
     frames,raw_frames = preprocess.framesig(signal, winlen * samplerate, winstep * samplerate, dither, preemph, remove_dc_offset, wintype)
     pspec = preprocess.powspec(frames, nfft) # nearly the same until this part
-    energy = numpy.sum(raw_frames**2,1) # this stores the raw energy in each frame
+    energy = numpy.sum(numpy.square(raw_frames, dtype=numpy.float64),1) # this stores the raw energy in each frame
     energy = numpy.where(energy == 0,numpy.finfo(float).eps,energy) # if energy is zero, we get problems with log
 
-    fb = get_filterbanks(nfilt,nfft,samplerate,lowfreq,highfreq)
+    if fb is None:
+        fb = get_filterbanks(nfilt,nfft,samplerate,lowfreq,highfreq)
     feat = numpy.dot(pspec,fb.T) # compute the filterbank energies
     feat = numpy.where(feat == 0,numpy.finfo(float).eps,feat) # if feat is zero, we get problems with log
 
@@ -122,21 +129,36 @@ def get_filterbanks(nfilt=26,nfft=512,samplerate=16000,lowfreq=0,highfreq=None):
     highmel = hz2mel(highfreq)
 
     # check kaldi/src/feat/Mel-computations.h
+    # all filters (rows) and fft bins (columns) are computed at once, the last bin is never used
     fbank = numpy.zeros([nfilt,nfft//2+1])
     mel_freq_delta = (highmel-lowmel)/(nfilt+1)
-    for j in range(0,nfilt):
-        leftmel = lowmel+j*mel_freq_delta
-        centermel = lowmel+(j+1)*mel_freq_delta
-        rightmel = lowmel+(j+2)*mel_freq_delta
-        for i in range(0,nfft//2):
-            mel=hz2mel(i*samplerate/nfft)
-            if mel>leftmel and mel<rightmel:
-                if mel<centermel:
-                    fbank[j,i]=(mel-leftmel)/(centermel-leftmel)
-                else:
-                    fbank[j,i]=(rightmel-mel)/(rightmel-centermel)
+    j = numpy.arange(nfilt).reshape(-1, 1)
+    leftmel = lowmel+j*mel_freq_delta
+    centermel = lowmel+(j+1)*mel_freq_delta
+    rightmel = lowmel+(j+2)*mel_freq_delta
+    mel = hz2mel(numpy.arange(nfft//2)*samplerate/nfft)
+    fbank[:,:nfft//2] = numpy.where((mel>leftmel) & (mel<rightmel),
+                                    numpy.where(mel<centermel, (mel-leftmel)/(centermel-leftmel), (rightmel-mel)/(rightmel-centermel)),
+                                    0)
     return fbank
 
+_lift_cache = {}
+
+def get_lift(ncoeff, L=22):
+    """Compute the cepstral lifter vector, it is cached for each ncoeff and L.
+
+    :param ncoeff: the number of cepstral coefficients.
+    :param L: the liftering coefficient to use. Default is 22.
+    :returns: A numpy array of size ncoeff. It is shared, do not modify it.
+    """
+    key = (ncoeff, L)
+    if key not in _lift_cache:
+        n = numpy.arange(ncoeff)
+        lift = 1 + (L/2.)*numpy.sin(numpy.pi*n/L)
+        lift.setflags(write=False)
+        _lift_cache[key] = lift
+    return _lift_cache[key]
+
 def lifter(cepstra, L=22):
     """Apply a cepstral lifter the the matrix of cepstra. This has the effect of increasing the
     magnitude of the high frequency DCT coeffs.
@@ -146,13 +168,23 @@ def lifter(cepstra, L=22):
     """
     if L > 0:
         nframes,ncoeff = numpy.shape(cepstra)
-        n = numpy.arange(ncoeff)
-        lift = 1 + (L/2.)*numpy.sin(numpy.pi*n/L)
-        return lift*cepstra
+        return get_lift(ncoeff,L)*cepstra
     else:
         # values of L <= 0, do nothing
         return cepstra
 
+def get_dct_matrix(nfilt=23,numcep=13,ceplifter=22):
+    """Compute the matrix applying an orthonormal type 2 DCT and the cepstral lifter to log filterbank features,
+    so that mfcc = numpy.dot(log_fbank, dct_matrix).
+
+    :param nfilt: the number of filters in the filterbank.
+    :param numcep: the number of cepstrum to return.
+    :param ceplifter: the liftering coefficient to use. 0 is no lifter.
+    :returns: A numpy array of size nfilt * numcep.
+    """
+    dct_matrix = dct(numpy.eye(nfilt), type=2, axis=1, norm='ortho')[:,:numcep]
+    return lifter(dct_matrix,ceplifter)
+
 def delta(feat, N):
     """Compute delta features from a feature vector sequence.
 
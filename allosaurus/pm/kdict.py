@@ -9,22 +9,23 @@ from pathlib import Path
 
 class KaldiWriter:
 
-    def __init__(self, path=None, scp=True):
+    def __init__(self, path=None, scp=True, append=False):
         """
         writer of BOTH ark and scp
 
         :param path:
         :param scp:
+        :param append: keep existing ark and scp and append to them (e.g. to resume an interrupted extraction)
         """
 
         self.scp = scp
 
-        if path:
-            self.open(path)
-
         self.ark_offset = 0
 
-    def open(self, path):
+        if path:
+            self.open(path, append)
+
+    def open(self, path, append=False):
 
         # remove scp or ark suffix
         path = str(path)
@@ -39,10 +40,10 @@ class KaldiWriter:
         self.scp_path = str(path) + '.scp'
 
         # delete old files
-        if os.path.exists(self.ark_path):
+        if not append and os.path.exists(self.ark_path):
             os.remove(self.ark_path)
 
-        if os.path.exists(self.scp_path):
+        if not append and os.path.exists(self.scp_path):
             os.remove(self.scp_path)
 
         self.ark_writer = open(self.ark_path, "ab")
@@ -76,6 +77,10 @@ class KaldiWriter:
             self.ark_offset += write_matrix(self.ark_writer, feat)
             self.scp_writer.write("%s %s\n" % (utt_id, pointer))
 
+    def flush(self):
+        self.ark_writer.flush()
+        self.scp_writer.flush()
+
     def close(self):
         self.ark_writer.close()
         self.scp_writer.close()
@@ -100,12 +105,31 @@ def smart_open(filename, mode='rb', *args, **kwargs):
 
 
 def read_string(f):
-    s = ""
+    """
+    read a space-terminated token, the stream is scanned by blocks instead of byte by byte
+
+    :param f: binary stream
+    :return: the token without the space
+    """
+
+    s = b""
     while True:
-        c = f.read(1).decode('utf-8')
-        if c == "": raise ValueError("EOF encountered while reading a string.")
-        if c == " ": return s
-        s += c
+        # look ahead without consuming, then only consume up to the space
+        if hasattr(f, 'peek'):
+            block = f.peek(64)
+        else:
+            position = f.tell()
+            block = f.read(64)
+            f.seek(position)
+
+        if len(block) == 0: raise ValueError("EOF encountered while reading a string.")
+
+        p = block.find(b" ")
+        if p >= 0:
+            s += f.read(p + 1)[:-1]
+            return s.decode('utf-8')
+
+        s += f.read(len(block))
 
 
 def read_integer(f):
@@ -144,12 +168,9 @@ def read_compressed_matrix(fd, format):
 
     # The data is structed as [Colheader, ... , Colheader, Data, Data , .... ]
     #                         {           cols           }{     size         }
-    col_headers = numpy.frombuffer(fd.read(cols * 8), dtype=per_col_header, count=cols)
-    col_headers = numpy.array(
-        [numpy.array([x for x in y]) * globrange * 1.52590218966964e-05 + globmin for y in col_headers],
-        dtype=numpy.float32)
-    data = numpy.reshape(numpy.frombuffer(fd.read(cols * rows), dtype='uint8', count=cols * rows),
-                         newshape=(cols, rows))  # stored as col-major,
+    col_headers = numpy.frombuffer(fd.read(cols * 8), dtype='<u2', count=cols * 4).reshape(cols, 4)
+    col_headers = (col_headers * globrange * 1.52590218966964e-05 + globmin).astype(numpy.float32)
+    data = numpy.frombuffer(fd.read(cols * rows), dtype='uint8', count=cols * rows).reshape(cols, rows)  # stored as col-major,
 
     mat = numpy.zeros((cols, rows), dtype='float32')
     p0 = col_headers[:, 0].reshape(-1, 1)
@@ -191,21 +212,11 @@ def read_matrix(f, dtype=numpy.float32):
         raise ValueError("Binary mode header ('\0B') not found when attempting to read a matrix.")
     format = read_string(f)
 
-    if format == "DM":
+    if format == "DM" or format == "FM":
         nRows = read_integer(f)
         nCols = read_integer(f)
 
-        data = struct.unpack("<%dd" % (nRows * nCols), f.read(nRows * nCols * 8))
-        data = numpy.array(data, dtype=dtype)
-        return data.reshape(nRows, nCols)
-
-    elif format == "FM":
-        nRows = read_integer(f)
-        nCols = read_integer(f)
-
-        data = struct.unpack("<%df" % (nRows * nCols), f.read(nRows * nCols * 4))
-        data = numpy.array(data, dtype=dtype)
-        return data.reshape(nRows, nCols)
+        return read_matrix_data(f, nRows, nCols, '<f8' if format == "DM" else '<f4', dtype)
 
     elif format == "CM":
         data = read_compressed_matrix(f, format)
@@ -215,6 +226,25 @@ def read_matrix(f, dtype=numpy.float32):
         raise ValueError(
             "Unknown matrix format '%s' encountered while reading; currently supported formats are DM (float64) and FM (float32)." % format)
 
+def read_matrix_data(f, nRows, nCols, file_dtype, dtype=numpy.float32):
+    """
+    read the payload of a DM/FM matrix straight into numpy
+
+    :param f: binary stream positioned at the payload
+    :param file_dtype: '<f8' for DM, '<f4' for FM
+    :param dtype: dtype of the returned matrix
+    :return: writable (nRows, nCols) matrix
+    """
+
+    size = nRows * nCols * numpy.dtype(file_dtype).itemsize
+    buffer = f.read(size)
+
+    if len(buffer) != size:
+        raise ValueError("EOF encountered while reading a matrix.")
+
+    # astype always copies, the matrix does not keep the read-only buffer
+    return numpy.frombuffer(buffer, dtype=file_dtype).astype(dtype).reshape(nRows, nCols)
+
 def read_matrix_format(f):
 
     header = f.read(2).decode('utf-8')
@@ -267,13 +297,13 @@ def write_matrix(f, data):
         cnt += write_string(f, "DM")
         cnt += write_integer(f, data.shape[0])
         cnt += write_integer(f, data.shape[1])
-        cnt += f.write(struct.pack("<%dd" % data.size, *data.ravel()))
+        cnt += f.write(numpy.ascontiguousarray(data, dtype='<f8').tobytes())
 
     elif str(data.dtype) == "float32":
         cnt += write_string(f, "FM")
         cnt += write_integer(f, data.shape[0])
         cnt += write_integer(f, data.shape[1])
-        cnt += f.write(struct.pack("<%df" % data.size, *data.ravel()))
+        cnt += f.write(numpy.ascontiguousarray(data, dtype='<f4').tobytes())
     else:
         raise ValueError(
             "Unsupported matrix format '%s' for writing; currently supported formats are float64 and float32." % str(
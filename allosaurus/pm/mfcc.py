@@ -1,4 +1,5 @@
-from allosaurus.pm.feature import mfcc
+from allosaurus.pm.feature import mfcc, get_filterbanks, get_dct_matrix
+from allosaurus.pm.preprocess import round_up_power_of_two
 from allosaurus.pm.utils import *
 from allosaurus.audio import resample_audio
 import numpy as np
@@ -27,17 +28,20 @@ class MFCC:
         # feature window
         self.feature_window = config.feature_window
 
-        # last complete window starting sample (index of sample)
-        self.prev_window_sample = 0
+        # float32 or float64
+        self.dtype = config.dtype
 
-        # last complete mfcc window index (index of window)
-        self.prev_window_index = 0
+        # streaming states, see compute_stream
+        self.reset()
 
-        # list of mfcc features
-        self.mfcc_windows = []
+        # filterbank and liftered dct only depend on the config, mfcc uses its default 25ms window for the fft size
+        high_freq = config.high_freq or config.sample_rate/2
+        if high_freq < 0:
+            high_freq = config.sample_rate/2 + high_freq
 
-        # float32 or float64
-        self.dtype = config.dtype
+        nfft = round_up_power_of_two(int(config.sample_rate * 0.025))
+        self.filterbanks = get_filterbanks(config.bank_size, nfft, config.sample_rate, config.low_freq, high_freq)
+        self.dct_matrix = get_dct_matrix(config.bank_size, config.cep_size)
 
     def __str__(self):
         return "MFCC ("+str(vars(self.config))+")"
@@ -46,6 +50,32 @@ class MFCC:
         return self.__str__()
 
 
+    def reset(self):
+        """
+        reset the streaming states to start a new utterance
+
+        :return:
+        """
+
+        # starting sample of the next incomplete window (index of sample)
+        self.prev_window_sample = 0
+
+        # samples from prev_window_sample which are not yet covered by a complete window
+        self.window_samples = np.zeros(0, dtype=np.float32)
+
+        # number of complete mfcc windows so far (index of the next window)
+        self.prev_window_index = 0
+
+        # list of mfcc features which are still needed for feature windowing
+        self.mfcc_windows = []
+
+        # number of feature windows emitted so far
+        self.feature_window_index = 0
+
+        # running sum and square sum of all mfcc windows for cmvn
+        self.cmvn_sum = 0.0
+        self.cmvn_square_sum = 0.0
+
     def compute(self, audio):
         """
         compute feature for audio
@@ -61,8 +91,7 @@ class MFCC:
         assert self.config.sample_rate == audio.sample_rate, " sample rate of audio is "+str(audio.sample_rate)+" , but model is "+str(self.config.sample_rate)
 
         # get feature and convert into correct type (usually float32)
-        feat = mfcc(audio.samples, samplerate=self.config.sample_rate, numcep=self.config.cep_size, nfilt=self.config.bank_size,
-                    lowfreq=self.config.low_freq, highfreq=self.config.high_freq, useEnergy=self.config.use_energy, dither=self.config.dither).astype(self.dtype)
+        feat = self.compute_mfcc(audio.samples)
 
         # apply cmvn if specified
         if self.cmvn == 'speaker':
@@ -72,4 +101,106 @@ class MFCC:
         if self.feature_window == 3:
             feat = feature_window(feat)
 
-        return feat
\ No newline at end of file
+        return feat
+
+    def compute_stream(self, audio, finish=False):
+        """
+        compute feature for the next chunk of a streaming utterance.
+        only features completed by this chunk are returned, the overlap of windows is carried over to the next chunk.
+
+        compared with compute, cmvn uses the statistics of all windows seen so far
+        and feature windowing repeats the edge windows instead of wrapping around the utterance
+
+        :param audio: chunk of the utterance, chunks are resampled separately if their sample rate differs,
+                      which leaves filter edge artefacts at every chunk boundary
+        :param finish: flush the remaining windows and reset the streaming states
+        :return: new mfcc feature, it might have no frames
+        """
+
+        # make sample rate consistent
+        audio = resample_audio(audio, self.sample_rate)
+
+        # validate sample rate
+        assert self.config.sample_rate == audio.sample_rate, " sample rate of audio is "+str(audio.sample_rate)+" , but model is "+str(self.config.sample_rate)
+
+        self.window_samples = np.concatenate((self.window_samples, audio.samples))
+
+        # number of complete windows in the buffered samples
+        window_cnt = 0
+        if len(self.window_samples) >= self.window_size:
+            window_cnt = 1 + (len(self.window_samples) - self.window_size) // self.window_shift
+
+        if window_cnt > 0:
+            feat = self.compute_mfcc(self.window_samples[:(window_cnt-1)*self.window_shift + self.window_size])
+
+            # keep the samples of the next incomplete window
+            self.window_samples = self.window_samples[window_cnt*self.window_shift:]
+            self.prev_window_sample += window_cnt*self.window_shift
+            self.prev_window_index += window_cnt
+
+            # apply running cmvn if specified
+            if self.cmvn == 'speaker':
+                self.cmvn_sum = self.cmvn_sum + np.sum(feat, axis=0, dtype=np.float64)
+                self.cmvn_square_sum = self.cmvn_square_sum + np.sum(np.square(feat, dtype=np.float64), axis=0)
+
+                spk_mean = self.cmvn_sum / self.prev_window_index
+                spk_std = np.maximum(self.cmvn_square_sum / self.prev_window_index - spk_mean * spk_mean, 0.0) ** 0.5
+
+                # a single window has no variance yet
+                feat = ((feat - spk_mean) / np.maximum(spk_std, 1e-8)).astype(self.dtype)
+
+            self.mfcc_windows.extend(feat)
+
+        # subsampling and windowing
+        if self.feature_window == 3:
+            feat = self.stream_feature_window(finish)
+        else:
+            feat = np.array(self.mfcc_windows, dtype=self.dtype).reshape(-1, self.config.cep_size)
+            self.mfcc_windows = []
+
+        if finish:
+            self.reset()
+
+        return feat
+
+    def stream_feature_window(self, finish):
+        """
+        concatenate the previous, current and next windows of every third window,
+        the same as feature_window, a feature window is emitted once its next window is available
+
+        :param finish: also emit the last feature window without its next window
+        :return:
+        """
+
+        # absolute index of mfcc_windows[0]
+        offset = self.prev_window_index - len(self.mfcc_windows)
+
+        feat_lst = []
+
+        while 3*self.feature_window_index + 1 < self.prev_window_index or (finish and 3*self.feature_window_index < self.prev_window_index):
+            center = 3*self.feature_window_index
+            left = max(center - 1, 0)
+            right = min(center + 1, self.prev_window_index - 1)
+
+            feat_lst.append(np.concatenate((self.mfcc_windows[left - offset], self.mfcc_windows[center - offset], self.mfcc_windows[right - offset])))
+            self.feature_window_index += 1
+
+        # only keep the windows needed by the next feature window
+        first_needed = max(3*self.feature_window_index - 1, 0)
+        if first_needed > offset:
+            self.mfcc_windows = self.mfcc_windows[first_needed - offset:]
+
+        return np.array(feat_lst, dtype=self.dtype).reshape(-1, 3*self.config.cep_size)
+
+    def compute_mfcc(self, samples):
+        """
+        compute mfcc of samples without cmvn and windowing
+
+        :param samples: samples in the model's sample rate
+        :return: mfcc feature
+        """
+
+        # get feature and convert into correct type (usually float32)
+        return mfcc(samples, samplerate=self.config.sample_rate, numcep=self.config.cep_size, nfilt=self.config.bank_size,
+                    lowfreq=self.config.low_freq, highfreq=self.config.high_freq, useEnergy=self.config.use_energy, dither=self.config.dither,
+                    fb=self.filterbanks, dct_matrix=self.dct_matrix).astype(self.dtype)
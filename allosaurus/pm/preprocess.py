@@ -20,6 +20,32 @@ def rolling_window(a, window, step=1):
     return np.lib.stride_tricks.as_strided(a, shape=shape, strides=strides)[::step]
 
 
+# analysis windows are identical for every utterance, they are cached by (wintype, frame_len)
+_window_cache = {}
+
+
+def get_window(frame_len, wintype='hamming'):
+    """Get the analysis window of frame_len samples, computed once for each wintype and frame_len.
+
+    :param frame_len: length of each frame measured in samples.
+    :param wintype: 'povey' or 'hamming'
+    :returns: a float64 window of size frame_len. It is shared, do not modify it.
+    """
+    key = (wintype, frame_len)
+    if key not in _window_cache:
+        if wintype == 'povey':
+            win = np.empty(frame_len)
+            for i in range(frame_len):
+                win[i] = (0.5 - 0.5 * np.cos(2 * np.pi / (frame_len - 1) * i)) ** 0.85
+        else:  # the hamming window
+            win = np.hamming(frame_len)
+
+        win.setflags(write=False)
+        _window_cache[key] = win
+
+    return _window_cache[key]
+
+
 def framesig(sig, frame_len, frame_step, dither=1.0, preemph=0.97, remove_dc_offset=True, wintype='hamming',
              stride_trick=True):
     """Frame a signal into overlapping frames.
@@ -29,7 +55,7 @@ def framesig(sig, frame_len, frame_step, dither=1.0, preemph=0.97, remove_dc_off
     :param frame_step: number of samples after the start of the previous frame that the next frame should begin.
     :param winfunc: the analysis window to apply to each frame. By default no window is applied.
     :param stride_trick: use stride trick to compute the rolling window and window multiplication faster
-    :returns: an array of frames. Size is NUMFRAMES by frame_len.
+    :returns: an array of windowed frames. Size is NUMFRAMES by frame_len. and the float32 frames before preemphasis and windowing.
     """
     slen = len(sig)
     frame_len = int(round_half_up(frame_len))
@@ -42,12 +68,7 @@ def framesig(sig, frame_len, frame_step, dither=1.0, preemph=0.97, remove_dc_off
     # check kaldi/src/feat/feature-window.h
     # the last frame_len-1 points might be cutoff
     padsignal = sig[:(numframes - 1) * frame_step + frame_len]
-    if wintype is 'povey':
-        win = np.empty(frame_len)
-        for i in range(frame_len):
-            win[i] = (0.5 - 0.5 * np.cos(2 * np.pi / (frame_len - 1) * i)) ** 0.85
-    else:  # the hamming window
-        win = np.hamming(frame_len)
+    win = get_window(frame_len, wintype)
 
     if stride_trick:
         frames = rolling_window(padsignal, window=frame_len, step=frame_step)
@@ -56,15 +77,12 @@ def framesig(sig, frame_len, frame_step, dither=1.0, preemph=0.97, remove_dc_off
             np.arange(0, numframes * frame_step, frame_step), (frame_len, 1)).T
         indices = np.array(indices, dtype=np.int32)
         frames = padsignal[indices]
-        win = np.tile(win, (numframes, 1))
 
-    frames = frames.astype(np.float32)
-    raw_frames = np.zeros(frames.shape)
-    for frm in range(frames.shape[0]):
-        # frames[frm, :] = do_dither(frames[frm, :], dither)  # dither
-        frames[frm, :] = do_remove_dc_offset(frames[frm, :])  # remove dc offset
-        raw_frames[frm, :] = frames[frm, :]
-        frames[frm, :] = do_preemphasis(frames[frm, :], preemph)  # preemphasize
+    # process all frames at once, raw_frames keep the frames after removing dc offset
+    raw_frames = frames.astype(np.float32)
+    # raw_frames = do_dither(raw_frames, dither)  # dither
+    raw_frames = do_remove_dc_offset(raw_frames)  # remove dc offset
+    frames = do_preemphasis(raw_frames, preemph)  # preemphasize
 
     return frames * win, raw_frames
 
@@ -152,15 +170,23 @@ def do_dither(signal, dither_value=1.0):
 
 
 def do_remove_dc_offset(signal):
-    signal -= np.mean(signal)
+    """remove the mean of the signal in place. If signal is an NxD matrix, the mean of each row is removed.
+
+    :param signal: The signal or frames.
+    :returns: the signal without dc offset.
+    """
+    signal -= np.mean(signal, axis=-1, keepdims=True)
     return signal
 
 
 def do_preemphasis(signal, coeff=0.97):
-    """perform preemphasis on the input signal.
+    """perform preemphasis on the input signal. If signal is an NxD matrix, each row is filtered independently.
 
     :param signal: The signal to filter.
     :param coeff: The preemphasis coefficient. 0 is no filter, default is 0.95.
     :returns: the filtered signal.
     """
-    return np.append((1 - coeff) * signal[0], signal[1:] - coeff * signal[:-1])
\ No newline at end of file
+    emphasized = np.empty_like(signal)
+    emphasized[..., 0] = (1 - coeff) * signal[..., 0]
+    emphasized[..., 1:] = signal[..., 1:] - coeff * signal[..., :-1]
+    return emphasized
\ No newline at end of file
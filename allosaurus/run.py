@@ -16,6 +16,8 @@ def main():
     parser.add_argument('-t', '--timestamp', type=bool, default=False, help='attach *approximate* timestamp for each phone, note that the timestamp might not be accurate')
     parser.add_argument('-p', '--prior', type=str, required=False, default=None, help='supply prior to adjust phone predictions')
     parser.add_argument('-e', '--emit', type=float, required=False, default=1.0, help='specify how many phones to emit. A larger number can emit more phones and a smaller number would suppress emission, default is 1.0')
+    parser.add_argument('-b', '--backend', type=str, default='torch', choices=['torch', 'onnx'], help='acoustic model backend, onnx runs model.onnx exported by export_model -f onnx with onnxruntime on cpu')
+    parser.add_argument('-q', '--quantize', action='store_true', help='use the dynamic int8 acoustic model for faster cpu inference, it is quantized on loading unless it was exported with export_model -f quantized')
     parser.add_argument('-a', '--approximate', type=bool, default=False, help='the phone inventory can still hardly to cover all phones. You can use turn on this flag to map missing phones to other similar phones to recognize. The similarity is measured with phonological features')
 
     args = parser.parse_args()
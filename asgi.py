@@ -0,0 +1,346 @@
+import asyncio
+import configparser
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+from urllib.parse import parse_qs
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+from werkzeug.utils import secure_filename
+from classifier import Classifier
+import processing.audio as audio
+
+config_file = "config.cfg"
+
+
+class ContentTooLarge(Exception):
+    pass
+
+
+class PredictionApp:
+    # ASGI counterpart of main.app: uploads and ffmpeg are awaited on the event loop,
+    # model loading and recognition run on a bounded executor
+
+    def __init__(self, config: configparser.ConfigParser):
+        self.config = config
+        self.classifier = Classifier(config)
+        self.decoder = audio.FFmpegDecoder(config.getint('UPLOAD', 'ffmpeg_workers', fallback=2),
+                                           config.getfloat('UPLOAD', 'ffmpeg_timeout', fallback=30.0))
+
+        self.upload_folder = config.get('UPLOAD', 'folder', fallback='uploads')
+        self.disk_fallback = config.getboolean('UPLOAD', 'disk_fallback', fallback=False)
+
+        # uploads are buffered in memory, larger requests are refused like flask's MAX_CONTENT_LENGTH
+        self.max_content_length = config.getint('UPLOAD', 'max_content_mb', fallback=16) * 1024 * 1024
+
+        # number of requests in recognition at the same time, the others wait on the event loop
+        self.executor = ThreadPoolExecutor(max_workers=config.getint('ASGI', 'max_workers', fallback=4))
+
+        # created on the event loop
+        self.ffmpeg_slots = None
+        self.startup_lock = None
+        self.started = False
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        if scope['type'] != 'http':
+            return
+
+        # servers without lifespan support load the models on the first request
+        await self.startup()
+
+        route = (scope['method'], scope['path'])
+        if route == ('GET', '/models'):
+            await self.models(send)
+        elif route == ('POST', '/predict'):
+            await self.predict(scope, receive, send)
+        elif route == ('POST', '/predict/stream'):
+            await self.predict_stream(scope, receive, send)
+        else:
+            await send_json(send, {'status': 'FAILED', 'message': 'Not found'}, 404)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+
+            if message['type'] == 'lifespan.startup':
+                await self.startup()
+                await send({'type': 'lifespan.startup.complete'})
+
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def startup(self):
+        if self.started:
+            return
+
+        if self.startup_lock is None:
+            self.startup_lock = asyncio.Lock()
+            self.ffmpeg_slots = asyncio.Semaphore(self.decoder.max_workers)
+
+        async with self.startup_lock:
+            if not self.started:
+                await self.run(self.classifier.load_models)
+                self.started = True
+
+    async def shutdown(self):
+        await self.run(self.classifier.close)
+
+        # waiting for the executor's threads must not block the event loop, nor run on the executor itself
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown, True)
+
+    async def run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def models(self, send):
+        await send_json(send, {'status': 'OK', 'result': self.classifier.available_models(),
+                               'loaded': self.classifier.loaded_models(), 'stats': self.classifier.get_stats()})
+
+    async def predict(self, scope, receive, send):
+        # 1) Receive the upload without blocking other requests
+        try:
+            form = await read_form(scope, receive, self.max_content_length)
+        except ContentTooLarge:
+            await send_json(send, {'status': 'FAILED', 'message': 'Request is too large'}, 413)
+            return
+
+        if form is None or 'file' not in form[1]:
+            await send_json(send, {'status': 'FAILED', 'message': 'No audio file attached'})
+            return
+
+        fields, files = form
+        filename, data = files['file']
+        model = fields.get('model', "")
+
+        if filename == '':
+            await send_json(send, {'status': 'FAILED', 'message': 'No file selected'})
+            return
+
+        filename = secure_filename(filename)
+        # the model is resolved once, every step of the request uses the same recognizer
+        resolved = await self.run(self.classifier.get_recognizer, model)
+        sample_rate = self.classifier.get_sample_rate(resolved=resolved)
+
+        # 2) Decode uploads in memory, mp4s are piped through ffmpeg at the model's rate
+        try:
+            if filename.endswith(".mp4"):
+                audio_file = await self.decode_ffmpeg(data, sample_rate)
+            else:
+                audio_file = await self.run(audio.load_stream, io.BytesIO(data), sample_rate)
+        except (audio.DecoderBusy, audio.DecoderTimeout) as error:
+            await send_decoder_error(send, error)
+            return
+
+        # Other formats need the uploads folder round-trip
+        if audio_file is None:
+            if not self.disk_fallback:
+                await send_json(send, {'status': 'FAILED', 'message': 'Unsupported audio format'})
+                return
+
+            filepath = self.upload_folder + "/" + filename
+            await self.run(write_file, filepath, data)
+
+            try:
+                if filename.endswith(".mp4"):
+                    audio_file = await self.decode_ffmpeg(filepath, sample_rate)
+                else:
+                    audio_file = await self.run(audio.load_file, filepath, sample_rate)
+            except (audio.DecoderBusy, audio.DecoderTimeout) as error:
+                await send_decoder_error(send, error)
+                return
+            finally:
+                os.remove(filepath)
+
+            if audio_file is None:
+                await send_json(send, {'status': 'FAILED', 'message': 'Could not decode audio file'})
+                return
+
+        # 3) Predict on the executor
+        result, model = await self.run(self.classifier.predict_word, audio_file, model, resolved)
+
+        await send_json(send, {'status': 'OK', 'result': str(result), 'phones': result.to_list(), 'model': model})
+
+    async def predict_stream(self, scope, receive, send):
+        # Body is raw 16-bit little-endian mono pcm, the same protocol as main.predict_stream
+        args = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        model = args.get('model', [""])[0]
+        sample_rate = int(args.get('sample_rate', ["16000"])[0])
+
+        # chunks would be resampled separately, with filter edge artefacts at every chunk
+        resolved = await self.run(self.classifier.get_recognizer, model)
+        model_sample_rate = self.classifier.get_sample_rate(resolved=resolved)
+        if sample_rate != model_sample_rate:
+            await send_json(send, {'status': 'FAILED', 'message': f'sample_rate should be {model_sample_rate}, the rate of the model'})
+            return
+
+        session, model = await self.run(self.classifier.stream_word, model, resolved)
+
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/x-ndjson')]})
+
+        try:
+            # 1) Recognize each chunk as it arrives and send the new phones as one json line
+            leftover = b''
+            more_body = True
+            while more_body:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+
+                more_body = message.get('more_body', False)
+                data = leftover + message.get('body', b'')
+                usable = len(data) // 2 * 2
+                leftover = data[usable:]
+
+                if usable == 0:
+                    continue
+
+                result = await self.run(session.feed, audio.load_pcm(data[:usable], sample_rate))
+                if len(result) > 0:
+                    await send_line(send, {'status': 'OK', 'final': False, 'result': str(result), 'phones': result.to_list(), 'model': model})
+
+            # 2) Flush the remaining frames and send the whole utterance
+            await self.run(session.finish)
+            result = session.result()
+            await send_line(send, {'status': 'OK', 'final': True, 'result': str(result), 'phones': result.to_list(), 'model': model})
+
+        except Exception as error:
+            # the response has started, the client learns about the error from the last line
+            await send_line(send, {'status': 'FAILED', 'final': True, 'message': str(error), 'model': model})
+
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def decode_ffmpeg(self, source, sample_rate):
+        # same as FFmpegDecoder.decode, but waiting for the worker slot and ffmpeg does not hold a thread
+        if isinstance(source, str):
+            data, command = None, self.decoder.command(source, sample_rate)
+        else:
+            data, command = source, self.decoder.command('pipe:0', sample_rate)
+
+        # waiting for a slot counts against the same timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.decoder.timeout
+
+        try:
+            await asyncio.wait_for(self.ffmpeg_slots.acquire(), self.decoder.timeout)
+        except asyncio.TimeoutError:
+            raise audio.DecoderBusy()
+
+        try:
+            process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+                                                           stdin=asyncio.subprocess.DEVNULL if data is None else asyncio.subprocess.PIPE)
+            try:
+                pcm, _ = await asyncio.wait_for(process.communicate(data), max(deadline - loop.time(), 0.0))
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise audio.DecoderTimeout()
+        except OSError:
+            return None
+        finally:
+            self.ffmpeg_slots.release()
+
+        if process.returncode != 0 or len(pcm) < 2:
+            return None
+
+        return audio.load_pcm(memoryview(pcm)[:len(pcm) // 2 * 2], sample_rate)
+
+
+async def read_form(scope, receive, max_content_length: int = 0):
+    # Parse a multipart body while it is received, returns (fields, files) or None,
+    # raises ContentTooLarge once the body exceeds max_content_length (0 means no limit)
+    headers = dict(scope['headers'])
+    content_type, options = parse_options_header(headers.get(b'content-type', b'').decode('latin-1'))
+    if content_type != 'multipart/form-data' or 'boundary' not in options:
+        return None
+
+    content_length = headers.get(b'content-length', b'')
+    if max_content_length > 0 and content_length.isdigit() and int(content_length) > max_content_length:
+        raise ContentTooLarge()
+
+    parser = MultipartDecoder(options['boundary'].encode('latin-1'))
+    fields, files = {}, {}
+    part, chunks = None, []
+    more_body = True
+    received = 0
+
+    while True:
+        event = parser.next_event()
+
+        if isinstance(event, NeedData):
+            if not more_body:
+                return None
+
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+
+            more_body = message.get('more_body', False)
+            body = message.get('body', b'')
+
+            # chunked uploads have no content-length
+            received += len(body)
+            if 0 < max_content_length < received:
+                raise ContentTooLarge()
+
+            parser.receive_data(body)
+            if not more_body:
+                parser.receive_data(None)
+
+        elif isinstance(event, (Field, File)):
+            part, chunks = event, []
+
+        elif isinstance(event, Data):
+            chunks.append(event.data)
+            if not event.more_data:
+                if isinstance(part, File):
+                    files[part.name] = (part.filename, b''.join(chunks))
+                else:
+                    fields[part.name] = b''.join(chunks).decode('utf-8', 'replace')
+
+        elif isinstance(event, Epilogue):
+            return fields, files
+
+
+def write_file(filepath, data):
+    with open(filepath, 'wb') as f:
+        f.write(data)
+
+
+async def send_json(send, body, status=200):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode('utf-8')})
+
+
+async def send_decoder_error(send, error):
+    # a busy or slow decoder is not a problem of the upload, the client can retry
+    if isinstance(error, audio.DecoderBusy):
+        await send_json(send, {'status': 'FAILED', 'message': 'Audio decoder is busy, please retry later'}, 503)
+    else:
+        await send_json(send, {'status': 'FAILED', 'message': 'Audio decoding timed out'}, 504)
+
+
+async def send_line(send, body):
+    await send({'type': 'http.response.body', 'body': (json.dumps(body) + '\n').encode('utf-8'), 'more_body': True})
+
+
+def read_config():
+    if not path.exists(config_file) or not path.isfile(config_file):
+        print("Config file missing... (config.cfg)")
+
+    config = configparser.ConfigParser()
+    config.read(config_file)
+
+    return config
+
+
+# Serve with any ASGI server, e.g. uvicorn asgi:app
+app = PredictionApp(read_config())
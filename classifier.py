@@ -1,8 +1,14 @@
 from configparser import ConfigParser
+from argparse import Namespace
+from collections import OrderedDict
 from processing.audio import Audio
+from scheduler import BatchScheduler, SchedulerClosed
+from workers import WorkerPool
 from pathlib import Path
 import allosaurus.app as allo
 import allosaurus.audio
+from allosaurus.am.factory import am_size
+import threading
 import os
 
 
@@ -10,23 +16,203 @@ class Classifier:
 
     def __init__(self, config: ConfigParser):
         self.default_word_model = None
-        self.other_models = {}
         self.config = config
 
+        # other models are loaded on their first request and evicted least recently used first,
+        # 0 means no limit on the number of models or their size
+        self.other_models = OrderedDict()
+        self.max_loaded = config.getint('MODELS', 'max_loaded', fallback=0)
+        self.max_loaded_bytes = config.getint('MODELS', 'max_loaded_mb', fallback=0) * 1024 * 1024
+
+        # dynamic int8 acoustic models for cpu serving
+        self.quantize = config.getboolean('MODELS', 'quantize', fallback=False)
+
+        # torch, or onnx to run model.onnx with onnxruntime
+        self.backend = config.get('MODELS', 'backend', fallback='torch')
+        self.model_bytes = {}
+        self.stats = {'loads': 0, 'evictions': 0, 'hits': 0, 'misses': 0}
+
+        # lock guards the registry, load_locks make sure a model is only loaded once without blocking loads of other models
+        self.lock = threading.Lock()
+        self.load_locks = {}
+
+        # names of the model directories, refreshed when a requested model is not in the list
+        self.model_names = None
+
+        # requests to the same model are coalesced into one batch, a batch size of 1 disables batching
+        self.max_batch_size = config.getint('BATCH', 'max_batch_size', fallback=1)
+        self.max_wait = config.getfloat('BATCH', 'max_wait_ms', fallback=10) / 1000
+        self.schedulers = {}
+
+        # the default model can be served by worker processes sharing its weights, 0 processes keeps it in-process
+        self.processes = config.getint('WORKERS', 'processes', fallback=0)
+        self.threads = config.getint('WORKERS', 'threads', fallback=0)
+        self.worker_timeout = config.getfloat('WORKERS', 'timeout', fallback=30)
+        self.pool = None
+
     def load_models(self) -> bool:
-        self.default_word_model = allo.read_recognizer(alt_model_path=Path('models/' + self.config['MODELS']['word_model']))
+        self.default_word_model = self.read_model(self.config['MODELS']['word_model'])
 
-        for dirname in os.listdir("models/"):
-            if dirname != self.config['MODELS']['word_model'] and dirname != ".gitkeep":
-                self.other_models[dirname] = allo.read_recognizer(alt_model_path=Path('models/' + dirname))
+        if self.processes > 0:
+            model = self.config['MODELS']['word_model']
+            self.pool = WorkerPool({model: self.default_word_model}, {model: self.model_config(model)}, self.processes, self.threads,
+                                   self.worker_timeout)
+        else:
+            self.add_scheduler(self.config['MODELS']['word_model'], self.default_word_model)
 
         return self.default_word_model is not None
 
-    def predict_word(self, audio_file: Audio, model: str = ""):
-        if model != "" and self.other_models.__contains__(model):
-            prediction = self.other_models[model].recognize(allosaurus.audio.Audio(audio_file.time_series, audio_file.get_sampling_rate))
+    def model_config(self, model: str):
+        inference_config = Namespace(model=model, device_id=-1, lang='ipa', approximate=False, prior=None,
+                                     quantize=self.quantize, backend=self.backend)
+
+        return inference_config, Path('models/' + model).absolute()
+
+    def read_model(self, model: str):
+        inference_config, model_path = self.model_config(model)
+
+        return allo.read_recognizer(inference_config, alt_model_path=model_path)
+
+    def available_models(self) -> list:
+        model_names = [dirname for dirname in os.listdir("models/") if dirname != ".gitkeep"]
+        self.model_names = set(model_names)
+
+        return model_names
+
+    def has_model(self, model: str) -> bool:
+        model_names = self.model_names
+        if model_names is not None and model in model_names:
+            return True
+
+        # models might have been added since the last listing
+        return model in self.available_models()
+
+    def loaded_models(self) -> list:
+        with self.lock:
+            return [self.config['MODELS']['word_model']] + list(self.other_models.keys())
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['resident_mb'] = round(sum(self.model_bytes.values()) / 1024 / 1024, 2)
+
+        return stats
+
+    def get_model(self, model: str):
+        with self.lock:
+            if model in self.other_models:
+                self.other_models.move_to_end(model)
+                self.stats['hits'] += 1
+                return self.other_models[model], self.schedulers.get(model)
+
+        with self.lock:
+            load_lock = self.load_locks.setdefault(model, threading.Lock())
+
+        with load_lock:
+            # another request might have loaded it while we were waiting
+            with self.lock:
+                if model in self.other_models:
+                    self.other_models.move_to_end(model)
+                    self.stats['hits'] += 1
+                    return self.other_models[model], self.schedulers.get(model)
+
+                self.stats['misses'] += 1
+
+            recognizer = self.read_model(model)
+
+            with self.lock:
+                self.other_models[model] = recognizer
+                self.model_bytes[model] = model_size(recognizer)
+                self.stats['loads'] += 1
+                self.add_scheduler(model, recognizer)
+                scheduler = self.schedulers.get(model)
+
+                evicted = self.evict()
+
+        # pending requests of evicted models are flushed before their schedulers stop
+        for evicted_scheduler in evicted:
+            evicted_scheduler.close()
+
+        return recognizer, scheduler
+
+    def evict(self) -> list:
+        evicted = []
+
+        # the most recently loaded model is always kept
+        while len(self.other_models) > 1:
+            too_many = 0 < self.max_loaded < len(self.other_models)
+            too_large = 0 < self.max_loaded_bytes < sum(self.model_bytes.values())
+
+            if not too_many and not too_large:
+                break
+
+            model, _ = self.other_models.popitem(last=False)
+            del self.model_bytes[model]
+            self.stats['evictions'] += 1
+
+            if model in self.schedulers:
+                evicted.append(self.schedulers.pop(model))
+
+        return evicted
+
+    def add_scheduler(self, model: str, recognizer):
+        if self.max_batch_size > 1:
+            self.schedulers[model] = BatchScheduler(recognizer.recognize_batch_result, self.max_batch_size, self.max_wait)
+
+    def close(self):
+        for scheduler in self.schedulers.values():
+            scheduler.close()
+
+        self.schedulers = {}
+
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def get_recognizer(self, model: str = ""):
+        # resolve a requested model once per request, the result can be passed to the methods below as resolved
+        if model != "" and model != self.config['MODELS']['word_model'] and self.has_model(model):
+            recognizer, scheduler = self.get_model(model)
         else:
             model = self.config['MODELS']['word_model']
-            prediction = self.default_word_model.recognize(allosaurus.audio.Audio(audio_file.time_series, audio_file.get_sampling_rate))
+            recognizer, scheduler = self.default_word_model, self.schedulers.get(model)
+
+        return recognizer, scheduler, model
+
+    def get_sample_rate(self, model: str = "", resolved=None):
+        recognizer, _, _ = resolved or self.get_recognizer(model)
+
+        return recognizer.pm.config.sample_rate
+
+    def stream_word(self, model: str = "", resolved=None):
+        recognizer, _, model = resolved or self.get_recognizer(model)
+
+        return recognizer.stream(), model
+
+    def predict_word(self, audio_file, model: str = "", resolved=None):
+        # audio decoded in memory is already an allosaurus audio
+        if isinstance(audio_file, Audio):
+            audio_file = allosaurus.audio.Audio(audio_file.time_series, audio_file.get_sampling_rate)
+
+        recognizer, scheduler, model = resolved or self.get_recognizer(model)
+
+        pool = self.pool
+        if pool is not None and model in pool.models:
+            return pool.recognize(model, recognizer, audio_file), model
+
+        # wait for the batch containing this audio, the scheduler is closed if the model was just evicted
+        if scheduler is not None:
+            try:
+                future = scheduler.submit(audio_file)
+            except SchedulerClosed:
+                future = None
+
+            if future is not None:
+                return future.result(), model
+
+        return recognizer.recognize_result(audio_file), model
+
 
-        return prediction, model
+def model_size(recognizer) -> int:
+    # size of the acoustic model weights, which dominate the recognizer's memory
+    return am_size(recognizer.am)
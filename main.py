@@ -1,12 +1,12 @@
 import configparser
+import json
 import os
 from os import path
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from werkzeug.utils import secure_filename
 import classifier
 from processing.audio import Audio
 import processing.audio as audio
-import processing.transformer as transformer
 
 config_file = "config.cfg"
 app = Flask(__name__)
@@ -14,13 +14,9 @@ app = Flask(__name__)
 
 @app.route('/models', methods=['GET'])
 def models():
-    the_models = []
+    the_models = classifier.available_models()
 
-    for dirname in os.listdir("models/"):
-        if dirname != ".gitkeep":
-            the_models.append(dirname)
-
-    return jsonify({'status': 'OK', 'result': the_models})
+    return jsonify({'status': 'OK', 'result': the_models, 'loaded': classifier.loaded_models(), 'stats': classifier.get_stats()})
 
 
 @app.route('/predict', methods=['POST'])
@@ -42,43 +38,115 @@ def predict():
         return jsonify({'status': 'FAILED', 'message': 'No file selected'})
 
     filename = secure_filename(file.filename)
-    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-    filepath = app.config['UPLOAD_FOLDER'] + "/" + filename
-
-    # 2) Load file as wav
-    if not os.path.isfile(filepath):
-        return jsonify({'status': 'FAILED', 'message': 'File was not saved...'})
-
-    # Check file type
-    if filename.endswith(".mp4"):
-        filepath = convert_file(filepath)
 
-    audio_file = audio.load(filepath)
+    # the model is resolved once, every step of the request uses the same recognizer
+    resolved = classifier.get_recognizer(model)
+    sample_rate = classifier.get_sample_rate(resolved=resolved)
+
+    # 2) Decode uploads in memory, mp4s are piped through ffmpeg at the model's rate
+    try:
+        if filename.endswith(".mp4"):
+            audio_file = decoder.decode(file.stream.read(), sample_rate)
+        else:
+            audio_file = audio.load_stream(file.stream, sample_rate)
+    except (audio.DecoderBusy, audio.DecoderTimeout) as error:
+        return decoder_error(error)
+
+    # Other formats and mp4s ffmpeg could not demux from a pipe need the uploads folder round-trip
+    filepath = None
+    if audio_file is None:
+        if not app.config['DISK_FALLBACK']:
+            return jsonify({'status': 'FAILED', 'message': 'Unsupported audio format'})
+
+        file.stream.seek(0)
+        file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+        filepath = app.config['UPLOAD_FOLDER'] + "/" + filename
+
+        if not os.path.isfile(filepath):
+            return jsonify({'status': 'FAILED', 'message': 'File was not saved...'})
+
+        # Check file type, ffmpeg can seek in the saved mp4
+        try:
+            if filename.endswith(".mp4"):
+                audio_file = decoder.decode(filepath, sample_rate)
+            else:
+                audio_file = audio.load_file(filepath, sample_rate)
+        except (audio.DecoderBusy, audio.DecoderTimeout) as error:
+            os.remove(filepath)
+            return decoder_error(error)
+
+        if audio_file is None:
+            os.remove(filepath)
+            return jsonify({'status': 'FAILED', 'message': 'Could not decode audio file'})
 
     # 3) Preprocessering
+    # transformer (import processing.transformer as transformer) pulls in librosa, it is not imported while unused
     # transformer.remove_noise(audio_file)
     # transformer.trim(audio_file, 25)
 
     # 4) Predict
-    result, model = classifier.predict_word(audio_file, model)
+    result, model = classifier.predict_word(audio_file, resolved=resolved)
 
     # 5) Housekeeping
-    if os.path.exists(filepath):
+    if filepath is not None and os.path.exists(filepath):
         os.remove(filepath)
 
     # 6) Return success or error depending on prediction
-    return jsonify({'status': 'OK', 'result': result, 'model': model})
+    return jsonify({'status': 'OK', 'result': str(result), 'phones': result.to_list(), 'model': model})
 
 
-def allowed_file_type(filename, allowed_type):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() == allowed_type
+@app.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    # Body is raw 16-bit little-endian mono pcm, usually sent with chunked transfer encoding
+    args = request.args
+    model = args.get('model', default="")
+    sample_rate = args.get('sample_rate', default=16000, type=int)
+
+    # chunks would be resampled separately, with filter edge artefacts every 100ms
+    resolved = classifier.get_recognizer(model)
+    model_sample_rate = classifier.get_sample_rate(resolved=resolved)
+    if sample_rate != model_sample_rate:
+        return jsonify({'status': 'FAILED', 'message': f'sample_rate should be {model_sample_rate}, the rate of the model'})
+
+    session, model = classifier.stream_word(resolved=resolved)
+
+    # 100ms of audio per read, a phone is returned 240ms to 450ms after it is spoken (see RecognizerStream)
+    chunk_bytes = sample_rate // 10 * 2
+
+    def generate():
+        # 1) Recognize each chunk as it arrives and send the new phones as one json line
+        leftover = b''
+        while True:
+            data = request.stream.read(chunk_bytes)
+            if not data:
+                break
+
+            data = leftover + data
+            usable = len(data) // 2 * 2
+            leftover = data[usable:]
 
+            result = session.feed(audio.load_pcm(data[:usable], sample_rate))
+            if len(result) > 0:
+                yield json.dumps({'status': 'OK', 'final': False, 'result': str(result), 'phones': result.to_list(), 'model': model}) + '\n'
 
-def convert_file(filepath):
-    new_file = filepath[:len(filepath) - 4]
-    os.system('ffmpeg -i {} -vn -acodec pcm_s16le -ar 44100 {}.wav'.format(filepath, new_file))
-    os.remove(filepath)
-    return new_file + ".wav"
+        # 2) Flush the remaining frames and send the whole utterance
+        session.finish()
+        result = session.result()
+        yield json.dumps({'status': 'OK', 'final': True, 'result': str(result), 'phones': result.to_list(), 'model': model}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def decoder_error(error):
+    # a busy or slow decoder is not a problem of the upload, the client can retry
+    if isinstance(error, audio.DecoderBusy):
+        return jsonify({'status': 'FAILED', 'message': 'Audio decoder is busy, please retry later'}), 503
+
+    return jsonify({'status': 'FAILED', 'message': 'Audio decoding timed out'}), 504
+
+
+def allowed_file_type(filename, allowed_type):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() == allowed_type
 
 
 if __name__ == '__main__':
@@ -90,6 +158,12 @@ if __name__ == '__main__':
 
     # Setup upload folder
     app.config['UPLOAD_FOLDER'] = config['UPLOAD']['folder']
+    app.config['DISK_FALLBACK'] = config.getboolean('UPLOAD', 'disk_fallback', fallback=False)
+    app.config['MAX_CONTENT_LENGTH'] = config.getint('UPLOAD', 'max_content_mb', fallback=16) * 1024 * 1024
+
+    # Setup ffmpeg decoding of mp4 uploads
+    decoder = audio.FFmpegDecoder(config.getint('UPLOAD', 'ffmpeg_workers', fallback=2),
+                                  config.getfloat('UPLOAD', 'ffmpeg_timeout', fallback=30.0))
 
     classifier = classifier.Classifier(config)
     if classifier.load_models() and config.getboolean("WEB", "local"):
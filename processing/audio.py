@@ -1,10 +1,21 @@
-import librosa
 import os.path
+import struct
+import subprocess
+import threading
+import time
 import scipy.io.wavfile
 import numpy as np
+import allosaurus.audio
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
 
 
 def load(path):
+    # librosa is slow to import, only the formats it decodes pay for it
+    import librosa
+
     if os.path.exists(path):
         time_series, sampling_rate = librosa.load(path, sr=None, mono=True)
         return Audio(path, time_series, sampling_rate)
@@ -12,6 +23,231 @@ def load(path):
         return None
 
 
+def load_file(path, sample_rate=None):
+    """
+    decode an audio file once into the audio consumed by the recognizer.
+    wavs are parsed in memory like uploads, other formats are decoded by librosa, both at sample_rate
+
+    :param path: path of the audio file
+    :param sample_rate: sample rate of the model, None keeps the native sample rate
+    :return: allosaurus.audio.Audio, or None if the file does not exist
+    """
+
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'rb') as f:
+        audio = load_stream(f, sample_rate)
+
+    if audio is None:
+        import librosa
+
+        samples, sample_rate = librosa.load(path, sr=sample_rate, mono=True, dtype=np.float32)
+        audio = allosaurus.audio.Audio(samples, sample_rate)
+
+    return audio
+
+
+def load_stream(stream, sample_rate=None):
+    """
+    decode a wav stream (e.g. an uploaded file) in memory without writing it to disk.
+    samples are float32 in [-1, 1] and averaged to mono, the same as load() returns through librosa
+
+    :param stream: binary file-like object positioned at the start of the wav
+    :param sample_rate: sample rate of the model, the samples are resampled to it. None keeps the native sample rate
+    :return: allosaurus.audio.Audio, or None if the stream is not a wav we can decode in memory
+    """
+
+    # reuse the upload buffer directly when werkzeug keeps it in memory,
+    # it has to be released before werkzeug closes the stream
+    if hasattr(stream, 'getbuffer'):
+        buffer = stream.getbuffer()
+    else:
+        buffer = memoryview(stream.read())
+
+    with buffer:
+        header = read_wav_header(buffer)
+        if header is None:
+            return None
+
+        audio_format, channel_number, wav_sample_rate, sample_width, data_offset, data_size = header
+
+        if audio_format == WAVE_FORMAT_PCM and sample_width == 2:
+            dtype, scale = '<i2', 1.0 / 32768
+        elif audio_format == WAVE_FORMAT_PCM and sample_width == 4:
+            dtype, scale = '<i4', 1.0 / 2147483648
+        elif audio_format == WAVE_FORMAT_IEEE_FLOAT and sample_width == 4:
+            dtype, scale = '<f4', None
+        elif audio_format == WAVE_FORMAT_IEEE_FLOAT and sample_width == 8:
+            dtype, scale = '<f8', None
+        else:
+            return None
+
+        # streamed wavs might carry a wrong data size, only keep complete frames
+        frame_size = sample_width * channel_number
+        data_size = min(data_size, len(buffer) - data_offset) // frame_size * frame_size
+
+        # view into the upload buffer, converting to float32 is the only copy
+        pcm = np.frombuffer(buffer, dtype=dtype, count=data_size // sample_width, offset=data_offset)
+        samples = pcm.astype(np.float32)
+        del pcm
+
+    if scale is not None:
+        samples *= np.float32(scale)
+
+    if channel_number > 1:
+        samples = samples.reshape(-1, channel_number).mean(axis=1)
+
+    audio = allosaurus.audio.Audio(samples, wav_sample_rate)
+
+    if sample_rate is not None:
+        audio = allosaurus.audio.resample_audio(audio, sample_rate)
+
+    return audio
+
+
+def load_pcm(data, sample_rate):
+    """
+    convert raw 16-bit little-endian mono pcm into float32 samples in [-1, 1], the same scale as load_stream
+
+    :param data: bytes-like object with an even number of bytes
+    :param sample_rate: sample rate of the pcm
+    :return: allosaurus.audio.Audio
+    """
+
+    samples = np.frombuffer(data, dtype='<i2').astype(np.float32)
+    samples *= np.float32(1.0 / 32768)
+
+    return allosaurus.audio.Audio(samples, sample_rate)
+
+
+class DecoderBusy(Exception):
+    # no ffmpeg worker became free in time
+    pass
+
+
+class DecoderTimeout(Exception):
+    # ffmpeg did not finish in time
+    pass
+
+
+class FFmpegDecoder:
+    """
+    decode other formats (e.g. mp4/aac uploads) with ffmpeg through pipes,
+    the pcm output is resampled by ffmpeg to the model's sample rate and never touches the disk
+    """
+
+    def __init__(self, max_workers=2, timeout=30.0, binary='ffmpeg'):
+        """
+        :param max_workers: maximum number of ffmpeg processes running at the same time
+        :param timeout: seconds for a decode, waiting for a free worker included
+        :param binary: ffmpeg executable
+        """
+
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.binary = binary
+        self.workers = threading.BoundedSemaphore(max_workers)
+
+    def command(self, path, sample_rate):
+        """
+        ffmpeg command writing the audio track of path as s16le mono pcm to stdout
+
+        :param path: path of the input, 'pipe:0' reads stdin
+        :param sample_rate: sample rate of the output
+        :return: argument list
+        """
+
+        return [self.binary, '-nostdin', '-hide_banner', '-loglevel', 'error', '-i', path,
+                '-vn', '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1']
+
+    def decode(self, source, sample_rate=16000):
+        """
+        decode the audio track of source into mono float32 samples in [-1, 1]
+
+        :param source: bytes-like object piped into ffmpeg, or path of a file on disk.
+                       mp4s whose index is stored after the media data can only be decoded from a path
+        :param sample_rate: sample rate of the output
+        :return: allosaurus.audio.Audio, or None if ffmpeg is missing or cannot decode the source
+        :raises DecoderBusy: no worker became free within the timeout
+        :raises DecoderTimeout: ffmpeg did not finish within the timeout
+        """
+
+        if isinstance(source, str):
+            data, path = None, source
+        else:
+            data, path = source, 'pipe:0'
+
+        command = self.command(path, sample_rate)
+
+        # waiting for a worker counts against the same timeout
+        deadline = time.monotonic() + self.timeout
+
+        if not self.workers.acquire(timeout=self.timeout):
+            raise DecoderBusy()
+
+        try:
+            process = subprocess.run(command, input=data, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                     timeout=max(deadline - time.monotonic(), 0.0))
+        except subprocess.TimeoutExpired:
+            raise DecoderTimeout()
+        except OSError:
+            return None
+        finally:
+            self.workers.release()
+
+        if process.returncode != 0 or len(process.stdout) < 2:
+            return None
+
+        pcm = process.stdout
+        return load_pcm(memoryview(pcm)[:len(pcm) // 2 * 2], sample_rate)
+
+
+def read_wav_header(buffer):
+    """
+    parse the RIFF header of a wav buffer
+
+    :param buffer: bytes-like object containing the whole wav file
+    :return: (audio_format, channel_number, sample_rate, sample_width, data_offset, data_size) or None if it is not a valid wav,
+             including truncated or corrupt headers
+    """
+
+    if len(buffer) < 12 or bytes(buffer[0:4]) != b'RIFF' or bytes(buffer[8:12]) != b'WAVE':
+        return None
+
+    fmt = None
+    offset = 12
+
+    while offset + 8 <= len(buffer):
+        chunk_id = bytes(buffer[offset:offset + 4])
+        chunk_size, = struct.unpack_from('<I', buffer, offset + 4)
+        offset += 8
+
+        if chunk_id == b'fmt ':
+            # the fmt chunk has to be complete, unlike the data chunk of a streamed wav
+            if chunk_size < 16 or offset + chunk_size > len(buffer):
+                return None
+
+            audio_format, channel_number, sample_rate, _, _, bits = struct.unpack_from('<HHIIHH', buffer, offset)
+
+            # the real format is stored in the sub format guid of extensible wavs
+            if audio_format == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                audio_format, = struct.unpack_from('<H', buffer, offset + 24)
+
+            fmt = (audio_format, channel_number, sample_rate, bits // 8)
+
+        elif chunk_id == b'data':
+            if fmt is None or fmt[1] == 0 or fmt[2] == 0 or fmt[3] == 0:
+                return None
+
+            return fmt + (offset, chunk_size)
+
+        # chunks are word aligned
+        offset += chunk_size + (chunk_size & 1)
+
+    return None
+
+
 class Audio:
     def __init__(self, path, time_series, sampling_rate):
         folder, filename = os.path.split(path)
@@ -45,7 +281,7 @@ class Audio:
         return 'wrong' in self.__filename
 
     def get_duration(self):
-        return librosa.get_duration(y=self.time_series, sr=self.__sampling_rate)
+        return len(self.time_series) / self.__sampling_rate
 
     def get_orignial_time_series(self):
         return self.__original_time_series
@@ -66,18 +302,24 @@ class Audio:
         scipy.io.wavfile.write(path, self.__sampling_rate, data.astype(np.int16))
 
     def mel_spectrogram(self):
+        import librosa
+
         data = np.array(self.time_series, dtype=np.float32)
         D = np.abs(librosa.stft(data)) ** 2
         S = librosa.feature.melspectrogram(S=D, sr=self.get_sampling_rate)
         return S
 
     def stft(self, window_size=100, hop_length=100):
+        import librosa
+
         window = np.hanning(window_size)
         stft_out = librosa.core.spectrum.stft(self.time_series, n_fft=window_size, hop_length=hop_length, window=window)
         out = 2 * np.abs(stft_out) / np.sum(window)
         return out
 
     def mfccs(self):
+        import librosa
+
         data = np.array(self.time_series, dtype=np.float32)
         return librosa.feature.mfcc(y=data, sr=self.get_sampling_rate)
 
@@ -0,0 +1,91 @@
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+
+class SchedulerClosed(RuntimeError):
+    pass
+
+
+class BatchScheduler:
+
+    def __init__(self, recognize_batch, max_batch_size: int = 8, max_wait: float = 0.01):
+        # recognize_batch takes a list of audios and returns one result per audio
+        self.recognize_batch = recognize_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self.queue = queue.Queue()
+        self.closed = False
+        self.lock = threading.Lock()
+
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def submit(self, audio_file) -> Future:
+        future = Future()
+
+        with self.lock:
+            if self.closed:
+                raise SchedulerClosed('BatchScheduler is closed')
+
+            self.queue.put((audio_file, future))
+
+        return future
+
+    def close(self):
+        # requests submitted before closing are still flushed before the worker stops
+        with self.lock:
+            if self.closed:
+                return
+
+            self.closed = True
+            self.queue.put(None)
+
+        self.worker.join()
+
+    def run(self):
+        stopping = False
+
+        while not stopping:
+            request = self.queue.get()
+            if request is None:
+                break
+
+            batch = [request]
+
+            # collect more requests until the batch is full or the first request waited long enough
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+
+                try:
+                    request = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+
+                if request is None:
+                    stopping = True
+                    break
+
+                batch.append(request)
+
+            self.flush(batch)
+
+    def flush(self, batch):
+        batch = [(audio_file, future) for audio_file, future in batch if future.set_running_or_notify_cancel()]
+        if len(batch) == 0:
+            return
+
+        try:
+            results = self.recognize_batch([audio_file for audio_file, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
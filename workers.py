@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import allosaurus.app
+import allosaurus.audio
+from allosaurus.am.factory import read_am
+from allosaurus.lm.factory import read_lm
+from allosaurus.pm.factory import read_pm
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+# recognizers served by a worker, loaded by init_worker
+_recognizers = {}
+
+
+class WorkerPool:
+    # Runs recognitions in worker processes, so the python glue around the lstm is not serialized by the GIL
+
+    def __init__(self, recognizers: dict, configs: dict, processes: int = 2, threads: int = 0, timeout: float = 30):
+        # weights live in shared memory, the workers map the same pages instead of keeping their own copy
+        shared = {}
+        for model, recognizer in recognizers.items():
+            if hasattr(recognizer.am, 'share_memory'):
+                recognizer.am.share_memory()
+                shared[model] = {name: param.detach() for name, param in recognizer.am.named_parameters()}
+
+        self.models = set(recognizers)
+
+        # a task held by a worker that died is never answered, it is recognized in-process after timeout seconds
+        self.timeout = timeout
+        self.timed_out = False
+
+        # split the cores between the workers unless the number of torch threads per worker is given
+        if threads <= 0:
+            threads = max(1, (os.cpu_count() or 1) // processes)
+
+        # the pool is created from a thread of the server after torch set up its thread pools,
+        # a forked child could inherit their locks while held, so the workers are spawned and
+        # load the models themselves (configs maps each model to its inference config and path)
+        self.pool = multiprocessing.get_context('spawn').Pool(processes, initializer=init_worker, initargs=(configs, shared, threads))
+
+    def recognize(self, model: str, recognizer, audio_file):
+        try:
+            result = self.pool.apply_async(recognize, (model, audio_file.samples, audio_file.sample_rate)).get(self.timeout)
+        except multiprocessing.TimeoutError:
+            self.timed_out = True
+            return recognizer.recognize_result(audio_file)
+
+        # the mask is not sent back, it is the same in every process
+        result.mask = recognizer.lm.inventory.get_mask('ipa', approximation=recognizer.lm.config.approximate)
+
+        return result
+
+    def close(self):
+        self.pool.close()
+
+        # join waits for every task, including the ones lost with a dead worker
+        if self.timed_out:
+            self.pool.terminate()
+
+        self.pool.join()
+
+
+def init_worker(configs: dict, shared: dict, threads: int):
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+    for model, (inference_config, model_path) in configs.items():
+        # the parent already read the model from model_path, so there is nothing to resolve or download
+        recognizer = allosaurus.app.Recognizer(read_pm(model_path, inference_config), read_am(model_path, inference_config),
+                                               read_lm(model_path, inference_config), inference_config)
+
+        # swap the weights just read for the parent's shared ones, the private copy is freed.
+        # quantized and onnx models have no plain parameters and keep their own copy
+        if model in shared:
+            params = dict(recognizer.am.named_parameters())
+
+            with torch.no_grad():
+                for name, tensor in shared[model].items():
+                    if name in params and params[name].shape == tensor.shape:
+                        params[name].data = tensor
+
+        _recognizers[model] = recognizer
+
+
+def recognize(model: str, samples, sample_rate: int):
+    result = _recognizers[model].recognize_result(allosaurus.audio.Audio(samples, sample_rate))
+    result.mask = None
+
+    return result